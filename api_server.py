@@ -0,0 +1,292 @@
+#!/usr/bin/env python3
+"""
+Local HTTP API for the Chronology Agent workflow.
+Clients submit PDFs and poll or stream their progress; jobs go through the
+SQLite job queue (see job_queue.py) and are processed by worker threads in this
+process, which share warm LLM clients with a cap on concurrent calls per model.
+
+Run with:
+    python api_server.py --port 8765 --workers 4
+
+Every request except /health carries a client token in the X-Client-Token
+header. Clients see only the jobs submitted with their own token, and the API
+keeps its jobs in a database of its own (CHRONOLOGY_API_JOBS_DIR) unless
+--jobs-dir points it at another one.
+
+Endpoints:
+    POST /jobs?file_name=letter.pdf&provider=groq&model=...   (body: the PDF)
+         add &stream=1 to receive progress events instead of the job ID
+    GET  /jobs                  the client's recent jobs
+    GET  /jobs/<id>             job status and workflow progress
+    GET  /jobs/<id>/result      chronology entry and extracted data
+    GET  /jobs/<id>/events      progress events as newline-delimited JSON
+    GET  /health
+"""
+import argparse
+import hashlib
+import json
+import os
+import threading
+import time
+from http import HTTPStatus
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Dict, Optional, Tuple
+from urllib.parse import parse_qs, urlparse
+
+from job_queue import (COMPLETED, FAILED, enqueue_job, get_db_path, get_job, list_jobs,
+                       requeue_orphaned_jobs, worker_loop)
+from llm_clients import DEFAULT_GROQ_MODEL, DEFAULT_OLLAMA_MODEL, ChatModelProxy, create_llm
+
+# The API's own job database, apart from the UI's
+API_JOBS_DIR = os.getenv("CHRONOLOGY_API_JOBS_DIR", ".chronology_api_jobs")
+
+# Header identifying the client that owns a job
+CLIENT_TOKEN_HEADER = "X-Client-Token"
+
+# Largest accepted upload
+MAX_UPLOAD_BYTES = 100 * 1024 * 1024
+
+# Calls in flight per shared model
+MAX_CONCURRENT_CALLS = 8
+
+# Seconds between database polls when streaming events
+EVENT_POLL_INTERVAL = 0.5
+
+# Job options accepted as query parameters
+BOOLEAN_OPTIONS = ("speculative", "routing", "split_documents", "profile", "related_events")
+
+
+class SharedModel(ChatModelProxy):
+    """Chat model shared by the worker threads, with at most max_concurrent_calls calls in flight.
+
+    Groq and Ollama take one prompt per request, so each call is sent on its own
+    and returns as soon as its own response arrives.
+    """
+
+    def __init__(self, llm, max_concurrent_calls: int = MAX_CONCURRENT_CALLS):
+        super().__init__(llm)
+        self._slots = threading.BoundedSemaphore(max_concurrent_calls)
+
+    def call_context(self):
+        return self._slots
+
+
+class LLMPool:
+    """Shared chat models per (provider, model), created on first use."""
+
+    def __init__(self, worker_config: dict):
+        self.worker_config = worker_config
+        self._models: Dict[Tuple[str, str], SharedModel] = {}
+        self._lock = threading.Lock()
+
+    def get_llm(self, llm_provider: str, model_name: str) -> SharedModel:
+        with self._lock:
+            key = (llm_provider, model_name)
+            if key not in self._models:
+                self._models[key] = SharedModel(create_llm(
+                    llm_provider,
+                    model_name,
+                    groq_api_key=self.worker_config.get("groq_api_key"),
+                    ollama_base_url=self.worker_config.get("ollama_base_url")
+                ))
+            return self._models[key]
+
+
+def client_owner(client_token: str) -> str:
+    """The job owner of a client token. Only a digest of the token is stored."""
+    return "api:" + hashlib.sha256(client_token.encode("utf-8")).hexdigest()[:32]
+
+
+def job_summary(job: dict) -> dict:
+    """The public view of a job, without internal paths and results."""
+    return {
+        "job_id": job["id"],
+        "file_name": job["file_name"],
+        "status": job["status"],
+        "llm_provider": job["llm_provider"],
+        "model_name": job["model_name"],
+        "options": job["options"],
+        "workflow_status": job["workflow_status"],
+        "error": job["error"],
+        "created_at": job["created_at"],
+        "started_at": job["started_at"],
+        "finished_at": job["finished_at"]
+    }
+
+
+class ChronologyRequestHandler(BaseHTTPRequestHandler):
+    """Request handler; server.db_path names the job database."""
+
+    protocol_version = "HTTP/1.1"
+
+    def log_message(self, format, *args):
+        print(f"🌐 {self.address_string()} {format % args}")
+
+    def _send_json(self, status: HTTPStatus, payload: dict):
+        body = json.dumps(payload).encode("utf-8")
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def _send_error(self, status: HTTPStatus, message: str):
+        # The request body may be unread, so the connection can't be reused
+        self.close_connection = True
+        self._send_json(status, {"error": message})
+
+    def _client_owner(self) -> Optional[str]:
+        """The owner of the requesting client, or None after rejecting a request without a token."""
+        client_token = (self.headers.get(CLIENT_TOKEN_HEADER) or "").strip()
+        if not client_token:
+            self._send_error(HTTPStatus.UNAUTHORIZED, f"Requests need an {CLIENT_TOKEN_HEADER} header")
+            return None
+        return client_owner(client_token)
+
+    def _write_chunk(self, payload: dict):
+        line = json.dumps(payload).encode("utf-8") + b"\n"
+        self.wfile.write(f"{len(line):X}\r\n".encode("ascii") + line + b"\r\n")
+        self.wfile.flush()
+
+    def _stream_events(self, job_id: str):
+        """Stream status changes of a job as newline-delimited JSON until it finishes."""
+        self.send_response(HTTPStatus.OK)
+        self.send_header("Content-Type", "application/x-ndjson")
+        self.send_header("Transfer-Encoding", "chunked")
+        self.end_headers()
+
+        last_summary = None
+        while True:
+            job = get_job(job_id, self.server.db_path)
+            summary = job_summary(job)
+            if summary != last_summary:
+                self._write_chunk({"event": "status", "job": summary})
+                last_summary = summary
+            if job["status"] in (COMPLETED, FAILED):
+                if job["status"] == COMPLETED:
+                    self._write_chunk({"event": "result", "job_id": job_id, "result": job["result"]})
+                break
+            time.sleep(EVENT_POLL_INTERVAL)
+        self.wfile.write(b"0\r\n\r\n")
+
+    def do_GET(self):
+        path = urlparse(self.path).path.rstrip("/")
+        parts = path.split("/")[1:]
+
+        if path == "/health":
+            self._send_json(HTTPStatus.OK, {"status": "ok"})
+            return
+        owner = self._client_owner()
+        if owner is None:
+            return
+        if path == "/jobs":
+            jobs = list_jobs(owner=owner, db_path=self.server.db_path)
+            self._send_json(HTTPStatus.OK, {"jobs": [job_summary(job) for job in jobs]})
+            return
+        if len(parts) < 2 or parts[0] != "jobs":
+            self._send_error(HTTPStatus.NOT_FOUND, f"Unknown path: {path}")
+            return
+
+        job = get_job(parts[1], self.server.db_path)
+        if job is None or job["owner"] != owner:
+            # Other clients' jobs are reported as unknown, not as forbidden
+            self._send_error(HTTPStatus.NOT_FOUND, f"Unknown job: {parts[1]}")
+        elif len(parts) == 2:
+            self._send_json(HTTPStatus.OK, job_summary(job))
+        elif parts[2:] == ["result"]:
+            if job["status"] != COMPLETED:
+                self._send_json(HTTPStatus.CONFLICT, job_summary(job))
+            else:
+                self._send_json(HTTPStatus.OK, {"job_id": job["id"], "result": job["result"], "usage": job["usage"]})
+        elif parts[2:] == ["events"]:
+            self._stream_events(job["id"])
+        else:
+            self._send_error(HTTPStatus.NOT_FOUND, f"Unknown path: {path}")
+
+    def do_POST(self):
+        url = urlparse(self.path)
+        if url.path.rstrip("/") != "/jobs":
+            self._send_error(HTTPStatus.NOT_FOUND, f"Unknown path: {url.path}")
+            return
+        owner = self._client_owner()
+        if owner is None:
+            return
+
+        content_length = int(self.headers.get("Content-Length") or 0)
+        if content_length <= 0:
+            self._send_error(HTTPStatus.BAD_REQUEST, "The request body must contain the PDF")
+            return
+        if content_length > MAX_UPLOAD_BYTES:
+            self._send_error(HTTPStatus.REQUEST_ENTITY_TOO_LARGE, f"PDFs are limited to {MAX_UPLOAD_BYTES:,} bytes")
+            return
+
+        data = self.rfile.read(content_length)
+        if not data.startswith(b"%PDF"):
+            self._send_error(HTTPStatus.UNSUPPORTED_MEDIA_TYPE, "The request body is not a PDF")
+            return
+
+        params = {key: values[-1] for key, values in parse_qs(url.query).items()}
+        llm_provider = params.get("provider") or self.server.default_provider
+        if llm_provider not in ("groq", "ollama"):
+            self._send_error(HTTPStatus.BAD_REQUEST, f"Unknown provider: {llm_provider}")
+            return
+        model_name = params.get("model") or (DEFAULT_GROQ_MODEL if llm_provider == "groq" else DEFAULT_OLLAMA_MODEL)
+        options = {
+            option: params.get(option, "1" if option in ("speculative", "split_documents") else "0").lower()
+            in ("1", "true", "yes")
+            for option in BOOLEAN_OPTIONS
+        }
+
+        job_id = enqueue_job(params.get("file_name") or "document.pdf", data, llm_provider, model_name,
+                             options=options, batch_id=params.get("batch_id"), owner=owner, db_path=self.server.db_path)
+        print(f"📥 Job {job_id} submitted over HTTP")
+
+        if params.get("stream", "").lower() in ("1", "true", "yes"):
+            self._stream_events(job_id)
+        else:
+            self._send_json(HTTPStatus.ACCEPTED, job_summary(get_job(job_id, self.server.db_path)))
+
+
+def start_worker_threads(count: int, worker_config: dict, db_path: str) -> LLMPool:
+    """Start in-process job workers sharing one pool of chat models."""
+    llm_pool = LLMPool(worker_config)
+    requeue_orphaned_jobs(db_path)
+    for _ in range(count):
+        threading.Thread(
+            target=worker_loop,
+            args=(worker_config, db_path, EVENT_POLL_INTERVAL, llm_pool.get_llm),
+            daemon=True
+        ).start()
+    return llm_pool
+
+
+def main():
+    """Run the API server with its job workers."""
+    parser = argparse.ArgumentParser(description="Chronology Agent HTTP API")
+    parser.add_argument("--host", default="127.0.0.1", help="Address to listen on")
+    parser.add_argument("--port", type=int, default=8765, help="Port to listen on")
+    parser.add_argument("--workers", type=int, default=4, help="Documents processed concurrently")
+    parser.add_argument("--jobs-dir", default=API_JOBS_DIR, help="Directory holding the job database and uploads")
+    args = parser.parse_args()
+
+    worker_config = {
+        "groq_api_key": os.getenv("GROQ_API_KEY"),
+        "ollama_base_url": os.getenv("OLLAMA_BASE_URL")
+    }
+    db_path = get_db_path(args.jobs_dir)
+    start_worker_threads(args.workers, worker_config, db_path)
+
+    server = ThreadingHTTPServer((args.host, args.port), ChronologyRequestHandler)
+    server.db_path = db_path
+    server.default_provider = "groq" if worker_config["groq_api_key"] else "ollama"
+    print(f"🚀 Chronology API listening on http://{args.host}:{args.port} with {args.workers} workers")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        print("👋 Shutting down")
+    finally:
+        server.server_close()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,54 @@
+"""
+On-disk checkpoints of the agent state after each workflow stage.
+A run that crashes can be resumed from its last completed stage without
+repeating the LLM calls made before it.
+"""
+import json
+import os
+import shutil
+from typing import Optional, Tuple
+
+from document_models import AgentState, deserialize_state, serialize_state
+
+CHECKPOINTS_DIR = os.getenv("CHRONOLOGY_CHECKPOINTS_DIR", ".chronology_runs")
+
+
+def get_run_dir(run_id: str, checkpoints_dir: str = None) -> str:
+    """Get the checkpoint directory of a run."""
+    return os.path.join(checkpoints_dir or CHECKPOINTS_DIR, run_id)
+
+
+def save_checkpoint(run_id: str, stage: str, state: AgentState, checkpoints_dir: str = None) -> str:
+    """Save the state produced by a stage. Returns the checkpoint path."""
+    run_dir = get_run_dir(run_id, checkpoints_dir)
+    os.makedirs(run_dir, exist_ok=True)
+
+    sequence = len([name for name in os.listdir(run_dir) if name.endswith(".json")])
+    checkpoint_path = os.path.join(run_dir, f"{sequence:03d}_{stage}.json")
+
+    # Write to a temporary file first so a crash never leaves a partial checkpoint
+    temp_path = f"{checkpoint_path}.tmp"
+    with open(temp_path, "w", encoding="utf-8") as checkpoint_file:
+        json.dump({"stage": stage, "state": serialize_state(state)}, checkpoint_file)
+    os.replace(temp_path, checkpoint_path)
+    return checkpoint_path
+
+
+def load_latest_checkpoint(run_id: str, checkpoints_dir: str = None) -> Optional[Tuple[str, AgentState]]:
+    """Load the most recent checkpoint of a run as (stage, state), or None."""
+    run_dir = get_run_dir(run_id, checkpoints_dir)
+    if not os.path.isdir(run_dir):
+        return None
+
+    checkpoint_names = sorted(name for name in os.listdir(run_dir) if name.endswith(".json"))
+    if not checkpoint_names:
+        return None
+
+    with open(os.path.join(run_dir, checkpoint_names[-1]), encoding="utf-8") as checkpoint_file:
+        checkpoint = json.load(checkpoint_file)
+    return checkpoint["stage"], deserialize_state(checkpoint["state"])
+
+
+def clear_checkpoints(run_id: str, checkpoints_dir: str = None):
+    """Delete all checkpoints of a run."""
+    shutil.rmtree(get_run_dir(run_id, checkpoints_dir), ignore_errors=True)
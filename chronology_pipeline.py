@@ -0,0 +1,352 @@
+"""
+UI-independent execution of the Chronology Agent workflow.
+Runs the reader, analyzer, reflection and formatter nodes in order and reports
+progress through an optional status callback.
+"""
+import re
+from concurrent.futures import ThreadPoolExecutor
+from typing import Callable, Optional, Tuple
+
+from checkpoints import load_latest_checkpoint, save_checkpoint
+from document_analyzer import document_analyzer_node
+from document_formatter import document_formatter_node
+from document_models import AgentState, DocumentData
+from document_reader import PdfSource, document_reader_node
+from document_segmenter import segment_document
+from embedding_index import find_related_events
+from llm_clients import get_model_name
+from model_router import TYPE_DETECTION_CHARS, resolve_llm
+from profiling import RunProfiler, is_profiling_enabled, new_run_name, profile_section
+from reflection_agent import reflection_node
+from text_store import get_text_store, load_pdf_content, state_text_refs
+
+# Workflow steps as (step_key, step_name, description)
+WORKFLOW_STEPS = [
+    ("reader", "📖 Document Reader", "Loading and extracting text from PDF"),
+    ("analyzer", "🔍 Document Analyzer", "Analyzing content and extracting structured data"),
+    ("reviewer", "🔍 Reflection Agent", "Reviewing data completeness and accuracy"),
+    ("formatter", "📝 Document Formatter", "Formatting final chronology output")
+]
+
+# Workflow stages and the status card step each one reports to
+STAGE_STEPS = {
+    "reader": "reader",
+    "segmenter": "reader",
+    "analyzer": "analyzer",
+    "reviewer": "reviewer",
+    "reanalyzer": "reviewer",
+    "formatter": "formatter"
+}
+
+MAX_REVIEW_RETRIES = 2
+
+# Stages that read the document text
+TEXT_STAGES = ("segmenter", "analyzer", "reanalyzer", "reviewer")
+
+# Sub-documents of a bundled PDF processed at the same time
+MAX_PARALLEL_SUB_DOCUMENTS = 4
+
+# Sub-documents are named "<file_path>#part<n>"
+SUB_DOCUMENT_PATH_PATTERN = re.compile(r"#(part\d+)$")
+
+StatusCallback = Callable[[str, str, str], None]
+
+
+def create_initial_state(file_path: str) -> AgentState:
+    """Create the initial agent state for a document."""
+    return {
+        "file_path": file_path,
+        "content_ref": "",
+        "content_length": 0,
+        "document_data": DocumentData(),
+        "review_feedback": "",
+        "formatted_output": "",
+        "is_complete": False,
+        "retry_count": 0,
+        "sub_documents": [],
+        "related_events": []
+    }
+
+
+def get_next_stage(stage: str, state: AgentState) -> Optional[str]:
+    """Get the stage that follows a completed stage, or None when the workflow is done."""
+    if stage == "reader":
+        return "segmenter"
+    if stage == "segmenter":
+        # Split documents are processed completely by their sub-document runs
+        return None if state.get("sub_documents") else "analyzer"
+    if stage in ("analyzer", "reanalyzer"):
+        return "reviewer"
+    if stage == "reviewer":
+        # reflection_node increments retry_count on every review it performs
+        if state.get("is_complete", False) or state.get("retry_count", 0) > MAX_REVIEW_RETRIES:
+            return "formatter"
+        return "reanalyzer"
+    return None
+
+
+def run_chronology_workflow(file_path: str, llm, on_status: Optional[StatusCallback] = None,
+                            run_id: Optional[str] = None, source: PdfSource = None,
+                            speculative: bool = False, split_documents: bool = False,
+                            profile: bool = False, related_events: bool = False) -> Optional[AgentState]:
+    """Run the chronology workflow for a single document.
+
+    llm is either a chat model used for every stage or a per-stage provider such
+    as ModelRouter or UsageMeter. on_status is called as on_status(step_key, status, message)
+    where status is one of 'pending', 'running', 'completed' or 'error'. When run_id
+    is given, the state is checkpointed after every stage and a rerun with the same
+    run_id resumes after the last completed stage. source optionally provides the
+    PDF as an in-memory buffer, in which case file_path only names the document.
+    With speculative=True the formatter runs concurrently with each review and its
+    output is kept when the review passes. With split_documents=True a bundled PDF
+    is split into sub-documents that are processed concurrently, each producing
+    its own chronology entry. With profile=True, or CHRONOLOGY_PROFILE set, each
+    stage is profiled (see profiling.py). With related_events=True, similar
+    documents from the embedding index (see embedding_index.py) are given to the
+    formatter as context. Returns the final state, or None when the document
+    could not be read.
+    """
+    def report(step: str, status: str, message: str = ""):
+        if on_status:
+            on_status(step, status, message)
+
+    for step_key, _, _ in WORKFLOW_STEPS:
+        report(step_key, "pending")
+
+    state, stage, completed_stage = resume_from_checkpoint(create_initial_state(file_path), "reader", run_id)
+    if completed_stage:
+        print(f"♻️ Resuming run {run_id} after stage: {completed_stage}")
+        resumed_step = STAGE_STEPS[stage] if stage else None
+        for step_key, _, _ in WORKFLOW_STEPS:
+            if step_key == resumed_step:
+                break
+            report(step_key, "completed", "Restored from checkpoint")
+
+    profiler = RunProfiler(new_run_name(run_id)) if profile or is_profiling_enabled() else None
+    return run_stages(state, stage, llm, report, run_id, source, speculative, split_documents, profiler,
+                      related_events)
+
+
+def resume_from_checkpoint(state: AgentState, first_stage: str,
+                           run_id: Optional[str]) -> Tuple[AgentState, Optional[str], Optional[str]]:
+    """Return (state, next_stage, completed_stage), restored from the run's latest checkpoint if any."""
+    checkpoint = load_latest_checkpoint(run_id) if run_id else None
+    if not checkpoint:
+        return state, first_stage, None
+
+    completed_stage, restored_state = checkpoint
+    if any(not get_text_store().exists(ref) for ref in state_text_refs(restored_state)):
+        # The text was discarded by a finished run of the same document; start over
+        print(f"♻️ Text of run {run_id} is gone, restarting from stage: {first_stage}")
+        return state, first_stage, None
+    return restored_state, get_next_stage(completed_stage, restored_state), completed_stage
+
+
+def run_stages(state: AgentState, stage: Optional[str], llm, report: StatusCallback,
+               run_id: Optional[str] = None, source: PdfSource = None,
+               speculative: bool = False, split_documents: bool = False,
+               profiler: Optional[RunProfiler] = None, related_events: bool = False) -> Optional[AgentState]:
+    """Run workflow stages starting at stage until the workflow is done."""
+    # Sub-document stages are profiled as e.g. "part2_analyzer"
+    part_match = SUB_DOCUMENT_PATH_PATTERN.search(state.get("file_path", ""))
+    part = part_match.group(1) if part_match else ""
+    while stage:
+        step = STAGE_STEPS[stage]
+        speculative_output = None
+        if stage in TEXT_STAGES and not get_text_store().exists(state.get("content_ref", "")):
+            # Without its text the document can't be analyzed or reviewed; a retry rereads the PDF
+            report(step, "error", "Document text is missing")
+            return None
+        try:
+            with profile_section(profiler, f"{part}_{stage}" if part else stage):
+                if stage == "segmenter":
+                    if split_documents:
+                        state = run_sub_documents(state, llm, report, run_id, speculative, profiler,
+                                                  related_events)
+                elif stage == "reviewer" and speculative:
+                    state, speculative_output = run_speculative_review(state, llm, report)
+                else:
+                    state = run_stage(stage, state, llm, report, source)
+                    if related_events and stage in ("analyzer", "reanalyzer") and state:
+                        # Looked up before the review, so speculative formatting sees them too
+                        state = {**state, "related_events": find_related_events(state)}
+        except Exception as e:
+            # Completed stages stay checkpointed, so a rerun resumes from here
+            report(step, "error", f"Error: {str(e)}")
+            raise
+
+        if state is None:
+            return None
+        if run_id:
+            save_checkpoint(run_id, stage, state)
+        stage = get_next_stage(stage, state)
+
+        if stage == "formatter" and speculative_output is not None:
+            # The review passed, so the speculative formatting is committed
+            state = {**state, "formatted_output": speculative_output}
+            report("formatter", "completed", "Chronology formatted successfully (speculative)")
+            if run_id:
+                save_checkpoint(run_id, "formatter", state)
+            stage = None
+
+    return state
+
+
+def run_sub_documents(state: AgentState, llm, report: StatusCallback,
+                      run_id: Optional[str] = None, speculative: bool = False,
+                      profiler: Optional[RunProfiler] = None, related_events: bool = False) -> AgentState:
+    """Split a bundled document and run the remaining stages for each part concurrently.
+
+    Returns the state unchanged when the document holds a single document, and
+    None when a part could not be processed. Otherwise the parts are stored in sub_documents and their chronology entries
+    are combined in date order.
+    """
+    pdf_content = load_pdf_content(state)
+    segments = segment_document(pdf_content)
+    if len(segments) < 2:
+        return state
+
+    part_count = len(segments)
+    print(f"✂️ Split {state['file_path']} into {part_count} sub-documents")
+    report("reader", "completed", f"Loaded {state.get('content_length', 0):,} characters, "
+                                  f"split into {part_count} documents")
+
+    text_store = get_text_store()
+    sub_states = []
+    for part_number, segment in enumerate(segments, 1):
+        part_text = pdf_content[segment.start:segment.end]
+        sub_states.append({
+            **create_initial_state(f"{state['file_path']}#part{part_number}"),
+            "content_ref": text_store.put(part_text),
+            "content_length": len(part_text)
+        })
+    del pdf_content
+
+    def run_part(part_number: int, sub_state: AgentState) -> AgentState:
+        def part_report(step: str, status: str, message: str = ""):
+            # Parts only report progress; completion is reported for all parts at once
+            if status in ("running", "error"):
+                report(step, "running", f"[Part {part_number}/{part_count}] {message}")
+
+        # Part checkpoints live inside the parent run directory and are cleared with it
+        part_run_id = f"{run_id}/part{part_number}" if run_id else None
+        sub_state, stage, _ = resume_from_checkpoint(sub_state, "analyzer", part_run_id)
+        return run_stages(sub_state, stage, llm, part_report, part_run_id,
+                          speculative=speculative, profiler=profiler, related_events=related_events)
+
+    with ThreadPoolExecutor(max_workers=min(part_count, MAX_PARALLEL_SUB_DOCUMENTS)) as executor:
+        sub_documents = list(executor.map(run_part, range(1, part_count + 1), sub_states))
+    if any(sub_state is None for sub_state in sub_documents):
+        # A part lost its text; the whole document fails so a retry resplits it
+        return None
+
+    # Undated parts are listed after the dated ones, keeping their order
+    ordered = sorted(sub_documents, key=lambda sub_state: sub_state["document_data"].document_date or "9999")
+    formatted_output = "\n\n".join(
+        sub_state["formatted_output"] for sub_state in ordered if sub_state.get("formatted_output")
+    )
+
+    for step_key in ("analyzer", "reviewer", "formatter"):
+        report(step_key, "completed", f"Processed {part_count} sub-documents")
+
+    return {
+        **state,
+        "sub_documents": sub_documents,
+        "formatted_output": formatted_output,
+        "is_complete": all(sub_state.get("is_complete", False) for sub_state in sub_documents)
+    }
+
+
+def run_speculative_review(state: AgentState, llm, report: StatusCallback) -> Tuple[AgentState, Optional[str]]:
+    """Review the document data while formatting it concurrently.
+
+    Returns the reviewed state and the speculative formatted output. The output is
+    None when the review requested another analysis or the formatting failed.
+    """
+    executor = ThreadPoolExecutor(max_workers=1)
+    try:
+        report("formatter", "running", "Formatting speculatively during review...")
+        format_future = executor.submit(document_formatter_node, state, resolve_llm(llm, "formatter", state))
+
+        state = run_stage("reviewer", state, llm, report)
+
+        if get_next_stage("reviewer", state) != "formatter":
+            # The document data will change, so the formatting is discarded
+            format_future.cancel()
+            report("formatter", "pending", "Speculative formatting discarded")
+            return state, None
+
+        try:
+            return state, format_future.result()["formatted_output"]
+        except Exception as e:
+            print(f"❌ Speculative formatting failed: {e}")
+            return state, None
+    finally:
+        # Never block on a formatting call whose result is discarded
+        executor.shutdown(wait=False)
+
+
+def run_stage(stage: str, state: AgentState, llm, report: StatusCallback,
+              source: PdfSource = None) -> Optional[AgentState]:
+    """Run a single workflow stage and report its progress."""
+    if stage == "reader":
+        report("reader", "running", "Loading PDF document...")
+        state = document_reader_node(state, source)
+
+        if state.get("content_ref"):
+            char_count = state.get("content_length", 0)
+            report("reader", "completed", f"Successfully loaded {char_count:,} characters")
+            return state
+
+        report("reader", "error", "Failed to load PDF content")
+        return None
+
+    if stage == "analyzer":
+        stage_llm = resolve_llm(llm, stage, state, load_pdf_content(state, TYPE_DETECTION_CHARS))
+        report("analyzer", "running", f"Analyzing document with AI ({get_model_name(stage_llm)})...")
+        state = document_analyzer_node(state, stage_llm)
+
+        doc_data = state.get("document_data", DocumentData())
+        if doc_data.document_type:
+            report("analyzer", "completed", f"Extracted {doc_data.document_type} document data")
+        else:
+            report("analyzer", "error", "Failed to extract document data")
+        return state
+
+    if stage == "reanalyzer":
+        retry_count = state.get("retry_count", 0)
+        stage_llm = resolve_llm(llm, stage, state)
+        report("reviewer", "running",
+               f"Retry {retry_count}/{MAX_REVIEW_RETRIES} - Re-analyzing ({get_model_name(stage_llm)})...")
+        return document_analyzer_node(state, stage_llm)
+
+    if stage == "reviewer":
+        stage_llm = resolve_llm(llm, stage, state)
+        if stage_llm is None:
+            # The review is optional, e.g. when a usage budget is nearly used up
+            report("reviewer", "completed", "Review skipped")
+            return {**state, "review_feedback": "Review skipped to stay within the usage budget.", "is_complete": True}
+
+        report("reviewer", "running", f"Reviewing data quality ({get_model_name(stage_llm)})...")
+        state = reflection_node(state, stage_llm)
+
+        if state.get("is_complete", False):
+            report("reviewer", "completed", "Data quality review passed")
+        elif state.get("retry_count", 0) > MAX_REVIEW_RETRIES:
+            report("reviewer", "completed", "Completed with maximum retries")
+        return state
+
+    if stage == "formatter":
+        stage_llm = resolve_llm(llm, stage, state)
+        # Without a model the formatter falls back to its template
+        model_name = get_model_name(stage_llm) if stage_llm is not None else "template"
+        report("formatter", "running", f"Formatting chronology output ({model_name})...")
+        state = document_formatter_node(state, stage_llm)
+
+        if state.get("formatted_output"):
+            report("formatter", "completed", "Chronology formatted successfully")
+        else:
+            report("formatter", "error", "Failed to format output")
+        return state
+
+    raise ValueError(f"Unknown workflow stage: {stage}")
@@ -1,4 +1,5 @@
 from datetime import datetime
+from typing import List
 
 from langchain_core.messages import HumanMessage, SystemMessage
 from langchain_core.tools import tool
@@ -53,7 +54,7 @@ def format_date_legal(date_str: str) -> str:
 
 
 @tool
-def format_document_chronology_llm(document_data: DocumentData, llm) -> str:
+def format_document_chronology_llm(document_data: DocumentData, llm, related_events: List[str] = None) -> str:
     """Format document data into formal legal chronological narrative using LLM."""
     if not document_data.document_date or (not document_data.document_senderparty and not document_data.document_recipientparty):
         return "Insufficient data for formatting"
@@ -91,6 +92,13 @@ def format_document_chronology_llm(document_data: DocumentData, llm) -> str:
     else:
         formatted_reference = main_reference or document_type or "Unknown Reference"
 
+    # Similar documents from the embedding index, as context only
+    related_events_info = ""
+    if related_events:
+        related_events_info = "Related Events (other documents in the project record, for context only):\n" + "\n".join(
+            f"    - {event}" for event in related_events
+        )
+
     # Prepare data summary for LLM
     data_summary = f"""
     Document Type: {document_data.document_type}
@@ -99,12 +107,14 @@ def format_document_chronology_llm(document_data: DocumentData, llm) -> str:
     Document Sender Parties: {', '.join(sender_parties_info) if sender_parties_info else 'None'}
     Document Recipient Parties: {', '.join(recipient_parties_info) if recipient_parties_info else 'None'}
     Document Main Reference: {document_data.document_mainreference}
+    {related_events_info}
 
     FORMATTING INSTRUCTIONS:
     - Use the required format structure (use ROLE not name):
     "On {formatted_date}, {sender_party_role} sent {document_data.document_type} to the {recipient_party_role} [ENHANCED DESCRIPTION], via ref. {formatted_reference}."
     - Ensure the narrative flows naturally and professionally
     - The reference "{formatted_reference}" has been intelligently formatted to avoid duplication
+    - Mention a related event only where this document responds to or refers to it
     """
 
     messages = [
@@ -133,7 +143,8 @@ def document_formatter_node(state: AgentState, llm=None) -> AgentState:
     if llm:
         formatted_output = format_document_chronology_llm.invoke({
             "document_data": document_data,
-            "llm": llm
+            "llm": llm,
+            "related_events": state.get("related_events") or []
         })
     else:
         # Fallback to basic formatting
@@ -17,12 +17,42 @@ class DocumentData(BaseModel):
     document_mainreference: str = ""
     document_otherreferences: List[str] = []  # List of other references mentioned in the document
 
+# Structured verdict of the reflection review
+class ReviewVerdict(BaseModel):
+    status: str = "INCOMPLETE"  # COMPLETE or INCOMPLETE
+    missing_fields: List[str] = []  # Fields with missing or incomplete information, with details
+
 # Creating a class for the agent state
+# The document text lives in the text store; the state only holds its reference.
+# A plain dict rather than a slotted record: with the text out of the state, a
+# document's record is ~270 bytes (~110 slotted) next to ~2.3 KB of field values
+# that every copy shares, and each node's copy replaces the previous one.
 class AgentState(TypedDict):
     file_path: str
-    pdf_content: str
+    content_ref: str
+    content_length: int
     document_data: DocumentData
     review_feedback: str
     formatted_output: str
     is_complete: bool
     retry_count: int
+    sub_documents: List["AgentState"]  # Parts of a bundled PDF, each with its own data
+    related_events: List[str]  # Similar indexed documents, given to the formatter as context
+
+
+def serialize_state(state: AgentState) -> dict:
+    """Convert an agent state into a JSON-serializable dictionary."""
+    data = dict(state)
+    document_data = data.get("document_data")
+    if isinstance(document_data, DocumentData):
+        data["document_data"] = document_data.model_dump()
+    data["sub_documents"] = [serialize_state(sub_state) for sub_state in data.get("sub_documents") or []]
+    return data
+
+
+def deserialize_state(data: dict) -> AgentState:
+    """Rebuild an agent state from a dictionary produced by serialize_state."""
+    state = dict(data)
+    state["document_data"] = DocumentData(**(state.get("document_data") or {}))
+    state["sub_documents"] = [deserialize_state(sub_state) for sub_state in state.get("sub_documents") or []]
+    return state
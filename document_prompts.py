@@ -0,0 +1,171 @@
+"""
+Prompts for the document analysis and review stages.
+Every analysis and review call for a document starts with the same messages: the
+static instructions for both stages, then the document text. Only the last
+message is stage-specific, so provider prompt caching (Groq) and Ollama's KV
+cache reuse the shared prefix on the second and later calls for a document.
+Keep anything that varies per call out of the prefix.
+"""
+from typing import List
+
+from langchain_core.messages import BaseMessage, HumanMessage, SystemMessage
+
+ANALYZE_PROMPT = '''
+ANALYSIS INSTRUCTIONS (TASK: ANALYZE)
+Extract ALL available information from the document with maximum completeness and accuracy.
+
+STEP-BY-STEP ANALYSIS PROCESS:
+
+STEP 1: PARTY IDENTIFICATION AND ROLE ANALYSIS
+Carefully identify each party mentioned in the document and categorize them:
+- Read through the document systematically
+- Identify who is SENDING/WRITING the document (document_senderparty)
+- Identify who is RECEIVING the document (document_recipientparty)
+- For each party, determine their detailed role based on:
+  * How they are addressed or referenced in the document
+  * Their organizational context (company type, department, division)
+  * Their specific actions, responsibilities, or authority mentioned
+  * Their relationship to the project (owner, contractor, consultant, etc.)
+  * Common industry roles with specific functions (Design Engineer, Project Manager, Construction Manager, Architect, Client Representative, etc.)
+
+STEP 2: COMPREHENSIVE DATA EXTRACTION
+Extract the following information comprehensively:
+
+1. Document Type: Identify precisely (letter, email, RFI, IR, submittal, transmittal, VO, SWI, drawing, notice, claim, response, approval, rejection, request, report, minutes, schedule, or other)
+2. Document Date: Format as YYYY-MM-DD (extract from headers, content, or signatures)
+3. Document Description: Provide a COMPLETE, detailed description following the document's natural order and flow - DO NOT summarize, reorder, or truncate
+4. Document Parties: Categorize into sender and recipient parties with detailed roles
+5. Document Reference: Extract ALL reference numbers, codes, identifiers, project numbers, file numbers, version numbers
+
+CRITICAL REQUIREMENTS:
+- Think step by step when identifying parties and their roles
+- Extract EVERY piece of information available - leave nothing out
+- Be thorough and exhaustive in your analysis
+- FOLLOW THE DOCUMENT'S NATURAL ORDER AND SEQUENCE when creating the description
+- Include context, background, and implications mentioned in their original position
+- Capture all dates, deadlines, and time references as they appear chronologically
+- Include all parties mentioned in any context with their specific roles
+- Extract all reference numbers and identifiers
+- Do not summarize, reorder, or provide abbreviated descriptions - maintain the document's narrative flow
+
+Format as JSON with the following detailed field specifications:
+
+{
+  "document_type": "Precise document type classification (letter, email, RFI, IR, submittal, transmittal, VO, SWI, drawing, notice, claim, response, approval, rejection, request, report, minutes, schedule, memo, contract, agreement, specification, or other specific type)",
+
+  "document_date": "Document date in YYYY-MM-DD format. Extract from document headers, date fields, signatures, or content. If multiple dates exist, use the primary document date (creation/issue date)",
+
+  "document_description": "COMPLETE and COMPREHENSIVE narrative summary of the entire document following the EXACT ORDER and flow of the original document. Structure the summary chronologically as it appears in the document, including ALL of the following in their natural sequence: document opening/header context, document purpose and objective stated at the beginning, background information as presented, detailed description of all requests or decisions made in order, specific actions required or taken as they appear, deadlines and timelines mentioned throughout, technical specifications or requirements in sequence, financial implications if any, project phases or milestones as referenced, consequences or impacts discussed, and closing statements or next steps. This should read like a complete chronological narrative that follows the document's structure from beginning to end - DO NOT reorder, summarize, or abbreviate any content",
+
+  "document_senderparty": [
+    {
+      "name": "Full name of the sending organization, department, or individual (e.g., 'ABC Construction Company', 'Engineering Department', 'John Smith, Project Manager')",
+      "role": "Detailed role description including their function and responsibility in this communication (e.g., 'Main Contractor responsible for construction execution', 'Design Engineer providing technical specifications', 'Project Owner requesting information', 'Consultant providing professional advice')"
+    }
+  ],
+
+  "document_recipientparty": [
+    {
+      "name": "Full name of the receiving organization, department, or individual (e.g., 'XYZ Development Corp', 'Project Management Office', 'Jane Doe, Architect')",
+      "role": "Detailed role description including their function and responsibility as recipient (e.g., 'Project Owner responsible for approvals', 'Consulting Engineer reviewing submissions', 'Contractor receiving instructions', 'Client making decisions')"
+    }
+  ],
+
+  "document_mainreference": "Main reference number, code, or identifier for the document. This should be the primary reference used to track or identify this document in project records",
+  "document_otherreferences": [
+    "List of other reference numbers, codes, or identifiers mentioned in the document that do not fit the main reference category. Include all relevant references that provide additional context or information related to the document"
+  ]
+
+}
+
+Guidelines for party role identification:
+- Consider the organizational context and industry standards
+- Look for titles, signatures, and letterheads for clues
+- Analyze the nature of communication (who is requesting, approving, responding)
+- Use common construction/project management roles when appropriate
+- Be specific about roles (e.g., "Design Engineer" vs just "Engineer")
+'''
+
+REVIEW_PROMPT = '''
+REVIEW INSTRUCTIONS (TASK: REVIEW)
+Act as a comprehensive quality assurance agent. Your role is to ensure NO information is missed and ALL data is completely extracted.
+
+Perform an exhaustive review of the extracted document data against the original document:
+
+COMPLETENESS CHECK:
+1. document_type - Must be specific and accurate (letter, email, RFI, IR, submittal, transmittal, VO, SWI, drawing, notice, claim, etc.)
+2. document_date - Must be in YYYY-MM-DD format and correctly extracted
+3. document_description - Must be COMPREHENSIVE, following the document's chronological order, and include ALL details, context, purpose, requests, decisions, implications
+4. document_senderparty - Must include EVERY sending organization, individual, role, title mentioned in the document
+5. document_recipientparty - Must include EVERY receiving organization, individual, role, title mentioned in the document
+6. document_mainreference - Must include the primary/main reference number, code, or identifier for the document
+7. document_otherreferences - Must include ALL other reference numbers, codes, project numbers, file numbers, version numbers mentioned
+
+THOROUGH ANALYSIS REQUIRED:
+- Scan for missed information in headers, footers, signatures, metadata
+- Check for implied or referenced information not captured
+- Verify all dates, deadlines, and time references are extracted
+- Ensure all communication patterns and responses are noted
+- Validate technical details, specifications, and requirements are included
+- Confirm cost, time, and resource implications are captured
+- Verify all sender parties (organizations/individuals sending the document) are identified with detailed roles
+- Verify all recipient parties (organizations/individuals receiving the document) are identified with detailed roles
+- Ensure the document description maintains chronological order as it appears in the original document
+- Confirm all main and other reference numbers/codes are captured separately
+
+REVIEW PROCESS:
+1. Compare extracted data line-by-line with original document
+2. Identify any missing information, no matter how small
+3. Check for incomplete descriptions or summaries that need expansion and ensure chronological order is maintained
+4. Verify all sender parties and recipient parties mentioned anywhere in the document are properly categorized
+5. Ensure the main reference and all other references/codes are captured
+6. Validate that the description follows the document's natural order and flow
+
+'''
+
+DOCUMENT_SYSTEM_PROMPT = f'''
+You are a specialized legal document analysis assistant with expertise in construction and project management documents. You will be given an ORIGINAL DOCUMENT and then a TASK: either ANALYZE the document, or REVIEW data extracted from it. Follow the instructions for that task.
+{ANALYZE_PROMPT}
+{REVIEW_PROMPT}'''
+
+ANALYZE_TASK = '''
+TASK: ANALYZE
+Extract the data of the ORIGINAL DOCUMENT above following the ANALYSIS INSTRUCTIONS.
+Only provide the json structure as output, do not include any additional text or explanations
+'''
+
+REVIEW_TASK = '''
+TASK: REVIEW
+Review the extracted data below against the ORIGINAL DOCUMENT above following the REVIEW INSTRUCTIONS.
+{data_summary}
+
+RESPONSE FORMAT:
+Respond with ONLY this JSON object, before any other text:
+{{"status": "COMPLETE" or "INCOMPLETE", "missing_fields": ["<field name>: <what is missing or needs more detail>", ...]}}
+
+If ANY information is missing, incomplete, or could be more detailed, use "INCOMPLETE" and list specific feedback for every gap in missing_fields.
+
+Only if the extraction is truly comprehensive and complete with NO missing information, use "COMPLETE" with an empty missing_fields list.
+
+Be extremely thorough - it is better to request more detail than to miss important information.
+'''
+
+
+def document_prefix_messages(pdf_content: str) -> List[BaseMessage]:
+    """The messages every analysis and review call for a document starts with."""
+    return [
+        SystemMessage(content=DOCUMENT_SYSTEM_PROMPT),
+        HumanMessage(content=f"ORIGINAL DOCUMENT:\n{pdf_content}")
+    ]
+
+
+def build_analysis_messages(pdf_content: str) -> List[BaseMessage]:
+    """Messages for analyzing a document: the shared prefix and the analysis task."""
+    return document_prefix_messages(pdf_content) + [HumanMessage(content=ANALYZE_TASK)]
+
+
+def build_review_messages(pdf_content: str, data_summary: str) -> List[BaseMessage]:
+    """Messages for reviewing extracted data: the shared prefix and the review task."""
+    return document_prefix_messages(pdf_content) + [
+        HumanMessage(content=REVIEW_TASK.format(data_summary=data_summary))
+    ]
@@ -1,17 +1,110 @@
-from langchain_community.document_loaders import PyPDFLoader
+import io
+import mmap
+import os
+from contextlib import contextmanager
+from typing import BinaryIO, Union
+
 from langchain_core.tools import tool
+from pypdf.errors import PdfReadError
 
 from document_models import AgentState, DocumentData
+from ocr import ocr_pages
+from pdf_backends import get_backend
+from text_store import get_text_store
 
+# A PDF can be read from a file path, an in-memory buffer or a binary stream
+PdfSource = Union[str, os.PathLike, bytes, bytearray, memoryview, BinaryIO]
 
-@tool
-def load_pdf_document(file_path: str) -> str:
-    """Load and extract text content from a PDF document."""
+# Pages with less text than this are treated as scans without a text layer
+MIN_PAGE_TEXT_CHARS = 20
+
+# Documents with less text than this after OCR are treated as unreadable
+MIN_DOCUMENT_TEXT_CHARS = 20
+
+# Typical OCR text length of a scanned page, used for estimates before OCR runs
+ESTIMATED_SCANNED_PAGE_CHARS = 2500
+
+# Same delimiter PyPDFLoader uses when joining pages in single mode
+PAGES_DELIMITER = "\n\f"
+
+
+class BufferStream(io.RawIOBase):
+    """Read-only, seekable stream over a buffer that never copies the whole buffer."""
+
+    def __init__(self, buffer: Union[bytes, bytearray, memoryview]):
+        super().__init__()
+        self._view = memoryview(buffer).cast("B")
+        self._position = 0
+
+    def readable(self) -> bool:
+        return True
+
+    def seekable(self) -> bool:
+        return True
+
+    def readinto(self, target) -> int:
+        chunk = self._view[self._position:self._position + len(target)]
+        target[:len(chunk)] = chunk
+        self._position += len(chunk)
+        return len(chunk)
+
+    def seek(self, offset: int, whence: int = io.SEEK_SET) -> int:
+        if whence == io.SEEK_CUR:
+            offset += self._position
+        elif whence == io.SEEK_END:
+            offset += len(self._view)
+        self._position = max(0, offset)
+        return self._position
+
+    def tell(self) -> int:
+        return self._position
+
+    def getbuffer(self) -> memoryview:
+        """Get the underlying buffer, like io.BytesIO.getbuffer()."""
+        return self._view
+
+
+@contextmanager
+def open_pdf_stream(source: PdfSource):
+    """Open a PDF source as a seekable binary stream without copying it.
+
+    File paths are memory-mapped, buffers are wrapped in place and streams are
+    used as they are.
+    """
+    if isinstance(source, (str, os.PathLike)):
+        with open(source, "rb") as pdf_file:
+            if os.fstat(pdf_file.fileno()).st_size == 0:
+                raise ValueError("PDF file is empty")
+            with mmap.mmap(pdf_file.fileno(), 0, access=mmap.ACCESS_READ) as mapped:
+                yield mapped
+    elif isinstance(source, (bytes, bytearray, memoryview)):
+        yield BufferStream(source)
+    else:
+        yield source
+
+
+def find_pages_without_text(pages: list) -> list:
+    """Return the numbers of pages that have no usable text layer."""
+    return [
+        page_number for page_number, page_text in enumerate(pages)
+        if len(page_text.strip()) < MIN_PAGE_TEXT_CHARS
+    ]
+
+
+def read_pdf_text(source: PdfSource) -> str:
+    """Extract the text of a PDF from a path or an in-memory buffer."""
     try:
-        loader = PyPDFLoader(file_path, mode="single")
-        docs = loader.load()
-        content = docs[0].page_content if docs else ""
-        return content
+        with open_pdf_stream(source) as stream:
+            pages = get_backend().extract_pages(stream)
+
+        # Only pages without a text layer are sent to OCR
+        missing_pages = find_pages_without_text(pages)
+        if missing_pages:
+            print(f"🖼️ {len(missing_pages)} of {len(pages)} page(s) have no text layer")
+            for page_number, page_text in ocr_pages(source, missing_pages).items():
+                pages[page_number] = page_text
+
+        return PAGES_DELIMITER.join(pages)
 
     except FileNotFoundError as e:
         error_msg = f"PDF file not found: {str(e)}"
@@ -19,37 +112,72 @@ def load_pdf_document(file_path: str) -> str:
     except PermissionError as e:
         error_msg = f"Permission denied accessing PDF: {str(e)}"
         return f"Error loading PDF: {error_msg}"
-    except (ImportError, ValueError, OSError) as e:
+    except (ImportError, ValueError, OSError, PdfReadError) as e:
         # Handle PDF parsing errors, dependency issues, and file system errors
         error_msg = f"Error processing PDF: {str(e)}"
         return f"Error loading PDF: {error_msg}"
 
 
-def document_reader_node(state: AgentState) -> AgentState:
-    """Read document and extract raw content."""
+def estimate_text_length(source: PdfSource) -> int:
+    """Estimate the extracted text length of a PDF without running OCR.
+
+    Pages without a text layer are counted as ESTIMATED_SCANNED_PAGE_CHARS.
+    """
+    with open_pdf_stream(source) as stream:
+        pages = get_backend().extract_pages(stream)
+
+    scanned_pages = find_pages_without_text(pages)
+    text_length = sum(len(page_text) for page_text in pages)
+    return text_length + len(scanned_pages) * ESTIMATED_SCANNED_PAGE_CHARS
+
+
+@tool
+def load_pdf_document(file_path: str) -> str:
+    """Load and extract text content from a PDF document."""
+    return read_pdf_text(file_path)
+
+
+def document_reader_node(state: AgentState, source: PdfSource = None) -> AgentState:
+    """Read document and extract raw content.
+
+    When source is given (e.g. an uploaded buffer) it is read directly and
+    file_path only names the document.
+    """
     file_path = state.get("file_path", "")
 
-    if not file_path:
+    if source is not None:
+        print(f"📖 Loading PDF from memory: {file_path}")
+        pdf_content = read_pdf_text(source)
+    elif file_path:
+        # Use the tool to load PDF content
+        print(f"📖 Loading PDF from: {file_path}")
+        pdf_content = load_pdf_document.invoke({"file_path": file_path})
+    else:
         error_msg = "No file path provided"
         print(f"⚠️ {error_msg}")
-        return {**state, "pdf_content": "", "is_complete": False}
-
-    # Use the tool to load PDF content
-    print(f"📖 Loading PDF from: {file_path}")
-    pdf_content = load_pdf_document.invoke({"file_path": file_path})
+        return {**state, "content_ref": "", "content_length": 0, "is_complete": False}
 
     # Check if content was successfully loaded
     is_error = pdf_content.startswith("Error loading PDF:")
     content_length = len(pdf_content) if not is_error else 0
 
+    if not is_error and len(pdf_content.strip()) < MIN_DOCUMENT_TEXT_CHARS:
+        # Scanned documents end up here when OCR is not installed
+        pdf_content = "Error loading PDF: No extractable text found (scanned document without OCR support?)"
+        is_error = True
+        content_length = 0
+
     if is_error:
         print(f"❌ {pdf_content}")
+        content_ref = ""
     else:
         print(f"📖 Loaded PDF: {content_length} characters")
+        content_ref = get_text_store().put(pdf_content) if pdf_content else ""
 
     return {
         **state,
-        "pdf_content": pdf_content,
+        "content_ref": content_ref,
+        "content_length": content_length,
         "document_data": DocumentData(),
         "is_complete": False,
         "retry_count": 0
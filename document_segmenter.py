@@ -0,0 +1,147 @@
+"""
+Segmentation of bundled PDFs into individual documents.
+Files such as exported email threads or letters with their replies contain
+several documents. Boundaries are detected from email header blocks, letter
+headers and explicit message separators so each part can be analyzed on its own.
+"""
+import re
+from typing import List, NamedTuple
+
+# Email timestamp lines, e.g. "Sat, 2 Nov 2024, 8:41 PM" or "Monday, January 13, 2025 10:05 AM"
+EMAIL_TIMESTAMP_PATTERN = re.compile(
+    r"^\s*(Mon|Tue|Wed|Thu|Fri|Sat|Sun)[a-z]*,?\s+"
+    r"(\d{1,2}\s+[A-Za-z]{3,9}|[A-Za-z]{3,9}\s+\d{1,2}),?\s+\d{4}"
+    r"(,?\s+(at\s+)?\d{1,2}:\d{2}(\s*[AP]M)?)\s*$",
+    re.IGNORECASE
+)
+
+# Also matches addresses wrapped across lines, e.g. "Youssef.Elsayed@pcp-"
+EMAIL_ADDRESS_PATTERN = re.compile(r"[\w.+-]@[\w-]|[\w.+-]@\s*$")
+
+# Explicit separators between messages
+SEPARATOR_PATTERNS = [
+    re.compile(r"^\s*-{2,}\s*(Original|Forwarded) Message\s*-{2,}\s*$", re.IGNORECASE),
+    re.compile(r"^\s*_{10,}\s*$"),
+    re.compile(r"^\s*On .{5,120} wrote:\s*$"),
+]
+
+# Header fields with a value on the same line, e.g. "Ref.: 0641-PCP-ENV-LET-0010"
+HEADER_FIELD_PATTERN = re.compile(
+    r"^\s*(?P<key>from|to|sent|date|subject|ref(erence)?(\.|/no)?|our ref\.?|cc)\s*:\s*\S",
+    re.IGNORECASE
+)
+
+# Lines searched after a header line for the rest of the header block
+HEADER_WINDOW_LINES = 8
+
+# Parts shorter than this are merged into the previous part
+MIN_SEGMENT_CHARS = 200
+
+
+class Segment(NamedTuple):
+    """A detected sub-document as a character range of the full text."""
+    start: int
+    end: int
+    reason: str
+
+
+def _normalize_header_key(key: str) -> str:
+    """Map header field variants such as "Ref.", "Ref/No" or "Our Ref" to one key."""
+    key = key.lower()
+    return "ref" if "ref" in key else key
+
+
+def _line_offsets(lines: List[str]) -> List[int]:
+    """Character offset of each line in the joined text."""
+    offsets = []
+    offset = 0
+    for line in lines:
+        offsets.append(offset)
+        offset += len(line) + 1
+    return offsets
+
+
+def _find_email_headers(lines: List[str]) -> List[int]:
+    """Find the first line of each email header block.
+
+    Exported emails show the sender and recipient addresses followed by a
+    timestamp; the block starts at the first of those address lines.
+    """
+    starts = []
+    for index, line in enumerate(lines):
+        if not EMAIL_TIMESTAMP_PATTERN.match(line):
+            continue
+
+        start = index
+        while start > 0 and EMAIL_ADDRESS_PATTERN.search(lines[start - 1]):
+            start -= 1
+        if start < index:
+            starts.append(start)
+    return starts
+
+
+def _find_header_blocks(lines: List[str]) -> List[int]:
+    """Find letter and email header blocks with values, such as From/To/Date or Ref/Date/Subject."""
+    starts = []
+    index = 0
+    while index < len(lines):
+        match = HEADER_FIELD_PATTERN.match(lines[index])
+        if not match:
+            index += 1
+            continue
+
+        keys = {_normalize_header_key(match.group("key"))}
+        window_end = min(len(lines), index + HEADER_WINDOW_LINES)
+        for other_line in lines[index + 1:window_end]:
+            other_match = HEADER_FIELD_PATTERN.match(other_line)
+            if other_match:
+                keys.add(_normalize_header_key(other_match.group("key")))
+
+        # A header needs a date plus a sender, recipient, subject or reference
+        if ("date" in keys or "sent" in keys) and len(keys) >= 2:
+            starts.append(index)
+            index = window_end
+        else:
+            index += 1
+    return starts
+
+
+def _find_separators(lines: List[str]) -> List[int]:
+    """Find explicit message separator lines."""
+    return [
+        index for index, line in enumerate(lines)
+        if any(pattern.match(line) for pattern in SEPARATOR_PATTERNS)
+    ]
+
+
+def segment_document(pdf_content: str) -> List[Segment]:
+    """Split document text into sub-documents. Always returns at least one segment."""
+    if not pdf_content:
+        return [Segment(0, 0, "empty")]
+
+    lines = pdf_content.split("\n")
+    offsets = _line_offsets(lines)
+
+    candidates = {}
+    for line_index in _find_header_blocks(lines):
+        candidates.setdefault(offsets[line_index], "header block")
+    for line_index in _find_separators(lines):
+        candidates.setdefault(offsets[line_index], "separator")
+    for line_index in _find_email_headers(lines):
+        candidates[offsets[line_index]] = "email header"
+
+    boundaries = [(0, "start")]
+    for offset in sorted(candidates):
+        # Headers at the very start, or too close to the previous boundary, don't split
+        if offset - boundaries[-1][0] >= MIN_SEGMENT_CHARS:
+            boundaries.append((offset, candidates[offset]))
+
+    # Merge a short trailing part into the previous one
+    if len(boundaries) > 1 and len(pdf_content) - boundaries[-1][0] < MIN_SEGMENT_CHARS:
+        boundaries.pop()
+
+    segments = []
+    for position, (start, reason) in enumerate(boundaries):
+        end = boundaries[position + 1][0] if position + 1 < len(boundaries) else len(pdf_content)
+        segments.append(Segment(start, end, reason))
+    return segments
@@ -0,0 +1,397 @@
+#!/usr/bin/env python3
+"""
+Local embedding index over processed documents.
+Each analyzed document contributes one chunk for its extracted data (type, date,
+references, parties and description) and one chunk per window of its text.
+Vectors are L2-normalized float32 rows appended to a file that is memory-mapped
+for search, so the index grows incrementally and a top-k query over 100k chunks
+is a blocked matrix-vector product on the CPU. Chunk text is not duplicated: it
+is read back from the text store by reference.
+
+Embeddings come from a feature-hashing embedder that needs no model, or from an
+Ollama embedding model with CHRONOLOGY_EMBEDDINGS=ollama:<model>, e.g.
+ollama:nomic-embed-text. An index only ever holds vectors of one embedder.
+
+Search from the command line with:
+    python embedding_index.py "variation order 25 chilled water" --top-k 5
+"""
+import argparse
+import json
+import os
+import re
+import threading
+import time
+import zlib
+from contextlib import contextmanager
+from typing import List, Optional, Tuple
+
+import numpy as np
+import requests
+
+from document_models import AgentState, DocumentData
+from llm_clients import DEFAULT_OLLAMA_BASE_URL, OLLAMA_KEEP_ALIVE
+from text_store import get_text_store
+
+try:
+    import fcntl
+except ImportError:
+    fcntl = None
+
+INDEX_DIR = os.getenv("CHRONOLOGY_INDEX_DIR", ".chronology_index")
+EMBEDDINGS = os.getenv("CHRONOLOGY_EMBEDDINGS", "hashing")
+
+# Dimensions of the feature-hashing embedder
+HASHING_DIMENSIONS = 512
+
+# Characters per text chunk, and the overlap between neighbouring chunks
+CHUNK_CHARS = 1500
+CHUNK_OVERLAP = 200
+
+# Rows scored per block, bounding the memory a search touches at once
+SEARCH_BLOCK_ROWS = 65536
+
+# Related events given to the formatter, and the similarity they need
+RELATED_EVENTS = 3
+MIN_RELATED_SCORE = 0.35
+
+# Words and references such as 0641-PCP-ENV-VO-0025 or 2024/11/20
+TOKEN_PATTERN = re.compile(r"[a-z0-9]+(?:[-/.][a-z0-9]+)*")
+
+DESCRIPTION = "description"
+CONTENT = "content"
+
+
+def normalize_rows(vectors: np.ndarray) -> np.ndarray:
+    """Scale rows to unit length, so dot products are cosine similarities."""
+    norms = np.linalg.norm(vectors, axis=1, keepdims=True)
+    return (vectors / np.maximum(norms, 1e-12)).astype(np.float32)
+
+
+class HashingEmbedder:
+    """Hashes words and word pairs into a fixed number of signed dimensions.
+
+    Needs no model or network and is deterministic across processes. It matches
+    shared vocabulary and references rather than meaning.
+    """
+
+    def __init__(self, dimensions: int = HASHING_DIMENSIONS):
+        self.dimensions = dimensions
+        self.name = f"hashing-{dimensions}"
+
+    def embed(self, texts: List[str]) -> np.ndarray:
+        vectors = np.zeros((len(texts), self.dimensions), dtype=np.float32)
+        for row, text in enumerate(texts):
+            tokens = TOKEN_PATTERN.findall(text.lower())
+            for feature in tokens + [f"{first} {second}" for first, second in zip(tokens, tokens[1:])]:
+                # crc32 rather than hash(), which differs between processes
+                feature_hash = zlib.crc32(feature.encode("utf-8"))
+                vectors[row, feature_hash % self.dimensions] += 1.0 if feature_hash & 0x80000000 else -1.0
+        # Damp repeated words so long chunks aren't dominated by them
+        return normalize_rows(np.sign(vectors) * np.log1p(np.abs(vectors)))
+
+
+class OllamaEmbedder:
+    """Embeds texts with an Ollama embedding model."""
+
+    def __init__(self, model_name: str, base_url: str = None):
+        self.model_name = model_name
+        self.base_url = (base_url or os.getenv("OLLAMA_BASE_URL") or DEFAULT_OLLAMA_BASE_URL).rstrip("/")
+        self.name = f"ollama-{model_name}"
+
+    def embed(self, texts: List[str]) -> np.ndarray:
+        response = requests.post(
+            f"{self.base_url}/api/embed",
+            json={"model": self.model_name, "input": texts, "keep_alive": OLLAMA_KEEP_ALIVE},
+            timeout=300
+        )
+        response.raise_for_status()
+        return normalize_rows(np.asarray(response.json()["embeddings"], dtype=np.float32))
+
+
+def get_embedder(spec: str = None):
+    """Create the embedder named by spec or CHRONOLOGY_EMBEDDINGS: 'hashing' or 'ollama:<model>'."""
+    spec = spec or EMBEDDINGS
+    if spec.startswith("ollama:"):
+        return OllamaEmbedder(spec.split(":", 1)[1])
+    if spec == "hashing":
+        return HashingEmbedder()
+    raise ValueError(f"Unknown embeddings: {spec}")
+
+
+def chunk_spans(text: str) -> List[Tuple[int, int]]:
+    """Split text into overlapping (start, end) windows, ending at whitespace where possible."""
+    spans = []
+    start = 0
+    while start < len(text):
+        end = min(start + CHUNK_CHARS, len(text))
+        if end < len(text):
+            boundary = text.rfind(" ", start + CHUNK_CHARS // 2, end)
+            end = boundary if boundary > 0 else end
+        spans.append((start, end))
+        if end >= len(text):
+            break
+        start = max(end - CHUNK_OVERLAP, start + 1)
+    return spans
+
+
+def describe_document(document_data: DocumentData) -> str:
+    """The text embedded for a document's extracted data."""
+    parties = [f"{party.name} ({party.role})"
+               for party in document_data.document_senderparty + document_data.document_recipientparty]
+    return "\n".join([
+        f"{document_data.document_type} {document_data.document_date} {document_data.document_mainreference}",
+        f"References: {', '.join(document_data.document_otherreferences)}",
+        f"Parties: {', '.join(parties)}",
+        document_data.document_description
+    ])
+
+
+class EmbeddingIndex:
+    """Append-only vector index stored in index_dir.
+
+    vectors.f32 holds the vectors as rows, chunks.jsonl one metadata line per row
+    and index.json the embedder. Writers in other processes are serialized with a
+    lock file; a row only counts once its metadata line is written.
+    """
+
+    def __init__(self, index_dir: str = None, embedder=None):
+        self.index_dir = index_dir or INDEX_DIR
+        self.embedder = embedder or get_embedder()
+        self.vectors_path = os.path.join(self.index_dir, "vectors.f32")
+        self.chunks_path = os.path.join(self.index_dir, "chunks.jsonl")
+        self.header_path = os.path.join(self.index_dir, "index.json")
+        self.lock_path = os.path.join(self.index_dir, ".lock")
+
+        self.chunks: List[dict] = []
+        self._chunks_offset = 0
+        self._keys = np.empty(0, dtype=object)
+        self._kinds = np.empty(0, dtype=object)
+        # Reentrant, since writers refresh while holding it
+        self._lock = threading.RLock()
+
+    @contextmanager
+    def _write_lock(self):
+        os.makedirs(self.index_dir, exist_ok=True)
+        with self._lock, open(self.lock_path, "a") as lock_file:
+            if fcntl:
+                fcntl.flock(lock_file, fcntl.LOCK_EX)
+            yield
+
+    def _dimensions(self) -> Optional[int]:
+        """Vector dimensions of the index, or None while it is empty.
+
+        Raises ValueError when the index was built with a different embedder.
+        """
+        try:
+            with open(self.header_path, encoding="utf-8") as header_file:
+                header = json.load(header_file)
+        except FileNotFoundError:
+            return None
+        if header["embedder"] != self.embedder.name:
+            raise ValueError(f"The index in {self.index_dir} was built with {header['embedder']}, not "
+                             f"{self.embedder.name}. Delete it or set CHRONOLOGY_EMBEDDINGS to match.")
+        return header["dimensions"]
+
+    def refresh(self):
+        """Load metadata lines added since the last refresh, including by other processes."""
+        with self._lock:
+            if not os.path.exists(self.chunks_path):
+                return
+            with open(self.chunks_path, "rb") as chunks_file:
+                chunks_file.seek(self._chunks_offset)
+                data = chunks_file.read()
+            # A line being written by another process is picked up next time
+            complete = data[:data.rfind(b"\n") + 1]
+            if not complete:
+                return
+            new_chunks = [json.loads(line) for line in complete.splitlines()]
+            self.chunks.extend(new_chunks)
+            self._chunks_offset += len(complete)
+            self._keys = np.concatenate([self._keys, np.array([chunk["key"] for chunk in new_chunks], dtype=object)])
+            self._kinds = np.concatenate([self._kinds, np.array([chunk["kind"] for chunk in new_chunks], dtype=object)])
+
+    def has_document(self, key: str) -> bool:
+        self.refresh()
+        return bool(len(self._keys)) and bool((self._keys == key).any())
+
+    def add_document(self, key: str, texts: List[str], chunks: List[dict]) -> int:
+        """Embed and append the chunks of a document unless its key is indexed. Returns the chunks added."""
+        if not texts or self.has_document(key):
+            return 0
+
+        vectors = self.embedder.embed(texts)
+        with self._write_lock():
+            dimensions = self._dimensions()
+            self.refresh()
+            if (self._keys == key).any():
+                return 0
+
+            if dimensions is None:
+                dimensions = vectors.shape[1]
+                temp_path = f"{self.header_path}.{os.getpid()}.tmp"
+                with open(temp_path, "w", encoding="utf-8") as header_file:
+                    json.dump({"embedder": self.embedder.name, "dimensions": dimensions}, header_file)
+                os.replace(temp_path, self.header_path)
+
+            # Drop vectors of a write that crashed before its metadata was written
+            row_bytes = dimensions * np.dtype(np.float32).itemsize
+            with open(self.vectors_path, "ab") as vectors_file:
+                vectors_file.truncate(len(self.chunks) * row_bytes)
+                vectors_file.write(vectors.tobytes())
+            with open(self.chunks_path, "a", encoding="utf-8") as chunks_file:
+                for chunk in chunks:
+                    chunks_file.write(json.dumps({**chunk, "key": key}) + "\n")
+        return len(chunks)
+
+    def search(self, query: str, top_k: int = 5, kinds: Tuple[str, ...] = None, exclude_key: str = None,
+               per_document: bool = False, min_score: float = -1.0) -> List[dict]:
+        """Find the chunks most similar to a query.
+
+        kinds restricts the chunk kinds searched, exclude_key skips one document
+        and per_document keeps only the best chunk of each document. Results are
+        chunk metadata with a 'score', best first.
+        """
+        self.refresh()
+        row_count = len(self.chunks)
+        dimensions = self._dimensions()
+        if row_count == 0 or dimensions is None:
+            return []
+
+        query_vector = self.embedder.embed([query])[0]
+        vectors = np.memmap(self.vectors_path, dtype=np.float32, mode="r", shape=(row_count, dimensions))
+        scores = np.empty(row_count, dtype=np.float32)
+        for start in range(0, row_count, SEARCH_BLOCK_ROWS):
+            scores[start:start + SEARCH_BLOCK_ROWS] = vectors[start:start + SEARCH_BLOCK_ROWS] @ query_vector
+        del vectors
+
+        if kinds:
+            scores[~np.isin(self._kinds[:row_count], kinds)] = -np.inf
+        if exclude_key:
+            scores[self._keys[:row_count] == exclude_key] = -np.inf
+
+        if per_document:
+            order = np.argsort(-scores)
+        else:
+            candidates = min(top_k, row_count)
+            order = np.argpartition(-scores, candidates - 1)[:candidates]
+            order = order[np.argsort(-scores[order])]
+
+        results = []
+        seen_keys = set()
+        for row in order:
+            score = float(scores[row])
+            if score < min_score or len(results) >= top_k:
+                break
+            chunk = self.chunks[row]
+            if per_document:
+                if chunk["key"] in seen_keys:
+                    continue
+                seen_keys.add(chunk["key"])
+            results.append({**chunk, "score": score})
+        return results
+
+    def __len__(self) -> int:
+        self.refresh()
+        return len(self.chunks)
+
+
+_default_index: Optional[EmbeddingIndex] = None
+_default_index_lock = threading.Lock()
+
+
+def get_index() -> EmbeddingIndex:
+    """Get the process-wide embedding index."""
+    global _default_index
+    with _default_index_lock:
+        if _default_index is None:
+            _default_index = EmbeddingIndex()
+        return _default_index
+
+
+def chunk_text(chunk: dict) -> str:
+    """The text of a search result: the description, or the chunk's window of the document text."""
+    if chunk["kind"] == DESCRIPTION:
+        return chunk["description"]
+    return get_text_store().get(chunk["content_ref"])[chunk["start"]:chunk["end"]]
+
+
+def index_state(state: AgentState, document_name: str, job_id: str = "", index: EmbeddingIndex = None) -> int:
+    """Index an analyzed document, or each part of a split one. Returns the chunks added."""
+    index = index or get_index()
+    sub_documents = state.get("sub_documents") or []
+    if sub_documents:
+        return sum(
+            index_state(sub_state, f"{document_name} (part {part_number})", job_id, index)
+            for part_number, sub_state in enumerate(sub_documents, 1)
+        )
+
+    document_data = state.get("document_data") or DocumentData()
+    content_ref = state.get("content_ref", "")
+    if not document_data.document_type or not content_ref:
+        return 0
+
+    # Identical texts share a reference, so a resubmitted document is indexed once
+    if index.has_document(content_ref):
+        return 0
+
+    document = {
+        "document": document_name,
+        "job_id": job_id,
+        "content_ref": content_ref,
+        "document_type": document_data.document_type,
+        "document_date": document_data.document_date,
+        "document_mainreference": document_data.document_mainreference
+    }
+    texts = [describe_document(document_data)]
+    chunks = [{**document, "kind": DESCRIPTION, "description": document_data.document_description}]
+
+    pdf_content = get_text_store().get(content_ref)
+    for start, end in chunk_spans(pdf_content):
+        texts.append(pdf_content[start:end])
+        chunks.append({**document, "kind": CONTENT, "start": start, "end": end})
+    return index.add_document(content_ref, texts, chunks)
+
+
+def find_related_events(state: AgentState, top_k: int = RELATED_EVENTS, index: EmbeddingIndex = None) -> List[str]:
+    """Describe the indexed documents most similar to a document's extracted data, for the formatter."""
+    document_data = state.get("document_data") or DocumentData()
+    if not document_data.document_type:
+        return []
+
+    try:
+        index = index or get_index()
+        results = index.search(describe_document(document_data), top_k, kinds=(DESCRIPTION,),
+                               exclude_key=state.get("content_ref"), per_document=True, min_score=MIN_RELATED_SCORE)
+    except (OSError, ValueError, requests.RequestException) as e:
+        # Related events are optional context, so formatting goes ahead without them
+        print(f"⚠️ Related event lookup failed: {e}")
+        return []
+    return [
+        f"{result['document_date'] or 'Undated'} - {result['document_type']} "
+        f"{result['document_mainreference']}: {result['description']}"
+        for result in results
+    ]
+
+
+def main():
+    """Search the embedding index."""
+    parser = argparse.ArgumentParser(description="Search processed documents")
+    parser.add_argument("query", help="Text to search for")
+    parser.add_argument("--top-k", type=int, default=5, help="Number of results")
+    parser.add_argument("--descriptions", action="store_true", help="Only search extracted descriptions")
+    args = parser.parse_args()
+
+    index = get_index()
+    start = time.perf_counter()
+    results = index.search(args.query, args.top_k, kinds=(DESCRIPTION,) if args.descriptions else None)
+    elapsed = time.perf_counter() - start
+
+    print(f"🔎 {len(results)} result(s) from {len(index):,} chunks in {elapsed * 1000:.1f} ms")
+    for result in results:
+        excerpt = " ".join(chunk_text(result).split())[:200]
+        print(f"{result['score']:.3f}  {result['document']} [{result['kind']}] "
+              f"{result['document_type']} {result['document_mainreference']}\n       {excerpt}")
+
+
+if __name__ == "__main__":
+    main()
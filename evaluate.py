@@ -0,0 +1,359 @@
+#!/usr/bin/env python3
+"""
+Accuracy-vs-latency evaluation of models and pipeline modes.
+Runs the workflow on the documents of a gold-label file under each configuration
+(model x pipeline mode) and scores the extracted DocumentData field by field,
+alongside wall time, tokens and cost per document. Configurations that no other
+configuration beats on accuracy, latency and tokens at once form the Pareto
+front; the fastest configuration above --min-accuracy is recommended.
+
+Run with:
+    python evaluate.py --provider groq --models llama-3.1-8b-instant,llama-3.3-70b-versatile \
+        --modes full,speculative,no_review,fast --min-accuracy 0.9
+"""
+import argparse
+import json
+import os
+import re
+import time
+from typing import Callable, Dict, List, Optional
+
+from chronology_pipeline import run_chronology_workflow
+from document_models import AgentState, DocumentData
+from llm_clients import DEFAULT_GROQ_MODEL, DEFAULT_OLLAMA_MODEL, create_llm
+from model_router import ModelRouter, resolve_llm
+from pdf_backends import get_backend
+from usage_ledger import UsageLedger, UsageMeter
+
+GOLD_LABELS_PATH = os.path.join("sample_documents", "gold_labels.json")
+RESULTS_DIR = os.getenv("CHRONOLOGY_EVAL_DIR", ".chronology_eval")
+
+# Pipeline modes as run_chronology_workflow options and stages run without an LLM
+# (a skipped review passes, a skipped formatter uses the template)
+PIPELINE_MODES = {
+    "full": {"options": {}, "skip": []},
+    "speculative": {"options": {"speculative": True}, "skip": []},
+    "routing": {"options": {"routing": True}, "skip": []},
+    "split": {"options": {"split_documents": True}, "skip": []},
+    "no_review": {"options": {}, "skip": ["reviewer"]},
+    "template_format": {"options": {}, "skip": ["formatter"]},
+    "fast": {"options": {"routing": True}, "skip": ["reviewer", "formatter"]},
+}
+
+SCORED_FIELDS = [
+    "document_type",
+    "document_date",
+    "document_mainreference",
+    "document_otherreferences",
+    "document_senderparty",
+    "document_recipientparty",
+]
+
+
+def load_gold_labels(path: str = None) -> Dict[str, dict]:
+    """Load the gold labels, keyed by file name."""
+    with open(path or GOLD_LABELS_PATH, encoding="utf-8") as gold_file:
+        return json.load(gold_file)["documents"]
+
+
+def normalize_reference(reference: str) -> str:
+    """Uppercase a reference and drop spacing and punctuation other than - and /."""
+    return re.sub(r"[^A-Z0-9/-]", "", reference.upper())
+
+
+def _contains_term(text: str, term: str) -> bool:
+    return re.search(rf"\b{re.escape(term.lower())}\b", text.lower()) is not None
+
+
+def _recall(found: List[bool]) -> float:
+    return sum(found) / len(found) if found else 1.0
+
+
+def score_document(document_data: DocumentData, gold: dict) -> Dict[str, Optional[float]]:
+    """Score extracted data against gold labels, per field from 0 to 1. Unlabelled fields are None."""
+    scores: Dict[str, Optional[float]] = {}
+
+    accepted = gold.get("document_type")
+    scores["document_type"] = None if accepted is None else float(
+        any(_contains_term(document_data.document_type, term) for term in accepted)
+    )
+
+    accepted = gold.get("document_date")
+    scores["document_date"] = None if accepted is None else float(document_data.document_date.strip() in accepted)
+
+    # References match when the extracted one contains the gold one, e.g. with a revision suffix
+    accepted = gold.get("document_mainreference")
+    main_reference = normalize_reference(document_data.document_mainreference)
+    scores["document_mainreference"] = None if accepted is None else float(
+        bool(main_reference) and any(normalize_reference(reference) in main_reference for reference in accepted)
+    )
+
+    accepted = gold.get("document_otherreferences")
+    extracted = [normalize_reference(reference) for reference in
+                 document_data.document_otherreferences + [document_data.document_mainreference]]
+    scores["document_otherreferences"] = None if accepted is None else _recall([
+        any(normalize_reference(reference) in candidate for candidate in extracted) for reference in accepted
+    ])
+
+    for field in ("document_senderparty", "document_recipientparty"):
+        accepted = gold.get(field)
+        parties_text = " ".join(f"{party.name} {party.role}" for party in getattr(document_data, field))
+        scores[field] = None if accepted is None else _recall([
+            any(_contains_term(parties_text, alias) for alias in aliases) for aliases in accepted
+        ])
+    return scores
+
+
+def document_accuracy(scores: Dict[str, Optional[float]]) -> float:
+    """Mean of the scored fields."""
+    values = [score for score in scores.values() if score is not None]
+    return sum(values) / len(values) if values else 0.0
+
+
+def is_gold_document(document_data: DocumentData, gold: dict, by_reference: bool) -> bool:
+    """Whether extracted data identifies the gold document, by its main reference or by its date."""
+    if by_reference:
+        main_reference = normalize_reference(document_data.document_mainreference)
+        return bool(main_reference) and any(
+            normalize_reference(reference) in main_reference for reference in gold.get("document_mainreference") or []
+        )
+    return document_data.document_date.strip() in (gold.get("document_date") or [])
+
+
+def match_part(parts: List[DocumentData], gold: dict) -> DocumentData:
+    """Take the part that is the gold document out of parts: the first with its main reference, then its date,
+    else the first part. Other fields play no part in the choice, so they are scored as extracted."""
+    for by_reference in (True, False):
+        for part in parts:
+            if is_gold_document(part, gold, by_reference):
+                parts.remove(part)
+                return part
+    return parts.pop(0) if parts else DocumentData()
+
+
+def result_scores(state: Optional[AgentState], gold: dict) -> Dict[str, Optional[float]]:
+    """Score a result against its gold labels, averaging over the parts of a bundled PDF.
+
+    A gold entry with "parts" labels each document of a bundle. Each gold part is
+    scored against the matching extracted part, so a PDF that wasn't split scores
+    on at most one part, and parts the pipeline found beyond the labelled ones are
+    ignored.
+    """
+    if state is None:
+        parts = []
+    elif state.get("sub_documents"):
+        parts = [sub_state.get("document_data") or DocumentData() for sub_state in state["sub_documents"]]
+    else:
+        parts = [state.get("document_data") or DocumentData()]
+
+    part_scores = [score_document(match_part(parts, gold_part), gold_part) for gold_part in gold.get("parts") or [gold]]
+    scores: Dict[str, Optional[float]] = {}
+    for field in SCORED_FIELDS:
+        values = [part[field] for part in part_scores if part[field] is not None]
+        scores[field] = sum(values) / len(values) if values else None
+    return scores
+
+
+class StageSkipper:
+    """Per-stage provider that runs the given stages without an LLM."""
+
+    def __init__(self, llm, skip_stages: List[str]):
+        self.llm = llm
+        self.skip_stages = skip_stages
+
+    def llm_for(self, stage: str, state: AgentState, pdf_content: str = ""):
+        if stage in self.skip_stages:
+            return None
+        return resolve_llm(self.llm, stage, state, pdf_content)
+
+
+def evaluate_configuration(llm_provider: str, model_name: str, mode: str, documents: Dict[str, str],
+                           gold_labels: Dict[str, dict],
+                           get_llm: Callable[[str, str], object]) -> List[dict]:
+    """Run every document under one configuration and return a result row per document."""
+    pipeline_mode = PIPELINE_MODES[mode]
+    # Routing is a choice of provider rather than a workflow option
+    routing = pipeline_mode["options"].get("routing", False)
+    options = {key: value for key, value in pipeline_mode["options"].items() if key != "routing"}
+    rows = []
+    for file_name, file_path in documents.items():
+        if routing:
+            llm = ModelRouter.for_provider(llm_provider, model_name, lambda name: get_llm(llm_provider, name))
+        else:
+            llm = get_llm(llm_provider, model_name)
+        ledger = UsageLedger()
+        llm = StageSkipper(UsageMeter(llm, ledger), pipeline_mode["skip"])
+
+        print(f"🧪 {model_name} / {mode}: {file_name}")
+        error = ""
+        start = time.perf_counter()
+        try:
+            state = run_chronology_workflow(file_path, llm, **options)
+        except Exception as e:
+            # A failing document scores zero instead of stopping the evaluation
+            print(f"❌ {file_name} failed: {e}")
+            state, error = None, str(e)
+        seconds = time.perf_counter() - start
+
+        scores = result_scores(state, gold_labels[file_name])
+        totals = ledger.totals()
+        rows.append({
+            "document": file_name,
+            "scores": scores,
+            "accuracy": document_accuracy(scores),
+            "seconds": seconds,
+            "calls": totals["calls"],
+            "tokens": totals["total_tokens"],
+            "cost": totals["cost"],
+            "error": error
+        })
+    return rows
+
+
+def summarize_configuration(llm_provider: str, model_name: str, mode: str, rows: List[dict]) -> dict:
+    """Average the document rows of a configuration."""
+    count = len(rows) or 1
+    field_accuracy = {}
+    for field in SCORED_FIELDS:
+        values = [row["scores"][field] for row in rows if row["scores"][field] is not None]
+        field_accuracy[field] = sum(values) / len(values) if values else None
+    return {
+        "configuration": f"{model_name} / {mode}",
+        "provider": llm_provider,
+        "model": model_name,
+        "mode": mode,
+        "accuracy": sum(row["accuracy"] for row in rows) / count,
+        "field_accuracy": field_accuracy,
+        "seconds_per_document": sum(row["seconds"] for row in rows) / count,
+        "tokens_per_document": sum(row["tokens"] for row in rows) / count,
+        "cost_per_document": sum(row["cost"] for row in rows) / count,
+        "failures": sum(1 for row in rows if row["error"]),
+        "documents": rows
+    }
+
+
+def mark_pareto_front(summaries: List[dict]):
+    """Flag the configurations no other configuration beats on accuracy, latency and tokens at once."""
+    def objectives(summary: dict) -> tuple:
+        # Larger is better for each objective
+        return summary["accuracy"], -summary["seconds_per_document"], -summary["tokens_per_document"]
+
+    for summary in summaries:
+        summary["pareto"] = not any(
+            all(theirs >= ours for theirs, ours in zip(objectives(other), objectives(summary)))
+            and objectives(other) != objectives(summary)
+            for other in summaries
+        )
+
+
+def format_pareto_table(summaries: List[dict]) -> str:
+    """Format the configurations as a table, fastest first; ★ marks the Pareto front."""
+    short_names = {"document_type": "type", "document_date": "date", "document_mainreference": "ref",
+                   "document_otherreferences": "refs", "document_senderparty": "from",
+                   "document_recipientparty": "to"}
+    header = (f"  {'configuration':<45} {'acc':>5} " + " ".join(f"{short_names[field]:>5}" for field in SCORED_FIELDS)
+              + f" {'s/doc':>7} {'tok/doc':>8} {'$/doc':>8} {'fail':>4}")
+    lines = [header, "-" * len(header)]
+    for summary in sorted(summaries, key=lambda summary: summary["seconds_per_document"]):
+        fields = " ".join(
+            f"{summary['field_accuracy'][field]:>5.2f}" if summary["field_accuracy"][field] is not None else f"{'-':>5}"
+            for field in SCORED_FIELDS
+        )
+        lines.append(
+            f"{'★' if summary['pareto'] else ' '} {summary['configuration']:<45} {summary['accuracy']:>5.2f} {fields} "
+            f"{summary['seconds_per_document']:>7.1f} {summary['tokens_per_document']:>8,.0f} "
+            f"{summary['cost_per_document']:>8.4f} {summary['failures']:>4}"
+        )
+    return "\n".join(lines)
+
+
+def recommend_configuration(summaries: List[dict], min_accuracy: float) -> Optional[dict]:
+    """The fastest configuration with at least min_accuracy, or None."""
+    acceptable = [summary for summary in summaries if summary["accuracy"] >= min_accuracy]
+    return min(acceptable, key=lambda summary: summary["seconds_per_document"]) if acceptable else None
+
+
+def run_evaluation(llm_provider: str, model_names: List[str], modes: List[str], gold_labels: Dict[str, dict],
+                   sample_dir: str, get_llm: Callable[[str, str], object]) -> List[dict]:
+    """Evaluate every model and mode combination and return the configuration summaries."""
+    documents = {
+        file_name: os.path.join(sample_dir, file_name)
+        for file_name in gold_labels if os.path.exists(os.path.join(sample_dir, file_name))
+    }
+    missing = set(gold_labels) - set(documents)
+    if missing:
+        print(f"⚠️ Skipping labelled documents not found in {sample_dir}: {', '.join(sorted(missing))}")
+
+    # Select the PDF backend up front, so its one-time benchmark isn't timed as part of a document
+    get_backend()
+
+    summaries = []
+    for model_name in model_names:
+        for mode in modes:
+            rows = evaluate_configuration(llm_provider, model_name, mode, documents, gold_labels, get_llm)
+            summaries.append(summarize_configuration(llm_provider, model_name, mode, rows))
+    mark_pareto_front(summaries)
+    return summaries
+
+
+def main():
+    """Evaluate configurations on the gold-labelled sample documents."""
+    parser = argparse.ArgumentParser(description="Accuracy vs latency evaluation of the Chronology Agent")
+    parser.add_argument("--provider", choices=["groq", "ollama"], default=None, help="LLM provider")
+    parser.add_argument("--models", default=None, help="Comma-separated model names")
+    parser.add_argument("--modes", default="full,speculative,no_review,fast",
+                        help=f"Comma-separated pipeline modes: {', '.join(PIPELINE_MODES)}")
+    parser.add_argument("--gold", default=GOLD_LABELS_PATH, help="Gold label file")
+    parser.add_argument("--sample-dir", default=None, help="Directory with the labelled PDFs "
+                                                            "(default: the gold label file's directory)")
+    parser.add_argument("--min-accuracy", type=float, default=0.9, help="Accuracy a recommended configuration needs")
+    parser.add_argument("--output", default=None, help="JSON file for the detailed results")
+    args = parser.parse_args()
+
+    modes = [mode.strip() for mode in args.modes.split(",") if mode.strip()]
+    unknown_modes = [mode for mode in modes if mode not in PIPELINE_MODES]
+    if unknown_modes:
+        parser.error(f"Unknown modes: {', '.join(unknown_modes)}")
+
+    worker_config = {
+        "groq_api_key": os.getenv("GROQ_API_KEY"),
+        "ollama_base_url": os.getenv("OLLAMA_BASE_URL")
+    }
+    llm_provider = args.provider or ("groq" if worker_config["groq_api_key"] else "ollama")
+    model_names = [name.strip() for name in (args.models or "").split(",") if name.strip()] or [
+        DEFAULT_GROQ_MODEL if llm_provider == "groq" else DEFAULT_OLLAMA_MODEL
+    ]
+
+    llm_cache = {}
+
+    def get_llm(provider: str, model_name: str):
+        # One client per model, shared by all configurations
+        if (provider, model_name) not in llm_cache:
+            llm_cache[(provider, model_name)] = create_llm(
+                provider, model_name,
+                groq_api_key=worker_config["groq_api_key"],
+                ollama_base_url=worker_config["ollama_base_url"]
+            )
+        return llm_cache[(provider, model_name)]
+
+    gold_labels = load_gold_labels(args.gold)
+    sample_dir = args.sample_dir or os.path.dirname(args.gold) or "."
+    summaries = run_evaluation(llm_provider, model_names, modes, gold_labels, sample_dir, get_llm)
+
+    print()
+    print(format_pareto_table(summaries))
+    recommended = recommend_configuration(summaries, args.min_accuracy)
+    if recommended:
+        print(f"\n✅ Fastest configuration with accuracy ≥ {args.min_accuracy:.2f}: {recommended['configuration']}")
+    else:
+        print(f"\n⚠️ No configuration reached accuracy {args.min_accuracy:.2f}")
+
+    output_path = args.output or os.path.join(RESULTS_DIR, f"evaluation-{time.strftime('%Y%m%d-%H%M%S')}.json")
+    os.makedirs(os.path.dirname(output_path) or ".", exist_ok=True)
+    with open(output_path, "w", encoding="utf-8") as output_file:
+        json.dump({"min_accuracy": args.min_accuracy, "configurations": summaries}, output_file, indent=2)
+    print(f"📄 Detailed results written to {output_path}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,559 @@
+#!/usr/bin/env python3
+"""
+Local background job queue for the Chronology Agent workflow.
+Jobs are stored in a SQLite database and processed by worker processes, so long
+runs are independent of Streamlit reruns, page reloads and browser disconnects.
+
+Run standalone workers with:
+    python job_queue.py --workers 2
+"""
+import argparse
+import atexit
+import hashlib
+import json
+import multiprocessing
+import os
+import sqlite3
+import time
+import uuid
+from typing import Callable, List, Optional, Tuple
+
+from checkpoints import clear_checkpoints
+from chronology_pipeline import STAGE_STEPS, WORKFLOW_STEPS, run_chronology_workflow
+from document_models import AgentState, serialize_state
+from embedding_index import get_index, index_state
+from llm_clients import create_llm, ensure_ollama_warm_up
+from llm_governor import LLMGovernor
+from model_router import ModelRouter
+from text_store import discard_texts
+from usage_ledger import BatchBudget, UsageLedger, UsageMeter
+
+JOBS_DIR = os.getenv("CHRONOLOGY_JOBS_DIR", ".chronology_jobs")
+DB_FILENAME = "jobs.sqlite3"
+UPLOADS_DIRNAME = "uploads"
+
+# Job status values
+QUEUED = "queued"
+RUNNING = "running"
+COMPLETED = "completed"
+FAILED = "failed"
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS jobs (
+    id TEXT PRIMARY KEY,
+    file_name TEXT NOT NULL,
+    file_path TEXT NOT NULL,
+    llm_provider TEXT NOT NULL,
+    model_name TEXT NOT NULL,
+    options TEXT NOT NULL DEFAULT '{}',
+    batch_id TEXT,
+    owner TEXT,
+    usage TEXT NOT NULL DEFAULT '[]',
+    content_hash TEXT,
+    status TEXT NOT NULL,
+    workflow_status TEXT NOT NULL DEFAULT '{}',
+    result TEXT,
+    error TEXT,
+    worker_id TEXT,
+    created_at REAL NOT NULL,
+    started_at REAL,
+    finished_at REAL
+)
+"""
+
+# Columns added after the first release, as (name, definition)
+ADDED_COLUMNS = [
+    ("options", "TEXT NOT NULL DEFAULT '{}'"),
+    ("batch_id", "TEXT"),
+    ("usage", "TEXT NOT NULL DEFAULT '[]'"),
+    ("content_hash", "TEXT"),
+    ("owner", "TEXT"),
+]
+
+
+def get_db_path(jobs_dir: str = None) -> str:
+    """Get the path of the job database."""
+    return os.path.join(jobs_dir or JOBS_DIR, DB_FILENAME)
+
+
+def connect(db_path: str = None) -> sqlite3.Connection:
+    """Open the job database, creating it if needed."""
+    db_path = db_path or get_db_path()
+    os.makedirs(os.path.dirname(db_path) or ".", exist_ok=True)
+
+    conn = sqlite3.connect(db_path, timeout=30, isolation_level=None)
+    conn.row_factory = sqlite3.Row
+    conn.execute("PRAGMA journal_mode=WAL")
+    conn.execute(SCHEMA)
+
+    existing_columns = {row["name"] for row in conn.execute("PRAGMA table_info(jobs)")}
+    for column_name, column_definition in ADDED_COLUMNS:
+        if column_name not in existing_columns:
+            conn.execute(f"ALTER TABLE jobs ADD COLUMN {column_name} {column_definition}")
+    if "owner" not in existing_columns:
+        # Earlier jobs take turns per batch
+        conn.execute("UPDATE jobs SET owner = COALESCE(batch_id, id)")
+    conn.execute("CREATE INDEX IF NOT EXISTS jobs_content_hash ON jobs (content_hash)")
+    conn.execute("CREATE INDEX IF NOT EXISTS jobs_owner_status ON jobs (owner, status)")
+    return conn
+
+
+def _row_to_job(row: sqlite3.Row) -> dict:
+    """Convert a database row into a job dictionary."""
+    job = dict(row)
+    job["workflow_status"] = json.loads(job["workflow_status"] or "{}")
+    job["options"] = json.loads(job["options"] or "{}")
+    job["usage"] = json.loads(job["usage"] or "[]")
+    job["result"] = json.loads(job["result"]) if job["result"] else None
+    return job
+
+
+def enqueue_job(file_name: str, data, llm_provider: str, model_name: str,
+                options: dict = None, batch_id: str = None, content_hash: str = None,
+                owner: str = None, db_path: str = None) -> str:
+    """Store an uploaded PDF and enqueue it for processing. Returns the job ID.
+
+    data may be any bytes-like object; memoryviews are written without copying.
+    options holds pipeline settings such as {"speculative": True, "split_documents": True}
+    and an optional {"budget": {"max_tokens": ..., "max_cost": ...}} shared by all jobs
+    with the same batch_id. content_hash is the SHA-256 of the PDF, computed when not
+    given; it finds files that were already submitted (see find_job_by_content_hash)
+    and jobs still working on the same text (see discard_job_texts). owner, such as a
+    Streamlit session, groups jobs that take turns with other owners' jobs for workers;
+    it defaults to the batch, or the job itself.
+    """
+    db_path = db_path or get_db_path()
+    job_id = uuid.uuid4().hex
+    owner = owner or batch_id or job_id
+    content_hash = content_hash or hashlib.sha256(data).hexdigest()
+
+    uploads_dir = os.path.join(os.path.dirname(db_path), UPLOADS_DIRNAME)
+    os.makedirs(uploads_dir, exist_ok=True)
+    file_path = os.path.join(uploads_dir, f"{job_id}.pdf")
+    with open(file_path, "wb") as upload_file:
+        upload_file.write(data)
+
+    workflow_status = {
+        step_key: {'status': 'pending', 'message': "", 'timestamp': time.time()}
+        for step_key, _, _ in WORKFLOW_STEPS
+    }
+
+    conn = connect(db_path)
+    try:
+        conn.execute(
+            "INSERT INTO jobs (id, file_name, file_path, llm_provider, model_name, options, batch_id, owner, "
+            "content_hash, status, workflow_status, created_at) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)",
+            (job_id, file_name, file_path, llm_provider, model_name, json.dumps(options or {}), batch_id, owner,
+             content_hash, QUEUED, json.dumps(workflow_status), time.time())
+        )
+    finally:
+        conn.close()
+
+    return job_id
+
+
+# Owners take turns: the owner with the fewest running jobs, then the one served
+# longest ago, gets its oldest queued job next, so one large upload can't hold
+# every worker while other sessions wait
+FAIR_CLAIM_QUERY = """
+SELECT queued.* FROM jobs AS queued
+WHERE queued.status = ?
+ORDER BY
+    (SELECT COUNT(*) FROM jobs AS running WHERE running.owner IS queued.owner AND running.status = ?),
+    (SELECT COALESCE(MAX(started_at), 0) FROM jobs AS served WHERE served.owner IS queued.owner),
+    queued.created_at
+"""
+
+
+def claim_next_job(worker_id: str, db_path: str = None) -> Optional[dict]:
+    """Atomically claim the next queued job for a worker, taking owners in turn."""
+    conn = connect(db_path)
+    try:
+        conn.execute("BEGIN IMMEDIATE")
+        row = conn.execute(FAIR_CLAIM_QUERY + " LIMIT 1", (QUEUED, RUNNING)).fetchone()
+        if row is None:
+            conn.execute("COMMIT")
+            return None
+
+        conn.execute(
+            "UPDATE jobs SET status = ?, worker_id = ?, started_at = ? WHERE id = ?",
+            (RUNNING, worker_id, time.time(), row["id"])
+        )
+        conn.execute("COMMIT")
+        job = _row_to_job(row)
+        job["status"] = RUNNING
+        job["worker_id"] = worker_id
+        return job
+    except sqlite3.Error:
+        conn.execute("ROLLBACK")
+        raise
+    finally:
+        conn.close()
+
+
+def get_queue_position(job_id: str, db_path: str = None) -> Optional[int]:
+    """Position of a queued job in the claim order, or None if it isn't queued.
+
+    Positions beyond the number of free workers are estimates, since every
+    claim changes the owners' order.
+    """
+    conn = connect(db_path)
+    try:
+        rows = conn.execute(FAIR_CLAIM_QUERY, (QUEUED, RUNNING)).fetchall()
+    finally:
+        conn.close()
+
+    # Owners are served in turn, in the order of their first job
+    queues = {}
+    for row in rows:
+        queues.setdefault(row["owner"], []).append(row["id"])
+    claim_order = []
+    for round_index in range(max((len(queue) for queue in queues.values()), default=0)):
+        claim_order.extend(queue[round_index] for queue in queues.values() if round_index < len(queue))
+    return claim_order.index(job_id) + 1 if job_id in claim_order else None
+
+
+def update_job_step(job_id: str, step: str, status: str, message: str = "", db_path: str = None):
+    """Update the status of a workflow step for a job."""
+    conn = connect(db_path)
+    try:
+        conn.execute("BEGIN IMMEDIATE")
+        row = conn.execute("SELECT workflow_status FROM jobs WHERE id = ?", (job_id,)).fetchone()
+        if row is None:
+            conn.execute("COMMIT")
+            return
+
+        workflow_status = json.loads(row["workflow_status"] or "{}")
+        workflow_status[step] = {
+            'status': status,
+            'message': message,
+            'timestamp': time.time()
+        }
+        conn.execute("UPDATE jobs SET workflow_status = ? WHERE id = ?", (json.dumps(workflow_status), job_id))
+        conn.execute("COMMIT")
+    finally:
+        conn.close()
+
+
+def update_job_queue_position(job_id: str, step: str, position: Optional[int], db_path: str = None):
+    """Record a step's position in the LLM queue, or clear it with None, keeping its status."""
+    conn = connect(db_path)
+    try:
+        conn.execute("BEGIN IMMEDIATE")
+        row = conn.execute("SELECT workflow_status FROM jobs WHERE id = ?", (job_id,)).fetchone()
+        if row is None:
+            conn.execute("COMMIT")
+            return
+
+        workflow_status = json.loads(row["workflow_status"] or "{}")
+        step_info = workflow_status.setdefault(step, {'status': 'running', 'message': '', 'timestamp': time.time()})
+        if position is None:
+            step_info.pop('queue_position', None)
+        else:
+            step_info['queue_position'] = position
+        conn.execute("UPDATE jobs SET workflow_status = ? WHERE id = ?", (json.dumps(workflow_status), job_id))
+        conn.execute("COMMIT")
+    finally:
+        conn.close()
+
+
+def update_job_usage(job_id: str, usage: List[dict], db_path: str = None):
+    """Store the usage records of a job."""
+    conn = connect(db_path)
+    try:
+        conn.execute("UPDATE jobs SET usage = ? WHERE id = ?", (json.dumps(usage), job_id))
+    finally:
+        conn.close()
+
+
+def get_batch_usage(batch_id: str, db_path: str = None) -> Tuple[int, float]:
+    """Get the (tokens, cost) used so far by all jobs of a batch."""
+    conn = connect(db_path)
+    try:
+        rows = conn.execute("SELECT usage FROM jobs WHERE batch_id = ?", (batch_id,)).fetchall()
+    finally:
+        conn.close()
+
+    records = [record for row in rows for record in json.loads(row["usage"] or "[]")]
+    tokens = sum(record["input_tokens"] + record["output_tokens"] for record in records)
+    cost = sum(record["cost"] for record in records)
+    return tokens, cost
+
+
+def finish_job(job_id: str, status: str, result: dict = None, error: str = None, db_path: str = None):
+    """Mark a job as completed or failed."""
+    conn = connect(db_path)
+    try:
+        conn.execute(
+            "UPDATE jobs SET status = ?, result = ?, error = ?, finished_at = ? WHERE id = ?",
+            (status, json.dumps(result) if result is not None else None, error, time.time(), job_id)
+        )
+    finally:
+        conn.close()
+
+
+def get_job(job_id: str, db_path: str = None) -> Optional[dict]:
+    """Get a job by ID."""
+    conn = connect(db_path)
+    try:
+        row = conn.execute("SELECT * FROM jobs WHERE id = ?", (job_id,)).fetchone()
+        return _row_to_job(row) if row else None
+    finally:
+        conn.close()
+
+
+def find_job_by_content_hash(content_hash: str, db_path: str = None) -> Optional[dict]:
+    """Get the most recent job for a PDF with the given SHA-256, if any."""
+    conn = connect(db_path)
+    try:
+        row = conn.execute(
+            "SELECT * FROM jobs WHERE content_hash = ? ORDER BY created_at DESC LIMIT 1", (content_hash,)
+        ).fetchone()
+        return _row_to_job(row) if row else None
+    finally:
+        conn.close()
+
+
+def discard_job_texts(job: dict, state: AgentState, db_path: str = None) -> int:
+    """Delete the stored texts of a completed job unless another job may still need them.
+
+    Identical PDFs share their texts, so nothing is deleted while another job for
+    the same content is queued or running. The check and the deletion happen in one
+    write transaction, so no such job can be enqueued or claimed in between. Texts
+    of indexed documents stay, since search results show them. Returns the texts deleted.
+    """
+    if not job["content_hash"]:
+        # Jobs from before content hashes were recorded can't be matched
+        return 0
+
+    conn = connect(db_path)
+    try:
+        conn.execute("BEGIN IMMEDIATE")
+        other_jobs = conn.execute(
+            "SELECT COUNT(*) FROM jobs WHERE content_hash = ? AND id != ? AND status IN (?, ?)",
+            (job["content_hash"], job["id"], QUEUED, RUNNING)
+        ).fetchone()[0]
+        discarded = 0 if other_jobs else discard_texts(state, keep=get_index().has_document)
+        conn.execute("COMMIT")
+        return discarded
+    finally:
+        conn.close()
+
+
+def count_active_jobs(db_path: str = None) -> int:
+    """Count the queued and running jobs."""
+    conn = connect(db_path)
+    try:
+        return conn.execute("SELECT COUNT(*) FROM jobs WHERE status IN (?, ?)", (QUEUED, RUNNING)).fetchone()[0]
+    finally:
+        conn.close()
+
+
+def list_jobs(limit: int = 20, owner: str = None, db_path: str = None) -> List[dict]:
+    """List the most recent jobs, newest first, optionally only those of one owner."""
+    conn = connect(db_path)
+    try:
+        if owner is not None:
+            rows = conn.execute(
+                "SELECT * FROM jobs WHERE owner = ? ORDER BY created_at DESC LIMIT ?", (owner, limit)
+            ).fetchall()
+        else:
+            rows = conn.execute("SELECT * FROM jobs ORDER BY created_at DESC LIMIT ?", (limit,)).fetchall()
+        return [_row_to_job(row) for row in rows]
+    finally:
+        conn.close()
+
+
+def retry_job(job_id: str, db_path: str = None) -> bool:
+    """Requeue a failed job. It resumes from its last checkpointed stage."""
+    conn = connect(db_path)
+    try:
+        cursor = conn.execute(
+            "UPDATE jobs SET status = ?, error = NULL, worker_id = NULL, finished_at = NULL WHERE id = ? AND status = ?",
+            (QUEUED, job_id, FAILED)
+        )
+        return cursor.rowcount > 0
+    finally:
+        conn.close()
+
+
+def _is_process_alive(pid: int) -> bool:
+    """Check whether a local process is still running."""
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        return True
+    return True
+
+
+def requeue_orphaned_jobs(db_path: str = None) -> int:
+    """Requeue running jobs whose worker process no longer exists. Returns the number requeued."""
+    conn = connect(db_path)
+    try:
+        conn.execute("BEGIN IMMEDIATE")
+        rows = conn.execute("SELECT id, worker_id FROM jobs WHERE status = ?", (RUNNING,)).fetchall()
+        orphaned = []
+        for row in rows:
+            # Worker IDs are formatted as "<hostname>-<pid>"
+            pid = (row["worker_id"] or "").rsplit("-", 1)[-1]
+            if not pid.isdigit() or not _is_process_alive(int(pid)):
+                orphaned.append(row["id"])
+
+        for job_id in orphaned:
+            conn.execute("UPDATE jobs SET status = ?, worker_id = NULL WHERE id = ?", (QUEUED, job_id))
+        conn.execute("COMMIT")
+        return len(orphaned)
+    finally:
+        conn.close()
+
+
+def process_job(job: dict, worker_config: dict, db_path: str = None,
+                get_llm: Callable[[str, str], object] = None):
+    """Run the chronology workflow for a claimed job and store the result.
+
+    get_llm(llm_provider, model_name) optionally supplies shared chat models;
+    by default a new client is created for each job.
+    """
+    job_id = job["id"]
+    print(f"🛠️ Processing job {job_id}: {job['file_name']}")
+
+    def on_status(step: str, status: str, message: str = ""):
+        update_job_step(job_id, step, status, message, db_path)
+
+    def on_queue(stage: str, position: Optional[int]):
+        update_job_queue_position(job_id, STAGE_STEPS.get(stage, stage), position, db_path)
+
+    if job["llm_provider"] == "ollama":
+        # Loads the model while the PDF is read; each worker process tracks the loaded context size
+        ensure_ollama_warm_up(job["model_name"], worker_config.get("ollama_base_url"))
+
+    try:
+        def llm_factory(model_name: str):
+            if get_llm:
+                return get_llm(job["llm_provider"], model_name)
+            return create_llm(
+                job["llm_provider"],
+                model_name,
+                groq_api_key=worker_config.get("groq_api_key"),
+                ollama_base_url=worker_config.get("ollama_base_url")
+            )
+
+        if job["options"].get("routing", False):
+            # The selected model becomes the large model routing escalates to
+            llm = ModelRouter.for_provider(job["llm_provider"], job["model_name"], llm_factory,
+                                           ollama_base_url=worker_config.get("ollama_base_url"))
+        else:
+            llm = llm_factory(job["model_name"])
+
+        # Calls queue for the provider's slots together with the other jobs of the same owner
+        llm = LLMGovernor(llm, job["llm_provider"], job["owner"] or job_id, on_queue)
+
+        # Usage of an earlier attempt is kept, so retries count against the budget
+        ledger = UsageLedger(
+            job["usage"],
+            on_record=lambda ledger: update_job_usage(job_id, ledger.to_list(), db_path)
+        )
+        budget = None
+        if job["options"].get("budget"):
+            get_spent = (lambda: get_batch_usage(job["batch_id"], db_path)) if job["batch_id"] else None
+            budget = BatchBudget(**job["options"]["budget"], get_spent=get_spent)
+        llm = UsageMeter(llm, ledger, budget)
+
+        # The job ID doubles as the checkpoint run ID, so requeued jobs resume
+        state = run_chronology_workflow(
+            job["file_path"], llm, on_status,
+            run_id=job_id,
+            speculative=job["options"].get("speculative", False),
+            split_documents=job["options"].get("split_documents", False),
+            profile=job["options"].get("profile", False),
+            related_events=job["options"].get("related_events", False)
+        )
+    except Exception as e:
+        # Workers must survive any failure in a single job
+        print(f"❌ Job {job_id} failed: {e}")
+        finish_job(job_id, FAILED, error=str(e), db_path=db_path)
+        return
+
+    if state is None:
+        finish_job(job_id, FAILED, error="Failed to load the PDF or its extracted text", db_path=db_path)
+        return
+
+    finish_job(job_id, COMPLETED, result=serialize_state(state), db_path=db_path)
+    try:
+        print(f"🧭 Indexed {index_state(state, job['file_name'], job_id)} chunks of job {job_id}")
+    except Exception as e:
+        # The chronology is done; a document missing from the index only affects search
+        print(f"⚠️ Could not index job {job_id}: {e}")
+    clear_checkpoints(job_id)
+    discard_job_texts(job, state, db_path)
+    if os.path.exists(job["file_path"]):
+        os.unlink(job["file_path"])
+    print(f"✅ Job {job_id} completed")
+
+
+def worker_loop(worker_config: dict = None, db_path: str = None, poll_interval: float = 2.0,
+                get_llm: Callable[[str, str], object] = None):
+    """Continuously claim and process queued jobs."""
+    worker_config = worker_config or {}
+    worker_id = f"{os.uname().nodename}-{os.getpid()}"
+    print(f"👷 Worker {worker_id} started")
+
+    while True:
+        job = claim_next_job(worker_id, db_path)
+        if job is None:
+            time.sleep(poll_interval)
+            continue
+        process_job(job, worker_config, db_path, get_llm)
+
+
+def start_workers(count: int, worker_config: dict = None, db_path: str = None) -> List[multiprocessing.Process]:
+    """Start background worker processes.
+
+    worker_config may contain 'groq_api_key' and 'ollama_base_url'; it is passed to
+    the workers in memory and never written to the job database.
+    """
+    db_path = db_path or get_db_path()
+    requeue_orphaned_jobs(db_path)
+
+    # Spawn rather than fork so workers don't inherit the Streamlit server's threads.
+    # Workers are not daemonic so they can run their own pools (e.g. OCR); they are
+    # terminated explicitly when the parent process exits.
+    context = multiprocessing.get_context("spawn")
+    workers = []
+    for _ in range(count):
+        worker = context.Process(target=worker_loop, args=(worker_config, db_path))
+        worker.start()
+        workers.append(worker)
+    atexit.register(stop_workers, workers)
+    return workers
+
+
+def stop_workers(workers: List[multiprocessing.Process]):
+    """Terminate worker processes. Their running jobs are requeued on the next start."""
+    for worker in workers:
+        if worker.is_alive():
+            worker.terminate()
+    for worker in workers:
+        worker.join(timeout=5)
+
+
+def main():
+    """Run job workers in the foreground."""
+    parser = argparse.ArgumentParser(description="Chronology Agent background workers")
+    parser.add_argument("--workers", type=int, default=2, help="Number of worker processes")
+    parser.add_argument("--jobs-dir", default=None, help="Directory holding the job database and uploads")
+    args = parser.parse_args()
+
+    worker_config = {
+        "groq_api_key": os.getenv("GROQ_API_KEY"),
+        "ollama_base_url": os.getenv("OLLAMA_BASE_URL")
+    }
+    workers = start_workers(args.workers, worker_config, get_db_path(args.jobs_dir))
+    for worker in workers:
+        worker.join()
+
+
+if __name__ == "__main__":
+    main()
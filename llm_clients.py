@@ -0,0 +1,278 @@
+"""
+LLM client construction shared by the Streamlit UI and background workers.
+Supports ChatGroq and local Ollama servers. Ollama clients size their context
+window to each prompt and keep the model loaded between documents.
+"""
+import math
+import os
+import threading
+from contextlib import nullcontext
+from typing import Dict, List, Optional, Tuple
+
+import requests
+
+from document_prompts import DOCUMENT_SYSTEM_PROMPT
+
+DEFAULT_GROQ_MODEL = "meta-llama/llama-4-maverick-17b-128e-instruct"
+DEFAULT_OLLAMA_MODEL = "qwen2.5:7b"
+DEFAULT_OLLAMA_BASE_URL = "http://localhost:11434"
+
+# Rough characters per token for English text
+CHARS_PER_TOKEN = 4
+
+# Ollama context sizes in tokens. Prompts use the smallest tier that fits, so the
+# KV cache matches the document and the model is reloaded for only a few sizes.
+OLLAMA_CONTEXT_TIERS = [
+    int(tier) for tier in os.getenv("OLLAMA_CONTEXT_TIERS", "4096,8192,16384,32768").split(",")
+]
+
+# Tokens reserved in the context for the response
+OLLAMA_RESPONSE_TOKENS = 2048
+
+# How long Ollama keeps the model loaded after a request
+OLLAMA_KEEP_ALIVE = os.getenv("OLLAMA_KEEP_ALIVE", "30m")
+
+# Context size currently loaded per (base_url, model), so a loaded model is reused
+# when it is at most one tier larger than needed
+_loaded_context_sizes: Dict[Tuple[str, str], int] = {}
+_loaded_context_lock = threading.Lock()
+
+
+def create_groq_llm(model_name: str, api_key: str):
+    """Create a ChatGroq chat model."""
+    from langchain_groq import ChatGroq
+    return ChatGroq(
+        groq_api_key=api_key,
+        model_name=model_name,
+        temperature=0,
+        max_tokens=8192
+    )
+
+
+def estimate_tokens(text: str) -> int:
+    """Estimate the token count of a text."""
+    return math.ceil(len(text or "") / CHARS_PER_TOKEN)
+
+
+def choose_context_size(prompt_tokens: int, loaded_size: int = None) -> int:
+    """Pick the Ollama context tier for a prompt.
+
+    A loaded size that fits and is at most one tier above the smallest fitting
+    tier is kept, since changing num_ctx makes Ollama reload the model.
+    """
+    needed_tokens = prompt_tokens + OLLAMA_RESPONSE_TOKENS
+    fitting_tiers = [tier for tier in OLLAMA_CONTEXT_TIERS if tier >= needed_tokens]
+    if not fitting_tiers:
+        print(f"⚠️ Prompt of ~{prompt_tokens:,} tokens exceeds the largest Ollama context "
+              f"({OLLAMA_CONTEXT_TIERS[-1]:,}); it will be truncated")
+        return OLLAMA_CONTEXT_TIERS[-1]
+
+    if loaded_size in fitting_tiers[:2]:
+        return loaded_size
+    return fitting_tiers[0]
+
+
+def messages_text(messages) -> str:
+    """Join the text of a prompt given as a string or a list of messages."""
+    if isinstance(messages, str):
+        return messages
+    return "\n".join(str(getattr(message, "content", message)) for message in messages)
+
+
+class ChatModelProxy:
+    """Base for chat model wrappers. Everything but invoke, stream and batch is forwarded to the
+    wrapped model, e.g. model_name.
+
+    Subclasses hook into the calls: call_context() is held around each call (a
+    stream holds it until exhausted or closed), on_response() sees each invoke
+    and batch response, and on_stream_end() the chunks a stream yielded, also
+    when the caller stopped it early.
+    """
+
+    def __init__(self, llm):
+        self.llm = llm
+
+    def __getattr__(self, name):
+        if name == "llm":
+            raise AttributeError(name)
+        return getattr(self.llm, name)
+
+    def call_context(self):
+        return nullcontext()
+
+    def on_response(self, messages, response):
+        pass
+
+    def on_stream_end(self, messages, chunks: list):
+        pass
+
+    def invoke(self, messages, *args, **kwargs):
+        with self.call_context():
+            response = self.llm.invoke(messages, *args, **kwargs)
+        self.on_response(messages, response)
+        return response
+
+    def stream(self, messages, *args, **kwargs):
+        chunks = []
+        try:
+            with self.call_context():
+                for chunk in self.llm.stream(messages, *args, **kwargs):
+                    chunks.append(chunk)
+                    yield chunk
+        finally:
+            self.on_stream_end(messages, chunks)
+
+    def batch(self, inputs: list, *args, **kwargs) -> list:
+        with self.call_context():
+            responses = self.llm.batch(inputs, *args, **kwargs)
+        for messages, response in zip(inputs, responses):
+            self.on_response(messages, response)
+        return responses
+
+
+class ContextSizedOllama:
+    """ChatOllama proxy that sets num_ctx per call from a token estimate of the prompt.
+
+    One client is kept per context tier. The prompt already contains the document
+    text, so the estimate covers both the instructions and the document.
+    """
+
+    def __init__(self, model_name: str, base_url: str, keep_alive: str = OLLAMA_KEEP_ALIVE):
+        self.model = model_name
+        self.base_url = base_url
+        self.keep_alive = keep_alive
+        self._clients: Dict[int, object] = {}
+
+    def client_for(self, messages):
+        """Get the ChatOllama client sized for a prompt."""
+        key = (self.base_url, self.model)
+        with _loaded_context_lock:
+            prompt_tokens = estimate_tokens(messages_text(messages))
+            num_ctx = choose_context_size(prompt_tokens, _loaded_context_sizes.get(key))
+            _loaded_context_sizes[key] = num_ctx
+            if num_ctx not in self._clients:
+                self._clients[num_ctx] = create_ollama_llm(self.model, self.base_url, num_ctx, self.keep_alive)
+        return self._clients[num_ctx]
+
+    def invoke(self, messages, *args, **kwargs):
+        return self.client_for(messages).invoke(messages, *args, **kwargs)
+
+    def stream(self, messages, *args, **kwargs):
+        return self.client_for(messages).stream(messages, *args, **kwargs)
+
+    def batch(self, inputs: List, *args, **kwargs) -> list:
+        # One context size for the whole batch, sized for its longest prompt
+        longest = max(inputs, key=lambda messages: len(messages_text(messages)))
+        return self.client_for(longest).batch(inputs, *args, **kwargs)
+
+
+def create_ollama_llm(model_name: str, base_url: str, num_ctx: int = None, keep_alive: str = OLLAMA_KEEP_ALIVE):
+    """Create a ChatOllama chat model with custom base URL.
+
+    Without num_ctx, the context size is chosen per prompt (see ContextSizedOllama).
+    """
+    if num_ctx is None:
+        return ContextSizedOllama(model_name, base_url, keep_alive)
+
+    from langchain_ollama import ChatOllama
+    return ChatOllama(
+        model=model_name,
+        temperature=0,
+        num_ctx=num_ctx,
+        keep_alive=keep_alive,
+        base_url=base_url,
+    )
+
+
+def warm_up_context_size() -> int:
+    """The context tier analysis and review prompts need at least: the shared instructions and a response."""
+    return choose_context_size(estimate_tokens(DOCUMENT_SYSTEM_PROMPT))
+
+
+def warm_up_ollama(model_name: str, base_url: str, num_ctx: int = None,
+                   keep_alive: str = OLLAMA_KEEP_ALIVE, timeout: float = 300) -> bool:
+    """Load a model into Ollama and keep it loaded. Returns True on success.
+
+    A generate request without a prompt only loads the model. num_ctx should be
+    the context tier the next documents will use, so they don't trigger a reload;
+    it defaults to the smallest tier analysis and review prompts can use.
+    """
+    num_ctx = num_ctx or warm_up_context_size()
+    try:
+        response = requests.post(
+            f"{base_url}/api/generate",
+            json={"model": model_name, "keep_alive": keep_alive, "options": {"num_ctx": num_ctx}},
+            timeout=timeout
+        )
+        response.raise_for_status()
+    except requests.RequestException as e:
+        print(f"⚠️ Ollama warm-up failed for {model_name}: {e}")
+        return False
+
+    with _loaded_context_lock:
+        _loaded_context_sizes[(base_url, model_name)] = num_ctx
+    print(f"🔥 Ollama model {model_name} loaded with a {num_ctx:,} token context")
+    return True
+
+
+def start_ollama_warm_up(model_name: str, base_url: str, num_ctx: int = None) -> threading.Thread:
+    """Warm up an Ollama model in the background."""
+    thread = threading.Thread(target=warm_up_ollama, args=(model_name, base_url, num_ctx), daemon=True)
+    thread.start()
+    return thread
+
+
+def ensure_ollama_warm_up(model_name: str, base_url: str = None) -> Optional[threading.Thread]:
+    """Warm up an Ollama model in the background unless this process already loaded it.
+
+    Workers call this when a job starts, so the model loads while the PDF is
+    read and the process knows which context size is loaded.
+    """
+    base_url = get_ollama_base_url(base_url)
+    with _loaded_context_lock:
+        if (base_url, model_name) in _loaded_context_sizes:
+            return None
+    return start_ollama_warm_up(model_name, base_url)
+
+
+def get_ollama_base_url(base_url: str = None) -> str:
+    """The Ollama server URL, falling back to OLLAMA_BASE_URL and the local default."""
+    return base_url or os.getenv("OLLAMA_BASE_URL") or DEFAULT_OLLAMA_BASE_URL
+
+
+def create_llm(llm_provider: str, model_name: str, groq_api_key: str = None, ollama_base_url: str = None):
+    """Create the chat model for a provider, falling back to environment configuration.
+
+    Raises ValueError when the provider cannot be configured.
+    """
+    if llm_provider == "groq":
+        api_key = groq_api_key or os.getenv("GROQ_API_KEY")
+        if not api_key:
+            raise ValueError("GROQ_API_KEY not found in secrets or environment variables")
+        return create_groq_llm(model_name, api_key)
+
+    return create_ollama_llm(model_name, get_ollama_base_url(ollama_base_url))
+
+
+def list_ollama_models(base_url: str = None, timeout: float = 5) -> Optional[set]:
+    """Names of the models pulled on an Ollama server, or None when it can't be reached."""
+    try:
+        response = requests.get(f"{get_ollama_base_url(base_url)}/api/tags", timeout=timeout)
+        response.raise_for_status()
+        return {model["name"] for model in response.json().get("models", [])}
+    except (requests.RequestException, ValueError):
+        return None
+
+
+def is_ollama_model_available(model_name: str, base_url: str = None) -> Optional[bool]:
+    """Whether a model is pulled on the Ollama server, or None when the server can't be reached."""
+    models = list_ollama_models(base_url)
+    if models is None:
+        return None
+    # Names without a tag refer to :latest
+    return model_name in models or (":" not in model_name and f"{model_name}:latest" in models)
+
+
+def get_model_name(llm) -> str:
+    """Get the model name of a ChatGroq or ChatOllama client."""
+    return getattr(llm, "model_name", None) or getattr(llm, "model", None) or "unknown"
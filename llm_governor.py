@@ -0,0 +1,210 @@
+"""
+Concurrency limits for LLM calls, shared by every job of a process.
+Each provider gets a fixed number of call slots (CHRONOLOGY_LLM_LIMITS, e.g.
+"groq=8,ollama=2"). Calls waiting for a slot are queued per owner, such as a
+Streamlit session or a batch, and free slots go to the owners in turn. This
+matters where one process runs several jobs, e.g. the API server's worker
+threads; across worker processes, owners take turns when jobs are claimed (see
+job_queue.claim_next_job). Waiting calls report their queue position.
+
+With CHRONOLOGY_GOVERNOR_DIR set, slots are also file locks in that directory,
+which caps the calls of all processes on the machine sharing it (Streamlit
+workers, job_queue.py, api_server.py, watch_folder.py). Locks are released by
+the OS when a process dies. Across processes, slots go to whichever process
+polls first.
+"""
+import os
+import threading
+import time
+from collections import OrderedDict, deque
+from contextlib import contextmanager
+from typing import Callable, Deque, Dict, List, Optional
+
+from document_models import AgentState
+from llm_clients import ChatModelProxy
+from model_router import resolve_llm
+
+try:
+    import fcntl
+except ImportError:
+    fcntl = None
+
+# Concurrent calls per provider. Ollama serves few requests in parallel well;
+# Groq is bounded by the account's rate limits.
+DEFAULT_LLM_LIMITS = "groq=8,ollama=2"
+
+GOVERNOR_DIR = os.getenv("CHRONOLOGY_GOVERNOR_DIR")
+
+# Seconds between attempts to take a slot held by another process
+SLOT_POLL_INTERVAL = 0.05
+
+PositionCallback = Callable[[Optional[int]], None]
+
+
+def parse_limits(spec: str) -> Dict[str, int]:
+    """Parse limits such as "groq=8,ollama=2"."""
+    limits = {}
+    for item in spec.split(","):
+        if "=" in item:
+            provider, limit = item.split("=", 1)
+            limits[provider.strip()] = max(1, int(limit))
+    return limits
+
+
+LLM_LIMITS = parse_limits(os.getenv("CHRONOLOGY_LLM_LIMITS", DEFAULT_LLM_LIMITS))
+
+
+class _Ticket:
+    __slots__ = ("owner", "granted", "on_position", "position")
+
+    def __init__(self, owner: str, on_position: Optional[PositionCallback]):
+        self.owner = owner
+        self.granted = threading.Event()
+        self.on_position = on_position
+        self.position = None
+
+
+class ProviderGate:
+    """Limits the concurrent calls to one provider, granting free slots to waiting owners in turn."""
+
+    def __init__(self, provider: str, limit: int, slots_dir: str = None):
+        self.provider = provider
+        self.limit = limit
+        self.slots_dir = slots_dir
+        self._lock = threading.Lock()
+        self._active = 0
+        # Waiting tickets per owner; the first owner is served next
+        self._queues: "OrderedDict[str, Deque[_Ticket]]" = OrderedDict()
+
+    def _waiting_order(self) -> List[_Ticket]:
+        """Waiting tickets in the order they will be granted."""
+        queues = [list(queue) for queue in self._queues.values()]
+        order = []
+        for round_index in range(max((len(queue) for queue in queues), default=0)):
+            order.extend(queue[round_index] for queue in queues if round_index < len(queue))
+        return order
+
+    def _positions(self) -> List[tuple]:
+        """Waiting tickets whose position changed, with their new position."""
+        changed = []
+        for position, ticket in enumerate(self._waiting_order(), 1):
+            if ticket.position != position:
+                ticket.position = position
+                changed.append((ticket, position))
+        return changed
+
+    @staticmethod
+    def _report(positions: List[tuple]):
+        # Called outside the lock, since callbacks may write to the job database
+        for ticket, position in positions:
+            if ticket.on_position:
+                ticket.on_position(position)
+
+    def _acquire_local(self, owner: str, on_position: Optional[PositionCallback]) -> bool:
+        """Take a local slot, returning whether the call had to queue for it."""
+        with self._lock:
+            if self._active < self.limit and not self._queues:
+                self._active += 1
+                return False
+            ticket = _Ticket(owner, on_position)
+            self._queues.setdefault(owner, deque()).append(ticket)
+            positions = self._positions()
+        self._report(positions)
+        ticket.granted.wait()
+        return True
+
+    def _release_local(self):
+        with self._lock:
+            if not self._queues:
+                self._active -= 1
+                return
+            # The slot passes straight to the next owner in turn, who then goes to the back
+            owner, queue = next(iter(self._queues.items()))
+            ticket = queue.popleft()
+            del self._queues[owner]
+            if queue:
+                self._queues[owner] = queue
+            positions = self._positions()
+        ticket.granted.set()
+        self._report(positions)
+
+    def _acquire_file_slot(self):
+        """Take one of the provider's slot files, waiting for another process to release one."""
+        os.makedirs(self.slots_dir, exist_ok=True)
+        while True:
+            for slot in range(self.limit):
+                slot_file = open(os.path.join(self.slots_dir, f"{self.provider}.{slot}.lock"), "a")
+                try:
+                    fcntl.flock(slot_file, fcntl.LOCK_EX | fcntl.LOCK_NB)
+                    return slot_file
+                except BlockingIOError:
+                    slot_file.close()
+            time.sleep(SLOT_POLL_INTERVAL)
+
+    @contextmanager
+    def slot(self, owner: str, on_position: Optional[PositionCallback] = None):
+        """Hold a call slot for the enclosed call. on_position receives the queue position while
+        waiting and None once the slot is taken."""
+        queued = self._acquire_local(owner, on_position)
+        slot_file = None
+        try:
+            if self.slots_dir and fcntl:
+                slot_file = self._acquire_file_slot()
+            if queued and on_position:
+                on_position(None)
+            yield
+        finally:
+            if slot_file:
+                # Closing the file releases the lock
+                slot_file.close()
+            self._release_local()
+
+
+_gates: Dict[str, ProviderGate] = {}
+_gates_lock = threading.Lock()
+
+
+def get_gate(llm_provider: str) -> ProviderGate:
+    """Get the process-wide gate of a provider."""
+    with _gates_lock:
+        if llm_provider not in _gates:
+            limit = LLM_LIMITS.get(llm_provider, max(LLM_LIMITS.values(), default=4))
+            _gates[llm_provider] = ProviderGate(llm_provider, limit, GOVERNOR_DIR)
+        return _gates[llm_provider]
+
+
+class GovernedLLM(ChatModelProxy):
+    """Chat model proxy that holds a provider slot for each invoke, stream and batch call."""
+
+    def __init__(self, llm, gate: ProviderGate, owner: str, on_position: Optional[PositionCallback] = None):
+        super().__init__(llm)
+        self.gate = gate
+        self.owner = owner
+        self.on_position = on_position
+
+    def call_context(self):
+        return self.gate.slot(self.owner, self.on_position)
+
+
+class LLMGovernor:
+    """Wraps a chat model or per-stage provider so every stage's calls go through the provider's gate.
+
+    owner identifies whose calls are queued together, e.g. a Streamlit session.
+    on_queue(stage, position) is called while a stage waits for a slot, with
+    None once it has one.
+    """
+
+    def __init__(self, llm, llm_provider: str, owner: str,
+                 on_queue: Callable[[str, Optional[int]], None] = None):
+        self.llm = llm
+        self.gate = get_gate(llm_provider)
+        self.owner = owner
+        self.on_queue = on_queue
+
+    def llm_for(self, stage: str, state: AgentState, pdf_content: str = ""):
+        """Get the governed chat model for a stage, or None when the stage should be skipped."""
+        stage_llm = resolve_llm(self.llm, stage, state, pdf_content)
+        if stage_llm is None:
+            return None
+        on_position = (lambda position: self.on_queue(stage, position)) if self.on_queue else None
+        return GovernedLLM(stage_llm, self.gate, self.owner, on_position)
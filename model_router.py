@@ -0,0 +1,123 @@
+"""
+Adaptive model routing for the Chronology Agent workflow.
+Picks a small, fast model or a large model per stage and per document, based on
+document length, a quick guess of the document type and whether the reflection
+review has already rejected an extraction.
+"""
+import os
+import re
+from typing import Callable, Dict, List, Tuple
+
+from document_models import AgentState
+from llm_clients import is_ollama_model_available
+
+# Fast model used for cheap stages and easy documents, per provider
+SMALL_MODELS = {
+    "groq": os.getenv("GROQ_SMALL_MODEL", "llama-3.1-8b-instant"),
+    "ollama": os.getenv("OLLAMA_SMALL_MODEL", "phi3:mini")
+}
+
+# Documents up to this length are analyzed with the small model
+SHORT_DOCUMENT_CHARS = 6000
+
+# Documents above this length always use the large model
+LONG_DOCUMENT_CHARS = 20000
+
+# Simple, form-like document types the small model extracts reliably
+SIMPLE_DOCUMENT_TYPES = {"transmittal", "email", "site instruction"}
+
+# Header patterns checked against the start of the document, in order
+DOCUMENT_TYPE_PATTERNS = [
+    ("transmittal", re.compile(r"\btransmittal\b", re.IGNORECASE)),
+    ("site instruction", re.compile(r"\b(site|job site)\s+instr?uction\b|\b(SWI|JSI)\b", re.IGNORECASE)),
+    ("minutes", re.compile(r"\bminutes of meeting\b", re.IGNORECASE)),
+    ("variation order", re.compile(r"\bvariation order\b", re.IGNORECASE)),
+    ("RFI", re.compile(r"\brequest for information\b|\bRFI\b")),
+    ("email", re.compile(r"^\s*From:.*\n\s*(To|Sent):", re.IGNORECASE | re.MULTILINE)),
+    ("letter", re.compile(r"\bDear (Sir|Madam|Sirs)\b", re.IGNORECASE)),
+]
+
+# Characters scanned when guessing the document type
+TYPE_DETECTION_CHARS = 3000
+
+
+def detect_document_type(pdf_content: str) -> str:
+    """Guess the document type from its header without calling an LLM."""
+    header = pdf_content[:TYPE_DETECTION_CHARS]
+    for document_type, pattern in DOCUMENT_TYPE_PATTERNS:
+        if pattern.search(header):
+            return document_type
+    return "unknown"
+
+
+class ModelRouter:
+    """Chooses the chat model for each workflow stage of a document.
+
+    Policy:
+    - formatter: always the small model
+    - analyzer: small model for short or simple documents, large model otherwise
+    - reviewer: small model unless the document is long
+    - reanalyzer: always the large model, since the review rejected the extraction
+    """
+
+    def __init__(self, llm_factory: Callable[[str], object], small_model: str, large_model: str):
+        self.llm_factory = llm_factory
+        self.small_model = small_model
+        self.large_model = large_model
+        self.decisions: List[Tuple[str, str, str]] = []
+        self._clients: Dict[str, object] = {}
+
+    @classmethod
+    def for_provider(cls, llm_provider: str, large_model: str, llm_factory: Callable[[str], object],
+                     ollama_base_url: str = None) -> "ModelRouter":
+        """Create a router that escalates from the provider's small model to large_model.
+
+        An Ollama small model that isn't pulled on the server is replaced by large_model.
+        """
+        small_model = SMALL_MODELS.get(llm_provider, large_model)
+        if (llm_provider == "ollama" and small_model != large_model
+                and is_ollama_model_available(small_model, ollama_base_url) is False):
+            print(f"⚠️ Small model {small_model} is not pulled on the Ollama server, routing to {large_model} only")
+            small_model = large_model
+        return cls(llm_factory, small_model, large_model)
+
+    def choose_model(self, stage: str, state: AgentState, pdf_content: str = "") -> Tuple[str, str]:
+        """Return (model_name, reason) for a stage."""
+        content_length = state.get("content_length", 0)
+
+        if stage == "formatter":
+            return self.small_model, "formatting"
+        if stage == "reanalyzer":
+            return self.large_model, "review rejected the extraction"
+        if content_length > LONG_DOCUMENT_CHARS:
+            return self.large_model, f"long document ({content_length:,} chars)"
+        if stage == "reviewer":
+            return self.small_model, "review of a short or medium document"
+
+        document_type = detect_document_type(pdf_content) if pdf_content else "unknown"
+        if content_length <= SHORT_DOCUMENT_CHARS:
+            return self.small_model, f"short document ({content_length:,} chars)"
+        if document_type in SIMPLE_DOCUMENT_TYPES:
+            return self.small_model, f"simple {document_type}"
+        return self.large_model, f"{document_type} document ({content_length:,} chars)"
+
+    def llm_for(self, stage: str, state: AgentState, pdf_content: str = ""):
+        """Get the chat model for a stage, creating and caching clients as needed."""
+        model_name, reason = self.choose_model(stage, state, pdf_content)
+        self.decisions.append((stage, model_name, reason))
+        print(f"🧭 {stage}: {model_name} ({reason})")
+
+        if model_name not in self._clients:
+            self._clients[model_name] = self.llm_factory(model_name)
+        return self._clients[model_name]
+
+
+def resolve_llm(llm, stage: str, state: AgentState, pdf_content: str = ""):
+    """Get the chat model for a stage from a single chat model or a per-stage provider.
+
+    Per-stage providers such as ModelRouter implement llm_for(stage, state, pdf_content)
+    and may return None to skip the LLM call of an optional stage.
+    """
+    if hasattr(llm, "llm_for"):
+        return llm.llm_for(stage, state, pdf_content)
+    return llm
@@ -0,0 +1,148 @@
+"""
+OCR fallback for PDF pages without a text layer.
+Pages are rendered with PyMuPDF and recognized with Tesseract in a process pool.
+Results are cached on disk by a hash of the page content, so a scanned page is
+only recognized once.
+
+Both PyMuPDF (pymupdf) and pytesseract are optional; without them OCR is skipped.
+"""
+import hashlib
+import multiprocessing
+import os
+import tempfile
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+from typing import Dict, List, Optional
+
+try:
+    import pymupdf
+except ImportError:
+    pymupdf = None
+
+try:
+    import pytesseract
+except ImportError:
+    pytesseract = None
+
+OCR_CACHE_DIR = os.getenv("CHRONOLOGY_OCR_CACHE_DIR", os.path.join(".chronology_cache", "ocr"))
+OCR_LANGUAGES = os.getenv("CHRONOLOGY_OCR_LANGUAGES", "eng")
+OCR_DPI = 300
+
+
+def is_ocr_available() -> bool:
+    """Check whether the OCR dependencies and the Tesseract binary are installed."""
+    if pymupdf is None or pytesseract is None:
+        return False
+    try:
+        pytesseract.get_tesseract_version()
+    except (pytesseract.TesseractNotFoundError, OSError):
+        return False
+    return True
+
+
+def compute_page_hash(document, page_number: int) -> str:
+    """Hash a page by its content streams and embedded images."""
+    page = document[page_number]
+    digest = hashlib.sha256(page.read_contents())
+    for image in page.get_images(full=True):
+        digest.update(document.xref_stream_raw(image[0]) or b"")
+    return digest.hexdigest()
+
+
+def _cache_path(page_hash: str) -> str:
+    return os.path.join(OCR_CACHE_DIR, f"{page_hash}.txt")
+
+
+def _read_cached_text(page_hash: str) -> Optional[str]:
+    cache_path = _cache_path(page_hash)
+    if not os.path.exists(cache_path):
+        return None
+    with open(cache_path, encoding="utf-8") as cache_file:
+        return cache_file.read()
+
+
+def _write_cached_text(page_hash: str, text: str):
+    os.makedirs(OCR_CACHE_DIR, exist_ok=True)
+    cache_path = _cache_path(page_hash)
+    # A unique temporary file per call, since thread pool workers may recognize the same page at once
+    temp_fd, temp_path = tempfile.mkstemp(dir=OCR_CACHE_DIR, suffix=".tmp")
+    with os.fdopen(temp_fd, "w", encoding="utf-8") as cache_file:
+        cache_file.write(text)
+    os.replace(temp_path, cache_path)
+
+
+def _open_document(source):
+    """Open a PDF path or in-memory buffer with PyMuPDF."""
+    if isinstance(source, (bytes, bytearray, memoryview)):
+        return pymupdf.open(stream=source, filetype="pdf")
+    return pymupdf.open(source)
+
+
+def _extract_single_page(document, page_number: int) -> bytes:
+    """Copy one page into a standalone PDF, so pool workers get only that page."""
+    with pymupdf.open() as single_page:
+        single_page.insert_pdf(document, from_page=page_number, to_page=page_number)
+        return single_page.tobytes()
+
+
+def ocr_page(source, page_number: int, page_hash: str) -> str:
+    """Render and recognize a single page. Runs inside a pool worker.
+
+    source is either a PDF file path or the bytes of a single-page PDF.
+    """
+    from PIL import Image
+
+    with _open_document(source) as document:
+        pixmap = document[page_number].get_pixmap(dpi=OCR_DPI)
+        image = Image.frombytes("RGB", (pixmap.width, pixmap.height), pixmap.samples)
+
+    text = pytesseract.image_to_string(image, lang=OCR_LANGUAGES)
+    _write_cached_text(page_hash, text)
+    return text
+
+
+def _create_executor(max_workers: int):
+    """Create a process pool, or a thread pool where child processes are not allowed."""
+    if multiprocessing.current_process().daemon:
+        # Daemonic processes cannot have children; Tesseract still runs out of process
+        return ThreadPoolExecutor(max_workers=max_workers)
+    return ProcessPoolExecutor(max_workers=max_workers, mp_context=multiprocessing.get_context("spawn"))
+
+
+def ocr_pages(source, page_numbers: List[int]) -> Dict[int, str]:
+    """Recognize the given pages of a PDF path or in-memory buffer.
+
+    Returns text by page number, or an empty dict when OCR is not available.
+    """
+    if not page_numbers or not is_ocr_available():
+        return {}
+
+    in_memory = isinstance(source, (bytes, bytearray, memoryview))
+    results = {}
+    pending = []
+    with _open_document(source) as document:
+        for page_number in page_numbers:
+            page_hash = compute_page_hash(document, page_number)
+            cached_text = _read_cached_text(page_hash)
+            if cached_text is not None:
+                results[page_number] = cached_text
+            elif in_memory:
+                # Workers can't share the buffer; send them just the scanned page
+                pending.append((page_number, _extract_single_page(document, page_number), 0, page_hash))
+            else:
+                pending.append((page_number, source, page_number, page_hash))
+
+    if pending:
+        print(f"🔎 Running OCR on {len(pending)} page(s) ({len(results)} cached)")
+        max_workers = min(len(pending), os.cpu_count() or 1)
+        with _create_executor(max_workers) as executor:
+            futures = {
+                page_number: executor.submit(ocr_page, page_source, source_page_number, page_hash)
+                for page_number, page_source, source_page_number, page_hash in pending
+            }
+            for page_number, future in futures.items():
+                try:
+                    results[page_number] = future.result()
+                except (RuntimeError, OSError, pytesseract.TesseractError) as e:
+                    print(f"❌ OCR failed on page {page_number + 1}: {e}")
+
+    return results
@@ -0,0 +1,329 @@
+#!/usr/bin/env python3
+"""
+Pluggable PDF text extraction backends.
+pypdf is always available; PyPDF2, PyMuPDF (pymupdf), pdfminer.six and pypdfium2
+are used when installed. A micro-benchmark over sample_documents/ measures the
+speed and text yield of each backend, and the fastest backend whose text yield
+is close to the best one is chosen. The choice is cached per environment.
+
+Run the benchmark with:
+    python pdf_backends.py --sample-dir sample_documents
+"""
+import argparse
+import io
+import json
+import mmap
+import os
+import re
+import threading
+import time
+from importlib import metadata
+from typing import Dict, List, Optional
+
+from pypdf import PdfReader
+
+try:
+    import PyPDF2
+except ImportError:
+    PyPDF2 = None
+
+try:
+    import pymupdf
+except ImportError:
+    pymupdf = None
+
+try:
+    from pdfminer.high_level import extract_pages as pdfminer_extract_pages
+    from pdfminer.layout import LTTextContainer
+except ImportError:
+    pdfminer_extract_pages = None
+
+try:
+    import pypdfium2
+except ImportError:
+    pypdfium2 = None
+
+SAMPLE_DOCUMENTS_DIR = os.getenv("CHRONOLOGY_SAMPLE_DOCUMENTS_DIR", "sample_documents")
+BACKEND_CACHE_PATH = os.getenv(
+    "CHRONOLOGY_PDF_BACKEND_CACHE", os.path.join(".chronology_cache", "pdf_backend.json")
+)
+
+# Backend used when nothing can be benchmarked
+DEFAULT_BACKEND = "pypdf"
+
+# A backend must extract at least this share of the words the best backend finds
+MIN_RELATIVE_YIELD = 0.9
+
+WORD_PATTERN = re.compile(r"[A-Za-z]{2,}")
+
+
+class PdfExtractionError(ValueError):
+    """Raised when a backend cannot parse a PDF."""
+
+
+def _stream_buffer(stream):
+    """Get a buffer over a PDF stream, without copying memory maps and buffer streams."""
+    if isinstance(stream, mmap.mmap):
+        return memoryview(stream)
+    if hasattr(stream, "getbuffer"):
+        return stream.getbuffer()
+    stream.seek(0)
+    return stream.read()
+
+
+class PdfBackend:
+    """Extracts the text of each page of a PDF from a seekable binary stream."""
+
+    name = ""
+    package = ""
+
+    def available(self) -> bool:
+        return True
+
+    def version(self) -> str:
+        try:
+            return metadata.version(self.package)
+        except metadata.PackageNotFoundError:
+            return "unknown"
+
+    def extract_pages(self, stream) -> List[str]:
+        """Extract the text of every page. Parser errors are raised as PdfExtractionError."""
+        try:
+            return self._extract_pages(stream)
+        except (OSError, MemoryError):
+            raise
+        except Exception as e:
+            # Every parser has its own exception types
+            raise PdfExtractionError(f"{self.name}: {e}") from e
+
+    def _extract_pages(self, stream) -> List[str]:
+        raise NotImplementedError
+
+
+class PypdfBackend(PdfBackend):
+    name = "pypdf"
+    package = "pypdf"
+
+    def _extract_pages(self, stream) -> List[str]:
+        reader = PdfReader(stream)
+        return [page.extract_text() or "" for page in reader.pages]
+
+
+class PyPDF2Backend(PdfBackend):
+    name = "PyPDF2"
+    package = "PyPDF2"
+
+    def available(self) -> bool:
+        return PyPDF2 is not None
+
+    def _extract_pages(self, stream) -> List[str]:
+        reader = PyPDF2.PdfReader(stream)
+        return [page.extract_text() or "" for page in reader.pages]
+
+
+class PyMuPDFBackend(PdfBackend):
+    name = "pymupdf"
+    package = "pymupdf"
+
+    def available(self) -> bool:
+        return pymupdf is not None
+
+    def _extract_pages(self, stream) -> List[str]:
+        buffer = _stream_buffer(stream)
+        try:
+            with pymupdf.open(stream=buffer, filetype="pdf") as document:
+                return [page.get_text() for page in document]
+        finally:
+            # A memory map can't be closed while a view of it is alive
+            if isinstance(buffer, memoryview):
+                buffer.release()
+
+
+class PdfminerBackend(PdfBackend):
+    name = "pdfminer"
+    package = "pdfminer.six"
+
+    def available(self) -> bool:
+        return pdfminer_extract_pages is not None
+
+    def _extract_pages(self, stream) -> List[str]:
+        stream.seek(0)
+        return [
+            "".join(element.get_text() for element in page_layout if isinstance(element, LTTextContainer))
+            for page_layout in pdfminer_extract_pages(stream)
+        ]
+
+
+class PdfiumBackend(PdfBackend):
+    name = "pypdfium2"
+    package = "pypdfium2"
+
+    def available(self) -> bool:
+        return pypdfium2 is not None
+
+    def _extract_pages(self, stream) -> List[str]:
+        document = pypdfium2.PdfDocument(bytes(_stream_buffer(stream)))
+        try:
+            pages = []
+            for page in document:
+                text_page = page.get_textpage()
+                pages.append(text_page.get_text_range())
+                text_page.close()
+                page.close()
+            return pages
+        finally:
+            document.close()
+
+
+BACKENDS: Dict[str, PdfBackend] = {
+    backend.name: backend
+    for backend in [PypdfBackend(), PyPDF2Backend(), PyMuPDFBackend(), PdfminerBackend(), PdfiumBackend()]
+}
+
+_selected_backend: Optional[PdfBackend] = None
+_selection_lock = threading.Lock()
+
+
+def available_backends() -> List[PdfBackend]:
+    """Get the backends whose packages are installed."""
+    return [backend for backend in BACKENDS.values() if backend.available()]
+
+
+def count_words(pages: List[str]) -> int:
+    """Count the words of extracted text, as a measure of text yield."""
+    return sum(len(WORD_PATTERN.findall(page_text)) for page_text in pages)
+
+
+def benchmark_backends(sample_dir: str = None, repeats: int = 1) -> List[dict]:
+    """Time every available backend on the sample PDFs.
+
+    Files are read into memory first, so only parsing is measured. Returns one
+    result per backend with its total time, words and characters per document
+    and failures.
+    """
+    sample_dir = sample_dir or SAMPLE_DOCUMENTS_DIR
+    samples = {}
+    for file_name in sorted(os.listdir(sample_dir)):
+        if file_name.lower().endswith(".pdf"):
+            with open(os.path.join(sample_dir, file_name), "rb") as pdf_file:
+                samples[file_name] = pdf_file.read()
+
+    results = []
+    for backend in available_backends():
+        result = {"backend": backend.name, "version": backend.version(), "seconds": 0.0,
+                  "words": {}, "chars": 0, "failures": []}
+        for file_name, data in samples.items():
+            try:
+                for _ in range(repeats):
+                    start = time.perf_counter()
+                    pages = backend.extract_pages(io.BytesIO(data))
+                    result["seconds"] += time.perf_counter() - start
+                result["words"][file_name] = count_words(pages)
+                result["chars"] += sum(len(page_text) for page_text in pages)
+            except Exception as e:
+                # A backend that fails on a sample is never selected
+                result["failures"].append(f"{file_name}: {e}")
+        result["seconds"] /= repeats
+        results.append(result)
+    return results
+
+
+def choose_backend(results: List[dict]) -> str:
+    """Pick the fastest backend without failures whose yield is close to the best on every document."""
+    if not results:
+        return DEFAULT_BACKEND
+
+    best_words = {}
+    for result in results:
+        for file_name, words in result["words"].items():
+            best_words[file_name] = max(best_words.get(file_name, 0), words)
+
+    acceptable = [
+        result for result in results
+        if not result["failures"] and all(
+            result["words"].get(file_name, 0) >= MIN_RELATIVE_YIELD * words
+            for file_name, words in best_words.items()
+        )
+    ]
+    if not acceptable:
+        return DEFAULT_BACKEND
+    return min(acceptable, key=lambda result: result["seconds"])["backend"]
+
+
+def _environment_fingerprint() -> str:
+    """Identify the installed backends, so a cached choice is redone after upgrades."""
+    return ",".join(f"{backend.name}=={backend.version()}" for backend in available_backends())
+
+
+def _read_cached_choice() -> Optional[str]:
+    try:
+        with open(BACKEND_CACHE_PATH, encoding="utf-8") as cache_file:
+            cached = json.load(cache_file)
+    except (OSError, ValueError):
+        return None
+    if cached.get("environment") != _environment_fingerprint():
+        return None
+    return cached.get("backend")
+
+
+def select_backend(sample_dir: str = None, repeats: int = 1) -> str:
+    """Benchmark the backends, cache the choice for this environment and return its name."""
+    sample_dir = sample_dir or SAMPLE_DOCUMENTS_DIR
+    if not os.path.isdir(sample_dir):
+        return DEFAULT_BACKEND
+
+    results = benchmark_backends(sample_dir, repeats)
+    backend_name = choose_backend(results)
+    save_backend_choice(backend_name, results)
+    return backend_name
+
+
+def save_backend_choice(backend_name: str, results: List[dict]):
+    """Cache a backend choice and its benchmark results for this environment."""
+    os.makedirs(os.path.dirname(BACKEND_CACHE_PATH) or ".", exist_ok=True)
+    temp_path = f"{BACKEND_CACHE_PATH}.{os.getpid()}.tmp"
+    with open(temp_path, "w", encoding="utf-8") as cache_file:
+        json.dump({"environment": _environment_fingerprint(), "backend": backend_name, "results": results},
+                  cache_file, indent=2)
+    os.replace(temp_path, BACKEND_CACHE_PATH)
+
+
+def get_backend() -> PdfBackend:
+    """Get the extraction backend for this process.
+
+    CHRONOLOGY_PDF_BACKEND forces a backend. Otherwise the cached benchmark choice
+    is used, benchmarking on first use.
+    """
+    global _selected_backend
+    with _selection_lock:
+        if _selected_backend is None:
+            backend_name = os.getenv("CHRONOLOGY_PDF_BACKEND") or _read_cached_choice() or select_backend()
+            backend = BACKENDS.get(backend_name)
+            if backend is None or not backend.available():
+                print(f"⚠️ PDF backend {backend_name} is not available, using {DEFAULT_BACKEND}")
+                backend = BACKENDS[DEFAULT_BACKEND]
+            print(f"📚 Using PDF backend: {backend.name}")
+            _selected_backend = backend
+        return _selected_backend
+
+
+def main():
+    """Benchmark the installed backends and cache the selection."""
+    parser = argparse.ArgumentParser(description="Benchmark PDF extraction backends")
+    parser.add_argument("--sample-dir", default=SAMPLE_DOCUMENTS_DIR, help="Directory with sample PDFs")
+    parser.add_argument("--repeats", type=int, default=3, help="Timed runs per document")
+    args = parser.parse_args()
+
+    results = benchmark_backends(args.sample_dir, args.repeats)
+    for result in sorted(results, key=lambda result: result["seconds"]):
+        status = f"{len(result['failures'])} failure(s)" if result["failures"] else "ok"
+        print(f"{result['backend']:<10} {result['seconds']:8.3f}s  {sum(result['words'].values()):>8,} words  "
+              f"{result['chars']:>9,} chars  {status}")
+
+    backend_name = choose_backend(results)
+    save_backend_choice(backend_name, results)
+    print(f"✅ Selected backend: {backend_name}")
+
+
+if __name__ == "__main__":
+    main()
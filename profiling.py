@@ -0,0 +1,195 @@
+"""
+Opt-in CPU and memory profiling of the Chronology Agent workflow.
+Enable it with CHRONOLOGY_PROFILE=1, the "Profile runs" sidebar toggle or
+run_chronology_workflow(..., profile=True). Each profiled stage writes to
+.chronology_profiles/<run_id>-<timestamp>/:
+
+- <name>.pstats: cProfile statistics (snakeviz, flameprof, pstats)
+- <name>.collapsed: sampled stacks in collapsed format (flamegraph.pl, speedscope)
+- <name>.allocations.txt: top allocating lines from tracemalloc snapshots
+- summary.tsv: wall time, CPU time, samples and memory per stage
+
+Memory figures are process-wide, so they include stages running concurrently.
+"""
+import cProfile
+import os
+import sys
+import threading
+import time
+import tracemalloc
+import uuid
+from contextlib import contextmanager, nullcontext
+from typing import Dict, Optional
+
+PROFILES_DIR = os.getenv("CHRONOLOGY_PROFILES_DIR", ".chronology_profiles")
+
+# Seconds between stack samples
+SAMPLE_INTERVAL = 0.005
+
+# Frames kept per allocation traceback
+TRACEMALLOC_FRAMES = 10
+
+# Allocating lines listed per stage
+TOP_ALLOCATIONS = 25
+
+SUMMARY_HEADER = "name\twall_s\tcpu_s\tsamples\tallocated_kb\tpeak_kb\n"
+
+_tracemalloc_lock = threading.Lock()
+_tracemalloc_users = 0
+
+
+def is_profiling_enabled() -> bool:
+    """Check whether profiling is enabled through CHRONOLOGY_PROFILE."""
+    return os.getenv("CHRONOLOGY_PROFILE", "").lower() in ("1", "true", "yes", "on")
+
+
+def new_run_name(run_id: str = None) -> str:
+    """Name a profiled run so that reruns of the same run ID don't overwrite each other."""
+    timestamp = time.strftime("%Y%m%d-%H%M%S")
+    return f"{run_id}-{timestamp}" if run_id else f"{timestamp}-{uuid.uuid4().hex[:8]}"
+
+
+def profile_section(profiler: Optional["RunProfiler"], name: str):
+    """Profile a numbered section with profiler, or do nothing when profiling is off."""
+    return profiler.profile(profiler.next_name(name)) if profiler else nullcontext()
+
+
+def _acquire_tracemalloc():
+    global _tracemalloc_users
+    with _tracemalloc_lock:
+        if _tracemalloc_users == 0 and not tracemalloc.is_tracing():
+            tracemalloc.start(TRACEMALLOC_FRAMES)
+        _tracemalloc_users += 1
+
+
+def _release_tracemalloc():
+    global _tracemalloc_users
+    with _tracemalloc_lock:
+        _tracemalloc_users -= 1
+        if _tracemalloc_users == 0:
+            tracemalloc.stop()
+
+
+def _frame_label(frame) -> str:
+    code = frame.f_code
+    return f"{code.co_name} ({os.path.basename(code.co_filename)}:{code.co_firstlineno})"
+
+
+class StackSampler:
+    """Samples the stack of one thread at a fixed interval from a background thread."""
+
+    def __init__(self, thread_id: int, interval: float = SAMPLE_INTERVAL):
+        self.thread_id = thread_id
+        self.interval = interval
+        self.stacks: Dict[str, int] = {}
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._run, daemon=True)
+
+    def _run(self):
+        while not self._stop.wait(self.interval):
+            frame = sys._current_frames().get(self.thread_id)
+            labels = []
+            while frame is not None:
+                labels.append(_frame_label(frame))
+                frame = frame.f_back
+            if labels:
+                # Collapsed stacks are listed root first
+                stack = ";".join(reversed(labels))
+                self.stacks[stack] = self.stacks.get(stack, 0) + 1
+
+    def start(self):
+        self._thread.start()
+
+    def stop(self) -> int:
+        """Stop sampling and return the number of samples taken."""
+        self._stop.set()
+        self._thread.join()
+        return sum(self.stacks.values())
+
+    def write_collapsed(self, path: str):
+        with open(path, "w", encoding="utf-8") as collapsed_file:
+            for stack, count in sorted(self.stacks.items()):
+                collapsed_file.write(f"{stack} {count}\n")
+
+
+class RunProfiler:
+    """Profiles named sections of a workflow run into a per-run directory."""
+
+    def __init__(self, run_name: str = None, profiles_dir: str = None):
+        self.run_dir = os.path.join(profiles_dir or PROFILES_DIR, run_name or new_run_name())
+        self._lock = threading.Lock()
+        self._sequence = 0
+
+    def next_name(self, name: str) -> str:
+        """Prefix a section name with a sequence number, keeping artifacts in run order."""
+        with self._lock:
+            self._sequence += 1
+            return f"{self._sequence:03d}_{name}"
+
+    @contextmanager
+    def profile(self, name: str, memory: bool = True):
+        """Profile the enclosed code. Artifacts are written even if it raises.
+
+        With memory=False, tracemalloc stays off, since it slows every thread of the
+        process while tracing; no allocations file is written and memory reads 0.
+        """
+        os.makedirs(self.run_dir, exist_ok=True)
+        base_path = os.path.join(self.run_dir, name.replace(os.sep, "_"))
+
+        if memory:
+            _acquire_tracemalloc()
+            before = tracemalloc.take_snapshot()
+            tracemalloc.reset_peak()
+        sampler = StackSampler(threading.get_ident())
+        sampler.start()
+
+        # Only one cProfile profiler can be active at a time on newer Pythons
+        profiler: Optional[cProfile.Profile] = cProfile.Profile()
+        try:
+            profiler.enable()
+        except ValueError:
+            profiler = None
+
+        wall_start = time.perf_counter()
+        cpu_start = time.thread_time()
+        try:
+            yield
+        finally:
+            cpu_seconds = time.thread_time() - cpu_start
+            wall_seconds = time.perf_counter() - wall_start
+            if profiler:
+                profiler.disable()
+            samples = sampler.stop()
+            allocated = peak = 0
+            if memory:
+                after = tracemalloc.take_snapshot()
+                _, peak = tracemalloc.get_traced_memory()
+                _release_tracemalloc()
+
+            # Artifacts are written after measuring so they don't show up in the profile
+            if profiler:
+                profiler.dump_stats(f"{base_path}.pstats")
+            sampler.write_collapsed(f"{base_path}.collapsed")
+
+            if memory:
+                differences = after.compare_to(before, "lineno")
+                allocated = sum(difference.size_diff for difference in differences)
+                with open(f"{base_path}.allocations.txt", "w", encoding="utf-8") as allocations_file:
+                    allocations_file.write(f"Top {TOP_ALLOCATIONS} allocating lines for {name}\n\n")
+                    for difference in differences[:TOP_ALLOCATIONS]:
+                        allocations_file.write(f"{difference}\n")
+
+            self._write_summary(name, wall_seconds, cpu_seconds, samples, allocated, peak)
+            print(f"🔬 Profiled {name}: {wall_seconds:.2f}s wall, {cpu_seconds:.2f}s CPU, "
+                  f"{allocated / 1024:,.0f} KB allocated")
+
+    def _write_summary(self, name: str, wall_seconds: float, cpu_seconds: float,
+                       samples: int, allocated: int, peak: int):
+        summary_path = os.path.join(self.run_dir, "summary.tsv")
+        with self._lock:
+            is_new = not os.path.exists(summary_path)
+            with open(summary_path, "a", encoding="utf-8") as summary_file:
+                if is_new:
+                    summary_file.write(SUMMARY_HEADER)
+                summary_file.write(f"{name}\t{wall_seconds:.4f}\t{cpu_seconds:.4f}\t{samples}\t"
+                                   f"{allocated / 1024:.1f}\t{peak / 1024:.1f}\n")
@@ -1,52 +1,117 @@
-from langchain_core.messages import HumanMessage, SystemMessage
-from langchain_core.tools import tool
-
-from document_models import AgentState, DocumentData
-
-REVIEW_PROMPT = '''
-You are a comprehensive quality assurance agent specializing in legal document analysis. Your role is to ensure NO information is missed and ALL data is completely extracted.
-
-Perform an exhaustive review of the extracted document data against the original document:
-
-COMPLETENESS CHECK:
-1. document_type - Must be specific and accurate (letter, email, RFI, IR, submittal, transmittal, VO, SWI, drawing, notice, claim, etc.)
-2. document_date - Must be in YYYY-MM-DD format and correctly extracted
-3. document_description - Must be COMPREHENSIVE, following the document's chronological order, and include ALL details, context, purpose, requests, decisions, implications
-4. document_senderparty - Must include EVERY sending organization, individual, role, title mentioned in the document
-5. document_recipientparty - Must include EVERY receiving organization, individual, role, title mentioned in the document
-6. document_mainreference - Must include the primary/main reference number, code, or identifier for the document
-7. document_otherreferences - Must include ALL other reference numbers, codes, project numbers, file numbers, version numbers mentioned
+import json
+import re
+from typing import Optional
 
-THOROUGH ANALYSIS REQUIRED:
-- Scan for missed information in headers, footers, signatures, metadata
-- Check for implied or referenced information not captured
-- Verify all dates, deadlines, and time references are extracted
-- Ensure all communication patterns and responses are noted
-- Validate technical details, specifications, and requirements are included
-- Confirm cost, time, and resource implications are captured
-- Verify all sender parties (organizations/individuals sending the document) are identified with detailed roles
-- Verify all recipient parties (organizations/individuals receiving the document) are identified with detailed roles
-- Ensure the document description maintains chronological order as it appears in the original document
-- Confirm all main and other reference numbers/codes are captured separately
-
-REVIEW PROCESS:
-1. Compare extracted data line-by-line with original document
-2. Identify any missing information, no matter how small
-3. Check for incomplete descriptions or summaries that need expansion and ensure chronological order is maintained
-4. Verify all sender parties and recipient parties mentioned anywhere in the document are properly categorized
-5. Ensure the main reference and all other references/codes are captured
-6. Validate that the description follows the document's natural order and flow
-
-If ANY information is missing, incomplete, or could be more detailed, provide specific feedback on what needs to be added or improved.
+from langchain_core.tools import tool
 
-If the extraction is truly comprehensive and complete with NO missing information, respond with "COMPLETE".
+from document_models import AgentState, DocumentData, ReviewVerdict
+from document_prompts import build_review_messages
+from text_store import load_pdf_content
+
+# LLM reviews per document; once this many have rejected the data it is accepted as is
+MAX_REVIEW_CALLS = 2
+
+REVIEW_STATUSES = ("COMPLETE", "INCOMPLETE")
+
+# Words that turn a free-text "complete" into a rejection, e.g. "Complete, but the date is missing"
+NEGATION_PATTERN = re.compile(r"\b(not|no|never|incomplete|missing|lacks?|lacking|without)\b|n't\b", re.IGNORECASE)
+
+
+def find_json_object(text: str) -> Optional[str]:
+    """Return the first complete JSON object in text, or None if it hasn't closed yet."""
+    start = text.find("{")
+    if start < 0:
+        return None
+
+    depth = 0
+    in_string = False
+    escaped = False
+    for index in range(start, len(text)):
+        char = text[index]
+        if in_string:
+            if escaped:
+                escaped = False
+            elif char == "\\":
+                escaped = True
+            elif char == '"':
+                in_string = False
+        elif char == '"':
+            in_string = True
+        elif char == "{":
+            depth += 1
+        elif char == "}":
+            depth -= 1
+            if depth == 0:
+                return text[start:index + 1]
+    return None
+
+
+def parse_review_verdict(text: str) -> Optional[ReviewVerdict]:
+    """Parse the JSON verdict at the start of a review, or None if there is no valid one yet."""
+    json_text = find_json_object(text)
+    if json_text is None:
+        return None
 
-Be extremely thorough - it is better to request more detail than to miss important information.
-'''
+    try:
+        data = json.loads(json_text)
+    except json.JSONDecodeError:
+        return None
+    if not isinstance(data, dict):
+        return None
+
+    status = str(data.get("status", "")).strip().upper()
+    if status not in REVIEW_STATUSES:
+        return None
+
+    missing_fields = data.get("missing_fields") or []
+    if isinstance(missing_fields, str):
+        missing_fields = [missing_fields]
+    return ReviewVerdict(status=status, missing_fields=[str(field) for field in missing_fields])
+
+
+def parse_free_text_verdict(text: str) -> ReviewVerdict:
+    """Fallback for reviews without a JSON verdict. Only a reply that starts with "COMPLETE"
+    and negates nothing counts as complete; anything else is INCOMPLETE."""
+    # Markdown emphasis or quotes may precede the verdict
+    reply = text.strip().lstrip("*_#>\"' ")
+    if re.match(r"COMPLETE\b", reply, re.IGNORECASE) and not NEGATION_PATTERN.search(reply):
+        return ReviewVerdict(status="COMPLETE")
+    return ReviewVerdict(status="INCOMPLETE", missing_fields=[text.strip()] if text.strip() else [])
+
+
+def stream_review_verdict(llm, messages) -> ReviewVerdict:
+    """Stream a review and stop generating as soon as its verdict is known."""
+    review_text = ""
+    stream = llm.stream(messages)
+    try:
+        for chunk in stream:
+            content = str(chunk.content)
+            review_text += content
+            if "}" in content:
+                verdict = parse_review_verdict(review_text)
+                if verdict:
+                    print(f"🛑 Review verdict {verdict.status} after {len(review_text)} characters, stopping")
+                    return verdict
+    finally:
+        # Closing the stream ends generation on the provider side
+        stream.close()
+
+    return parse_review_verdict(review_text) or parse_free_text_verdict(review_text)
+
+
+def format_review_feedback(verdict: ReviewVerdict) -> str:
+    """Format a review verdict for display."""
+    if verdict.status == "COMPLETE":
+        return "COMPLETE - no missing information found."
+    if not verdict.missing_fields:
+        return "INCOMPLETE - the reviewer did not list the missing information."
+    return "INCOMPLETE - missing or incomplete information:\n" + "\n".join(
+        f"- {field}" for field in verdict.missing_fields
+    )
 
 
 @tool
-def review_extracted_data(document_data: DocumentData, pdf_content: str, llm) -> str:
+def review_extracted_data(document_data: DocumentData, pdf_content: str, llm) -> ReviewVerdict:
     """Review extracted data for completeness and accuracy."""
 
     # Create detailed data summary for thorough review
@@ -82,30 +147,29 @@ def review_extracted_data(document_data: DocumentData, pdf_content: str, llm) ->
     Please perform a comprehensive review to ensure ALL information from the original document has been captured.
     """
 
-    messages = [
-        SystemMessage(content=REVIEW_PROMPT),
-        HumanMessage(content=f"ORIGINAL DOCUMENT:\n{pdf_content}\n\n{data_summary}")
-    ]
+    # The instructions and document come first so this call reuses the analysis prefix
+    messages = build_review_messages(pdf_content, data_summary)
 
     try:
-        response = llm.invoke(messages)
-        return response.content
+        return stream_review_verdict(llm, messages)
     except Exception as e:
         print(f"❌ LLM invocation error: {e}")
-        return f"Review error: {str(e)}"
+        return ReviewVerdict(status="INCOMPLETE", missing_fields=[f"Review error: {str(e)}"])
 
 
 def reflection_node(state: AgentState, llm) -> AgentState:
     """Review extracted data for completeness."""
     document_data = state.get("document_data", DocumentData())
-    pdf_content = state.get("pdf_content", "")
+    pdf_content = load_pdf_content(state)
     retry_count = state.get("retry_count", 0)
 
     if not pdf_content:
-        return {**state, "review_feedback": "No content to review", "is_complete": False}
+        # Counted as a review, so the review loop still ends
+        return {**state, "review_feedback": "No content to review", "is_complete": False,
+                "retry_count": retry_count + 1}
 
     # If we've retried too many times, mark as complete to avoid infinite loop
-    if retry_count >= 2:
+    if retry_count >= MAX_REVIEW_CALLS:
         return {
             **state,
             "review_feedback": "Maximum retries reached. Proceeding with current data.",
@@ -113,17 +177,17 @@ def reflection_node(state: AgentState, llm) -> AgentState:
         }
 
     # Use the tool to review data
-    feedback = review_extracted_data.invoke({
+    verdict = review_extracted_data.invoke({
         "document_data": document_data,
         "pdf_content": pdf_content,
         "llm": llm
     })
 
-    is_complete = "COMPLETE" in feedback.upper() or retry_count >= 2
+    is_complete = verdict.status == "COMPLETE" or retry_count >= MAX_REVIEW_CALLS
 
     return {
         **state,
-        "review_feedback": feedback,
+        "review_feedback": format_review_feedback(verdict),
         "is_complete": is_complete,
         "retry_count": retry_count + 1
     }
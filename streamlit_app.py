@@ -3,19 +3,25 @@
 Streamlit interface for the Chronology Agent workflow.
 Provides real-time progress tracking and file upload functionality.
 Supports ChatGroq and local Ollama servers.
+Documents are processed by background workers (see job_queue.py).
 """
 import os
-import tempfile
+import re
 import time
+import uuid
 import requests
 
 import streamlit as st
 
-from document_analyzer import document_analyzer_node
-from document_formatter import document_formatter_node
-from document_models import DocumentData, AgentState
-from document_reader import document_reader_node
-from reflection_agent import reflection_node
+from chronology_pipeline import WORKFLOW_STEPS
+from document_models import DocumentData, deserialize_state
+from document_reader import estimate_text_length
+from embedding_index import DESCRIPTION, chunk_text, get_index
+from job_queue import (COMPLETED, FAILED, QUEUED, RUNNING, enqueue_job, get_queue_position, list_jobs, retry_job,
+                       start_workers)
+from llm_clients import create_groq_llm, start_ollama_warm_up
+from profiling import RunProfiler, is_profiling_enabled
+from usage_ledger import BUDGET_DEGRADE_FRACTION, UsageLedger, project_batch_usage
 
 
 def get_groq_api_key():
@@ -55,68 +61,60 @@ def test_ollama_connection(base_url: str) -> bool:
 def create_groq_client(model_name: str = "llama-3.1-70b-versatile"):
     """Create ChatGroq client."""
     try:
-        from langchain_groq import ChatGroq
         api_key = get_groq_api_key()
         if not api_key:
             st.error("❌ GROQ_API_KEY not found in secrets or environment variables")
             return None
 
-        return ChatGroq(
-            groq_api_key=api_key,
-            model_name=model_name,
-            temperature=0,
-            max_tokens=8192
-        )
+        return create_groq_llm(model_name, api_key)
     except Exception as e:
         st.error(f"❌ Failed to initialize ChatGroq: {str(e)}")
         return None
 
 
-def create_ollama_client(model_name: str, base_url: str):
-    """Create ChatOllama client with custom base URL."""
-    try:
-        from langchain_ollama import ChatOllama
-        return ChatOllama(
-            model=model_name,
-            temperature=0,
-            num_ctx=16000,
-            base_url=base_url,
-        )
-    except Exception as e:
-        st.error(f"❌ Failed to initialize Ollama: {str(e)}")
-        return None
+@st.cache_resource
+def get_job_workers():
+    """Start the background job workers once per Streamlit server process."""
+    worker_count = int(os.getenv("CHRONOLOGY_WORKERS", "2"))
+    worker_config = {
+        "groq_api_key": get_groq_api_key(),
+        "ollama_base_url": get_ollama_base_url()
+    }
+    return start_workers(worker_count, worker_config)
 
 
 def init_session_state():
     """Initialize session state variables."""
-    if 'workflow_status' not in st.session_state:
-        st.session_state.workflow_status = {}
-    if 'result' not in st.session_state:
-        st.session_state.result = None
-    if 'processing' not in st.session_state:
-        st.session_state.processing = False
-
-
-def update_status(step: str, status: str, message: str = ""):
-    """Update the status of a workflow step."""
-    st.session_state.workflow_status[step] = {
-        'status': status,  # 'pending', 'running', 'completed', 'error'
-        'message': message,
-        'timestamp': time.time()
-    }
-
-
-def display_status_card(step_name: str, step_key: str, description: str):
+    if 'selected_job_id' not in st.session_state:
+        st.session_state.selected_job_id = None
+    if 'enqueued_files' not in st.session_state:
+        st.session_state.enqueued_files = {}
+    if 'warmed_up_models' not in st.session_state:
+        st.session_state.warmed_up_models = set()
+    if 'session_id' not in st.session_state:
+        # The token in the URL keeps a browser's jobs across reloads; other sessions
+        # never see them. Jobs of a session take turns with other sessions' jobs.
+        session_id = st.query_params.get("session", "")
+        if not re.fullmatch(r"[0-9a-f]{32}", session_id):
+            session_id = uuid.uuid4().hex
+            st.query_params["session"] = session_id
+        st.session_state.session_id = session_id
+
+
+def display_status_card(step_name: str, step_key: str, description: str, workflow_status: dict,
+                        llm_provider: str = "LLM"):
     """Display a status card for a workflow step."""
-    if step_key not in st.session_state.workflow_status:
+    queue_position = None
+    if step_key not in workflow_status:
         status = 'pending'
         message = ""
         icon = "⏳"
         color = "gray"
     else:
-        step_info = st.session_state.workflow_status[step_key]
+        step_info = workflow_status[step_key]
         status = step_info['status']
         message = step_info['message']
+        queue_position = step_info.get('queue_position')
 
         if status == 'pending':
             icon = "⏳"
@@ -149,165 +147,162 @@ def display_status_card(step_name: str, step_key: str, description: str):
                     st.success(message)
                 else:
                     st.info(message)
+            if queue_position and status == 'running':
+                st.caption(f"⏳ Position {queue_position} in the {llm_provider} queue")
         st.divider()
 
 
-def run_chronology_workflow(file_path: str, progress_container, llm_provider: str = "groq", model_name: str = "llama-3.1-70b-versatile"):
-    """Run the chronology workflow with real-time progress updates."""
-
-    with progress_container.container():
-        st.subheader("🔄 Workflow Progress")
-
-        # Initialize all steps as pending
-        steps = [
-            ("reader", "📖 Document Reader", "Loading and extracting text from PDF"),
-            ("analyzer", "🔍 Document Analyzer", "Analyzing content and extracting structured data"),
-            ("reviewer", "🔍 Reflection Agent", "Reviewing data completeness and accuracy"),
-            ("formatter", "📝 Document Formatter", "Formatting final chronology output")
-        ]
-
-        for step_key, step_name, description in steps:
-            update_status(step_key, 'pending')
-
-        # Display initial status
-        status_placeholder = st.empty()
-
-        try:
-            # Create the agent graph
-            update_status("reader", "running", "Initializing workflow...")
-            with status_placeholder.container():
-                for step_key, step_name, description in steps:
-                    display_status_card(step_name, step_key, description)
-
-            # Prepare initial state
-            initial_state: AgentState = {
-                "file_path": file_path,
-                "pdf_content": "",
-                "document_data": DocumentData(),
-                "review_feedback": "",
-                "formatted_output": "",
-                "is_complete": False,
-                "retry_count": 0
-            }
-
-            # Custom workflow execution with status updates
-            state = initial_state.copy()
-
-            # Step 1: Document Reader
-            update_status("reader", "running", "Loading PDF document...")
-            with status_placeholder.container():
-                for step_key, step_name, description in steps:
-                    display_status_card(step_name, step_key, description)
-            time.sleep(1)  # Brief pause for UI update
-
-            state = document_reader_node(state)
-
-            if state.get("pdf_content"):
-                char_count = len(state["pdf_content"])
-                update_status("reader", "completed", f"Successfully loaded {char_count:,} characters")
-            else:
-                update_status("reader", "error", "Failed to load PDF content")
-                return None
-
-            # Step 2: Document Analyzer
-            update_status("analyzer", "running", "Analyzing document with AI...")
-            with status_placeholder.container():
-                for step_key, step_name, description in steps:
-                    display_status_card(step_name, step_key, description)
-            time.sleep(1)
-
-            # Create LLM for analysis
-            try:
-                if llm_provider == "groq":
-                    llm = create_groq_client(model_name)
-                    if llm is None:
-                        st.error("❌ Failed to create ChatGroq client")
-                        return None
-                    st.info(f"🤖 Using ChatGroq model: {model_name}")
-                else:
-                    # Fallback to Ollama
-                    base_url = get_ollama_base_url()
-                    if not test_ollama_connection(base_url):
-                        st.error(f"❌ Ollama server not reachable at {base_url}")
-                        return None
-                    llm = create_ollama_client(model_name, base_url)
-                    if llm is None:
-                        st.error("❌ Failed to create Ollama client")
-                        return None
-                    st.info(f"🤖 Using Ollama model: {model_name} at {base_url}")
-            except Exception as e:
-                st.error(f"❌ Failed to initialize LLM: {str(e)}")
-                return None
-
-            state = document_analyzer_node(state, llm)
-
-            doc_data = state.get("document_data", DocumentData())
-            if doc_data.document_type:
-                update_status("analyzer", "completed", f"Extracted {doc_data.document_type} document data")
-            else:
-                update_status("analyzer", "error", "Failed to extract document data")
-
-            # Step 3: Reflection Agent
-            update_status("reviewer", "running", "Reviewing data quality...")
-            with status_placeholder.container():
-                for step_key, step_name, description in steps:
-                    display_status_card(step_name, step_key, description)
-            time.sleep(1)
-
-            # Run reflection with retry logic
-            max_retries = 2
-            for attempt in range(max_retries + 1):
-                state = reflection_node(state, llm)
-                if state.get("is_complete", False):
-                    break
-                if attempt < max_retries:
-                    update_status("reviewer", "running", f"Retry {attempt + 1}/{max_retries} - Re-analyzing...")
-                    state = document_analyzer_node(state, llm)
-                    with status_placeholder.container():
-                        for step_key, step_name, description in steps:
-                            display_status_card(step_name, step_key, description)
-                    time.sleep(1)
-
-            if state.get("is_complete", False):
-                update_status("reviewer", "completed", "Data quality review passed")
-            else:
-                update_status("reviewer", "completed", "Completed with maximum retries")
+def display_job_progress(job: dict):
+    """Display the workflow progress of a background job."""
+    st.subheader("🔄 Workflow Progress")
+    st.caption(f"Job {job['id']} • {job['file_name']} • {job['llm_provider']} / {job['model_name']}")
 
-            # Step 4: Document Formatter
-            update_status("formatter", "running", "Formatting chronology output...")
-            with status_placeholder.container():
-                for step_key, step_name, description in steps:
-                    display_status_card(step_name, step_key, description)
-            time.sleep(1)
+    if job['status'] == QUEUED:
+        queue_position = get_queue_position(job['id'])
+        position_note = f" (position {queue_position} in the queue)" if queue_position else ""
+        st.info(f"⏳ Waiting for a free worker{position_note}...")
+    elif job['status'] == FAILED:
+        st.error(f"Workflow failed: {job['error']}")
+        if st.button("🔁 Retry Job", help="Resume the job from its last completed stage"):
+            retry_job(job['id'])
+            st.rerun()
 
-            state = document_formatter_node(state, llm)
+    if job['usage']:
+        totals = UsageLedger(job['usage']).totals()
+        st.caption(f"💰 {totals['total_tokens']:,} tokens in {totals['calls']} LLM calls • ${totals['cost']:.4f}")
 
-            if state.get("formatted_output"):
-                update_status("formatter", "completed", "Chronology formatted successfully")
-            else:
-                update_status("formatter", "error", "Failed to format output")
+    for step_key, step_name, description in WORKFLOW_STEPS:
+        display_status_card(step_name, step_key, description, job['workflow_status'], job['llm_provider'])
 
-            # Final status update
-            with status_placeholder.container():
-                for step_key, step_name, description in steps:
-                    display_status_card(step_name, step_key, description)
 
-            return state
+@st.cache_data(show_spinner=False)
+def estimate_content_length(file_id: str, _buffer) -> int:
+    """Estimate the text length of an upload once per file."""
+    try:
+        return estimate_text_length(_buffer)
+    except Exception:
+        # Unreadable files fail in the reader; they add nothing to the projection
+        return 0
+
+
+def display_usage_projection(projection: dict, max_tokens: int, max_cost: float):
+    """Display the projected token usage and cost of a batch before it is processed."""
+    expected = projection["expected"]
+    maximum = projection["maximum"]
+
+    col1, col2, col3 = st.columns(3)
+    col1.metric("Projected Tokens", f"{expected['total_tokens']:,}")
+    col2.metric("Projected Cost", f"${expected['cost']:.4f}")
+    col3.metric("Worst Case Cost", f"${maximum['cost']:.4f}", help="If every review requests all retries")
+
+    fractions = [0.0]
+    if max_tokens:
+        fractions.append(expected["total_tokens"] / max_tokens)
+    if max_cost:
+        fractions.append(expected["cost"] / max_cost)
+    if max(fractions) >= 1:
+        st.warning("⚠️ The projection exceeds the budget; documents may fail once it is used up.")
+    elif max(fractions) >= BUDGET_DEGRADE_FRACTION:
+        st.warning("⚠️ The projection is close to the budget; later documents may skip review "
+                   "and use template formatting.")
+
+
+def display_usage(usage: list):
+    """Display the token usage and cost of a job by stage, model and document."""
+    ledger = UsageLedger(usage)
+    totals = ledger.totals()
+
+    col1, col2, col3 = st.columns(3)
+    col1.metric("LLM Calls", totals["calls"])
+    col2.metric("Tokens", f"{totals['total_tokens']:,}")
+    col3.metric("Cost", f"${totals['cost']:.4f}")
+
+    for field, title in [("stage", "By Stage"), ("model", "By Model"), ("document", "By Document")]:
+        st.markdown(f"**{title}**")
+        st.table([
+            {field: os.path.basename(key) if field == "document" else key,
+             "calls": summary["calls"],
+             "input tokens": summary["input_tokens"],
+             "output tokens": summary["output_tokens"],
+             "cost (USD)": f"{summary['cost']:.4f}"}
+            for key, summary in ledger.summarize(field).items()
+        ])
+
+    if any(record.estimated for record in ledger.records):
+        st.caption("Some calls reported no usage; their tokens are estimated from the text length.")
+
+
+def display_document_data(doc_data: DocumentData):
+    """Display the structured data extracted from a document."""
+    col1, col2 = st.columns(2)
+    with col1:
+        st.metric("Document Type", doc_data.document_type or "Not extracted")
+        st.metric("Document Date", doc_data.document_date or "Not extracted")
+        st.metric("Main Reference", doc_data.document_mainreference or "Not extracted")
 
-        except (ValueError, TypeError, AttributeError, KeyError) as e:
-            # Update current step as error
-            for step_key, _, _ in steps:
-                if st.session_state.workflow_status.get(step_key, {}).get('status') == 'running':
-                    update_status(step_key, "error", f"Error: {str(e)}")
-                    break
+    with col2:
+        total_parties = len(doc_data.document_senderparty) + len(doc_data.document_recipientparty)
+        st.metric("Number of Parties", total_parties)
+
+    # Display sender parties
+    if doc_data.document_senderparty:
+        st.subheader("📤 Sender Parties")
+        for i, party in enumerate(doc_data.document_senderparty, 1):
+            st.write(f"{i}. **{party.name}** - {party.role}")
+
+    # Display recipient parties
+    if doc_data.document_recipientparty:
+        st.subheader("� Recipient Parties")
+        for i, party in enumerate(doc_data.document_recipientparty, 1):
+            st.write(f"{i}. **{party.name}** - {party.role}")
+
+    # Display other references if available
+    if doc_data.document_otherreferences:
+        st.subheader("🔗 Other References")
+        for i, ref in enumerate(doc_data.document_otherreferences, 1):
+            st.write(f"{i}. {ref}")
+
+    if doc_data.document_description:
+        st.subheader("📝 Description")
+        st.write(doc_data.document_description)
+
+
+def display_document_search():
+    """Search processed documents in the embedding index."""
+    index = get_index()
+    if not len(index):
+        return
 
-            with status_placeholder.container():
-                for step_key, step_name, description in steps:
-                    display_status_card(step_name, step_key, description)
+    st.divider()
+    st.subheader("🔎 Search Documents")
+    col1, col2, col3 = st.columns([4, 1, 1])
+    query = col1.text_input("Search processed documents", placeholder="e.g. variation order 25 chilled water")
+    top_k = col2.number_input("Results", min_value=1, max_value=50, value=5)
+    descriptions_only = col3.checkbox("Descriptions only", value=True,
+                                      help="Search the extracted descriptions instead of the full text")
+    if not query:
+        return
+
+    start = time.perf_counter()
+    try:
+        results = index.search(query, int(top_k), kinds=(DESCRIPTION,) if descriptions_only else None)
+    except ValueError as e:
+        st.error(f"❌ {e}")
+        return
+    st.caption(f"{len(results)} result(s) from {len(index):,} chunks in {(time.perf_counter() - start) * 1000:.1f} ms")
+
+    for result in results:
+        title = (f"{result['score']:.2f} · {result['document']} · {result['document_type']} "
+                 f"{result['document_mainreference']} {result['document_date']}")
+        with st.expander(title):
+            st.write(chunk_text(result))
 
-            st.error(f"Workflow failed: {str(e)}")
-            return None
 
+def format_job_label(job: dict) -> str:
+    """Format a job for the job selector."""
+    icons = {QUEUED: "⏳", RUNNING: "🔄", COMPLETED: "✅", FAILED: "❌"}
+    created = time.strftime("%Y-%m-%d %H:%M", time.localtime(job['created_at']))
+    return f"{icons.get(job['status'], '❓')} {job['file_name']} ({created})"
 
 
 def main():
@@ -319,6 +314,19 @@ def main():
     )
 
     init_session_state()
+    get_job_workers()
+
+    with st.sidebar:
+        st.subheader("🔬 Diagnostics")
+        profile_runs = st.checkbox(
+            "Profile runs",
+            value=is_profiling_enabled(),
+            help="Write CPU and memory profiles of each workflow stage to .chronology_profiles/ "
+                 "for offline analysis."
+        )
+        # Profiles a single render on request, since the view reruns every 2 s while jobs are active
+        profile_render = st.button("Profile progress view", help="Write a CPU profile of the next render of "
+                                   "the progress view to .chronology_profiles/ui-<session>/")
 
     # Header
     st.title("📄 Chronology Agent")
@@ -381,6 +389,12 @@ def main():
             st.info(f"🤖 **Local Ollama**: Using model {selected_model}")
             st.caption(f"Server: {base_url}")
 
+            # Load the model in the background so the first document doesn't wait for it
+            warm_up_key = (base_url, selected_model)
+            if warm_up_key not in st.session_state.warmed_up_models:
+                start_ollama_warm_up(selected_model, base_url)
+                st.session_state.warmed_up_models.add(warm_up_key)
+
             # Test connection button for Ollama
             if st.button("🔌 Test Ollama Connection"):
                 with st.spinner("Testing Ollama connection..."):
@@ -390,40 +404,106 @@ def main():
                         st.error(f"❌ Cannot connect to Ollama server at {base_url}")
                         st.error("Make sure Ollama is running locally: `ollama serve`")
 
-        uploaded_file = st.file_uploader(
-            "Choose a PDF file",
-            type="pdf",
-            help="Upload a PDF document to process"
+        # Pipeline options
+        st.subheader("⚙️ Pipeline Options")
+        speculative = st.checkbox(
+            "⚡ Speculative formatting",
+            value=True,
+            help="Format the chronology while the reflection review runs. "
+                 "Saves one LLM round-trip when the review passes; the result is discarded otherwise."
         )
 
-        if uploaded_file is not None:
-            st.success(f"✅ File uploaded: {uploaded_file.name}")
-            st.info(f"📊 File size: {uploaded_file.size:,} bytes")
+        routing = st.checkbox(
+            "🧭 Adaptive model routing",
+            value=False,
+            help="Use a small, fast model for formatting and short or simple documents, and escalate "
+                 "to the selected model for long documents or when the review rejects an extraction."
+        )
 
-            # Process button
-            if st.button("🚀 Process Document", type="primary", disabled=st.session_state.processing):
-                st.session_state.processing = True
-                st.session_state.workflow_status = {}
-                st.session_state.result = None
+        split_documents = st.checkbox(
+            "✂️ Split bundled PDFs",
+            value=True,
+            help="Detect email threads and letters bundled in one PDF and create a "
+                 "chronology entry for each document, processed in parallel."
+        )
 
-                # Save uploaded file temporarily
-                with tempfile.NamedTemporaryFile(delete=False, suffix=".pdf") as tmp_file:
-                    tmp_file.write(uploaded_file.getvalue())
-                    temp_file_path = tmp_file.name
+        related_events = st.checkbox(
+            "🧭 Related events context",
+            value=False,
+            help="Give the formatter the most similar previously processed documents, "
+                 "so the entry can refer to the events it responds to."
+        )
 
-                try:
-                    # Create progress container
-                    progress_container = st.empty()
+        # Usage budgets, shared by all documents processed together
+        st.subheader("💰 Usage Budget")
+        max_tokens = st.number_input(
+            "Batch token budget",
+            min_value=0,
+            value=0,
+            step=10000,
+            help="0 for no limit. Near the limit, documents skip review and use template formatting."
+        )
+        max_cost = st.number_input(
+            "Batch cost budget (USD)",
+            min_value=0.0,
+            value=0.0,
+            step=0.10,
+            format="%.2f",
+            help="0 for no limit. Local Ollama models cost nothing."
+        )
 
-                    # Run workflow
-                    result = run_chronology_workflow(temp_file_path, progress_container, llm_provider, selected_model)
-                    st.session_state.result = result
+        uploaded_files = st.file_uploader(
+            "Choose PDF files",
+            type="pdf",
+            accept_multiple_files=True,
+            help="Upload one or more PDF documents to process as a batch"
+        )
 
-                finally:
-                    # Clean up temporary file
-                    if os.path.exists(temp_file_path):
-                        os.unlink(temp_file_path)
-                    st.session_state.processing = False
+        if uploaded_files:
+            st.success(f"✅ {len(uploaded_files)} file(s) uploaded")
+            st.info(f"📊 Total size: {sum(uploaded_file.size for uploaded_file in uploaded_files):,} bytes")
+
+            # Projected usage before anything is sent to a model
+            content_lengths = [
+                estimate_content_length(uploaded_file.file_id, uploaded_file.getbuffer())
+                for uploaded_file in uploaded_files
+            ]
+            display_usage_projection(project_batch_usage(content_lengths, selected_model, speculative),
+                                     max_tokens, max_cost)
+            if routing:
+                st.caption("With routing, stages on the small model cost less than projected.")
+
+            # Process button - each upload is enqueued once per session
+            new_files = [
+                uploaded_file for uploaded_file in uploaded_files
+                if uploaded_file.file_id not in st.session_state.enqueued_files
+            ]
+            if st.button("🚀 Process Documents", type="primary", disabled=not new_files):
+                options = {
+                    "speculative": speculative,
+                    "routing": routing,
+                    "split_documents": split_documents,
+                    "related_events": related_events,
+                    "profile": profile_runs
+                }
+                if max_tokens or max_cost:
+                    options["budget"] = {"max_tokens": int(max_tokens), "max_cost": float(max_cost)}
+
+                batch_id = uuid.uuid4().hex
+                for uploaded_file in new_files:
+                    # getbuffer() exposes the upload without the copy getvalue() makes
+                    job_id = enqueue_job(
+                        uploaded_file.name,
+                        uploaded_file.getbuffer(),
+                        llm_provider,
+                        selected_model,
+                        options=options,
+                        batch_id=batch_id,
+                        owner=st.session_state.session_id
+                    )
+                    st.session_state.enqueued_files[uploaded_file.file_id] = job_id
+                    st.session_state.selected_job_id = job_id
+                st.success(f"📥 {len(new_files)} document(s) queued for processing")
 
     with col2:
         st.subheader("ℹ️ How it works")
@@ -464,15 +544,46 @@ def main():
         - Or deploy local Ollama and set `OLLAMA_BASE_URL`
         """)
 
+    # Jobs section - read from the job database so it survives page reloads
+    jobs = list_jobs(owner=st.session_state.session_id)
+    selected_job = None
+    if jobs:
+        st.divider()
+        st.subheader("🗂️ Jobs")
+
+        job_ids = [job['id'] for job in jobs]
+        jobs_by_id = {job['id']: job for job in jobs}
+        if st.session_state.selected_job_id not in jobs_by_id:
+            st.session_state.selected_job_id = job_ids[0]
+
+        selected_job_id = st.selectbox(
+            "Select a job",
+            options=job_ids,
+            index=job_ids.index(st.session_state.selected_job_id),
+            format_func=lambda job_id: format_job_label(jobs_by_id[job_id])
+        )
+        st.session_state.selected_job_id = selected_job_id
+        selected_job = jobs_by_id[selected_job_id]
+
+        if profile_render:
+            # tracemalloc would slow every session of the shared server, so only CPU is profiled
+            if 'ui_profiler' not in st.session_state:
+                st.session_state.ui_profiler = RunProfiler(f"ui-{st.session_state.session_id}")
+            ui_profiler = st.session_state.ui_profiler
+            with ui_profiler.profile(ui_profiler.next_name("job_progress"), memory=False):
+                display_job_progress(selected_job)
+        else:
+            display_job_progress(selected_job)
+
     # Results section
-    if st.session_state.result:
+    if selected_job and selected_job['status'] == COMPLETED and selected_job['result']:
         st.divider()
         st.subheader("📋 Results")
 
-        result = st.session_state.result
+        result = deserialize_state(selected_job['result'])
 
         # Tabs for different views
-        tab1, tab2, tab3 = st.tabs(["📄 Final Output", "📊 Extracted Data", "🔍 Review Feedback"])
+        tab1, tab2, tab3, tab4 = st.tabs(["📄 Final Output", "📊 Extracted Data", "🔍 Review Feedback", "💰 Usage"])
 
         with tab1:
             st.subheader("🎯 Chronology Entry")
@@ -492,51 +603,48 @@ def main():
             else:
                 st.error("❌ No output was generated")
 
+        sub_documents = result.get("sub_documents") or []
+
         with tab2:
             st.subheader("📊 Extracted Information")
-            doc_data = result.get("document_data", DocumentData())
-
-            col1, col2 = st.columns(2)
-            with col1:
-                st.metric("Document Type", doc_data.document_type or "Not extracted")
-                st.metric("Document Date", doc_data.document_date or "Not extracted")
-                st.metric("Main Reference", doc_data.document_mainreference or "Not extracted")
-
-            with col2:
-                total_parties = len(doc_data.document_senderparty) + len(doc_data.document_recipientparty)
-                st.metric("Number of Parties", total_parties)
-
-            # Display sender parties
-            if doc_data.document_senderparty:
-                st.subheader("📤 Sender Parties")
-                for i, party in enumerate(doc_data.document_senderparty, 1):
-                    st.write(f"{i}. **{party.name}** - {party.role}")
-
-            # Display recipient parties
-            if doc_data.document_recipientparty:
-                st.subheader("� Recipient Parties")
-                for i, party in enumerate(doc_data.document_recipientparty, 1):
-                    st.write(f"{i}. **{party.name}** - {party.role}")
-
-            # Display other references if available
-            if doc_data.document_otherreferences:
-                st.subheader("🔗 Other References")
-                for i, ref in enumerate(doc_data.document_otherreferences, 1):
-                    st.write(f"{i}. {ref}")
-
-            if doc_data.document_description:
-                st.subheader("📝 Description")
-                st.write(doc_data.document_description)
+            if sub_documents:
+                st.info(f"✂️ This PDF was split into {len(sub_documents)} documents")
+                for i, sub_document in enumerate(sub_documents, 1):
+                    sub_data = sub_document.get("document_data", DocumentData())
+                    with st.expander(f"Part {i}: {sub_data.document_type or 'Document'} "
+                                     f"{sub_data.document_date or ''}"):
+                        display_document_data(sub_data)
+            else:
+                display_document_data(result.get("document_data", DocumentData()))
 
         with tab3:
             st.subheader("🔍 Quality Review")
-            review_feedback = result.get("review_feedback", "No feedback available")
-            st.markdown(review_feedback)
+            if sub_documents:
+                for i, sub_document in enumerate(sub_documents, 1):
+                    with st.expander(f"Part {i}"):
+                        st.markdown(sub_document.get("review_feedback") or "No feedback available")
+            else:
+                review_feedback = result.get("review_feedback", "No feedback available")
+                st.markdown(review_feedback)
+
+        with tab4:
+            st.subheader("💰 Token Usage and Cost")
+            if selected_job['usage']:
+                display_usage(selected_job['usage'])
+            else:
+                st.info("No LLM usage was recorded for this job")
+
+    display_document_search()
 
     # Footer
     st.divider()
     st.caption("Powered by ChatGroq & LangGraph • Built with Streamlit")
 
+    # Poll job status while any of this session's jobs is still in progress
+    if any(job['status'] in (QUEUED, RUNNING) for job in jobs):
+        time.sleep(2)
+        st.rerun()
+
 
 if __name__ == "__main__":
     main()
@@ -0,0 +1,27 @@
+"""Shared fixtures: the root modules are importable and state directories are temporary."""
+import os
+import sys
+
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+
+@pytest.fixture(autouse=True)
+def isolated_store(tmp_path, monkeypatch):
+    """Point the text store, checkpoints and the embedding index at a temporary directory."""
+    import checkpoints
+    import embedding_index
+    import text_store
+
+    monkeypatch.setattr(text_store, "_default_store", text_store.TextStore(str(tmp_path / "texts")))
+    monkeypatch.setattr(checkpoints, "CHECKPOINTS_DIR", str(tmp_path / "runs"))
+    monkeypatch.setattr(embedding_index, "INDEX_DIR", str(tmp_path / "index"))
+    monkeypatch.setattr(embedding_index, "_default_index", None)
+    return tmp_path
+
+
+@pytest.fixture
+def db_path(tmp_path):
+    """A job database in a temporary directory."""
+    return str(tmp_path / "jobs" / "jobs.sqlite3")
@@ -0,0 +1,49 @@
+import json
+import threading
+from http.client import HTTPConnection
+from http.server import ThreadingHTTPServer
+
+import pytest
+
+from api_server import ChronologyRequestHandler
+
+PDF = b"%PDF-1.4 site report"
+
+
+@pytest.fixture
+def server(db_path):
+    server = ThreadingHTTPServer(("127.0.0.1", 0), ChronologyRequestHandler)
+    server.db_path = db_path
+    server.default_provider = "groq"
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    yield server
+    server.shutdown()
+    server.server_close()
+
+
+def request(server, method, path, client_token=None, body=None):
+    conn = HTTPConnection(*server.server_address)
+    headers = {"X-Client-Token": client_token} if client_token else {}
+    conn.request(method, path, body=body, headers=headers)
+    response = conn.getresponse()
+    payload = json.loads(response.read())
+    conn.close()
+    return response.status, payload
+
+
+def test_clients_only_see_their_own_jobs(server):
+    status, job = request(server, "POST", "/jobs?file_name=a.pdf", "client-a", PDF)
+    assert status == 202
+    job_id = job["job_id"]
+
+    assert [job["job_id"] for job in request(server, "GET", "/jobs", "client-a")[1]["jobs"]] == [job_id]
+    assert request(server, "GET", "/jobs", "client-b")[1]["jobs"] == []
+    assert request(server, "GET", f"/jobs/{job_id}", "client-a")[0] == 200
+    for path in (f"/jobs/{job_id}", f"/jobs/{job_id}/result", f"/jobs/{job_id}/events"):
+        assert request(server, "GET", path, "client-b")[0] == 404
+
+
+def test_requests_need_a_client_token(server):
+    assert request(server, "GET", "/jobs")[0] == 401
+    assert request(server, "POST", "/jobs", body=PDF)[0] == 401
+    assert request(server, "GET", "/health")[0] == 200
@@ -0,0 +1,37 @@
+from job_queue import (COMPLETED, RUNNING, claim_next_job, discard_job_texts, enqueue_job, finish_job,
+                       get_job)
+from text_store import get_text_store
+
+PDF = b"%PDF-1.4 identical content"
+
+
+def completed_job(db_path, text_ref):
+    job = claim_next_job("worker", db_path)
+    finish_job(job["id"], COMPLETED, result=None, db_path=db_path)
+    return job, {"content_ref": text_ref}
+
+
+def test_texts_stay_while_a_job_for_the_same_pdf_is_active(db_path):
+    text_ref = get_text_store().put("Letter text")
+    enqueue_job("a.pdf", PDF, "groq", "model", db_path=db_path)
+    other_id = enqueue_job("b.pdf", PDF, "groq", "model", db_path=db_path)
+
+    job, state = completed_job(db_path, text_ref)
+    assert discard_job_texts(job, state, db_path) == 0
+    assert get_text_store().exists(text_ref)
+
+    # Once the other job is done with it, the text goes
+    assert claim_next_job("worker", db_path)["id"] == other_id
+    assert get_job(other_id, db_path)["status"] == RUNNING
+    finish_job(other_id, COMPLETED, result=None, db_path=db_path)
+    assert discard_job_texts(job, state, db_path) == 1
+    assert not get_text_store().exists(text_ref)
+
+
+def test_texts_of_other_pdfs_dont_block_deletion(db_path):
+    text_ref = get_text_store().put("Letter text")
+    enqueue_job("a.pdf", PDF, "groq", "model", db_path=db_path)
+    enqueue_job("c.pdf", b"%PDF-1.4 other content", "groq", "model", db_path=db_path)
+
+    job, state = completed_job(db_path, text_ref)
+    assert discard_job_texts(job, state, db_path) == 1
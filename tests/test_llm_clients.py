@@ -0,0 +1,56 @@
+import threading
+
+from langchain_core.messages import AIMessage, AIMessageChunk, HumanMessage
+
+from api_server import SharedModel
+from llm_governor import GovernedLLM, ProviderGate
+from usage_ledger import MeteredLLM, UsageLedger
+
+
+class EchoLLM:
+    model_name = "echo-model"
+
+    def invoke(self, messages, *args, **kwargs):
+        return AIMessage(content="reply", usage_metadata={"input_tokens": 10, "output_tokens": 2,
+                                                          "total_tokens": 12})
+
+    def stream(self, messages, *args, **kwargs):
+        for word in ("one ", "two ", "three"):
+            yield AIMessageChunk(content=word)
+
+    def batch(self, inputs, *args, **kwargs):
+        return [self.invoke(messages) for messages in inputs]
+
+
+PROMPT = [HumanMessage(content="Summarize the letter")]
+
+
+def stacked_proxies(ledger):
+    gate = ProviderGate("echo", limit=1)
+    return MeteredLLM(GovernedLLM(SharedModel(EchoLLM(), max_concurrent_calls=1), gate, "owner"),
+                      ledger, "letter.pdf", "analyzer"), gate
+
+
+def test_proxies_forward_attributes_and_calls():
+    ledger = UsageLedger()
+    llm, _ = stacked_proxies(ledger)
+    assert llm.model_name == "echo-model"
+    assert llm.invoke(PROMPT).content == "reply"
+    assert [response.content for response in llm.batch([PROMPT, PROMPT])] == ["reply", "reply"]
+    assert ledger.totals()["calls"] == 3
+
+
+def test_closed_stream_records_usage_and_releases_slots():
+    ledger = UsageLedger()
+    llm, gate = stacked_proxies(ledger)
+    stream = llm.stream(PROMPT)
+    assert next(stream).content == "one "
+    stream.close()
+
+    [record] = ledger.records
+    assert record.estimated and record.output_tokens > 0
+    # Both the gate and the shared model's semaphore are free again
+    done = threading.Event()
+    threading.Thread(target=lambda: (llm.invoke(PROMPT), done.set()), daemon=True).start()
+    assert done.wait(2)
+    assert gate._active == 0
@@ -0,0 +1,29 @@
+from chronology_pipeline import create_initial_state, run_stages
+from reflection_agent import reflection_node
+
+
+class UnusedLLM:
+    model_name = "unused"
+
+    def invoke(self, messages, *args, **kwargs):
+        raise AssertionError("No LLM call is expected without document text")
+
+
+def test_missing_text_fails_the_run_instead_of_looping():
+    reports = []
+    state = {**create_initial_state("missing.pdf"), "content_ref": "0" * 64}
+
+    result = run_stages(state, "analyzer", UnusedLLM(), lambda *args: reports.append(args), run_id="missing")
+
+    assert result is None
+    assert reports[-1] == ("analyzer", "error", "Document text is missing")
+    assert len(reports) < 5
+
+
+def test_review_without_text_counts_as_a_review():
+    state = create_initial_state("missing.pdf")
+
+    reviewed = reflection_node(state, UnusedLLM())
+
+    assert reviewed["is_complete"] is False
+    assert reviewed["retry_count"] == 1
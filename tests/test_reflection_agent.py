@@ -0,0 +1,34 @@
+import pytest
+
+from reflection_agent import parse_free_text_verdict, parse_review_verdict
+
+
+@pytest.mark.parametrize("reply", [
+    "COMPLETE",
+    "complete",
+    "**COMPLETE**",
+    "COMPLETE - all fields are filled in.",
+])
+def test_free_text_complete(reply):
+    assert parse_free_text_verdict(reply).status == "COMPLETE"
+
+
+@pytest.mark.parametrize("reply", [
+    "Not complete: the date is missing",
+    "The data is complete except for the recipient.",
+    "COMPLETE, but the main reference is missing",
+    "COMPLETE? No, the sender isn't named.",
+    "INCOMPLETE",
+    "The review found problems.",
+    "",
+])
+def test_free_text_defaults_to_incomplete(reply):
+    verdict = parse_free_text_verdict(reply)
+    assert verdict.status == "INCOMPLETE"
+    assert verdict.missing_fields == ([reply] if reply else [])
+
+
+def test_json_verdict():
+    verdict = parse_review_verdict('Verdict: {"status": "incomplete", "missing_fields": "document_date"}')
+    assert verdict.status == "INCOMPLETE"
+    assert verdict.missing_fields == ["document_date"]
@@ -0,0 +1,23 @@
+import threading
+import time
+
+from usage_ledger import UsageLedger
+
+
+def test_usage_writes_land_in_order():
+    written = []
+
+    def persist(ledger):
+        snapshot = ledger.to_list()
+        if len(snapshot) == 1:
+            # A slow first write must not overwrite the later one
+            time.sleep(0.2)
+        written.append(len(snapshot))
+
+    ledger = UsageLedger(on_record=persist)
+    first = threading.Thread(target=ledger.record, args=("a.pdf", "analyzer", "model", 10, 2))
+    first.start()
+    time.sleep(0.05)
+    ledger.record("a.pdf", "reviewer", "model", 10, 2)
+    first.join()
+    assert written == [1, 2]
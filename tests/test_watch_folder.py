@@ -0,0 +1,55 @@
+import os
+
+from job_queue import COMPLETED, FAILED, QUEUED, claim_next_job, enqueue_job, finish_job, get_job
+from watch_folder import FolderWatcher
+
+
+def drop_pdf(directory, name, data=b"%PDF-1.4 site report"):
+    path = os.path.join(directory, name)
+    with open(path, "wb") as pdf_file:
+        pdf_file.write(data)
+    return path
+
+
+def make_watcher(tmp_path, db_path):
+    inbox = tmp_path / "inbox"
+    inbox.mkdir()
+    return FolderWatcher([str(inbox)], "groq", "model", db_path=db_path, settle_seconds=0), str(inbox)
+
+
+def test_redropping_a_file_whose_job_failed_retries_it(tmp_path, db_path):
+    watcher, inbox = make_watcher(tmp_path, db_path)
+    path = drop_pdf(inbox, "report.pdf")
+    [job_id] = watcher.scan()
+    claim_next_job("worker", db_path)
+    finish_job(job_id, FAILED, error="LLM unavailable", db_path=db_path)
+
+    os.remove(path)
+    drop_pdf(inbox, "report.pdf")
+    assert watcher.scan() == [job_id]
+    assert get_job(job_id, db_path)["status"] == QUEUED
+
+
+def test_file_whose_job_failed_elsewhere_gets_a_new_job(tmp_path, db_path):
+    watcher, inbox = make_watcher(tmp_path, db_path)
+    session_job_id = enqueue_job("upload.pdf", b"%PDF-1.4 site report", "groq", "model",
+                                 owner="session", db_path=db_path)
+    claim_next_job("worker", db_path)
+    finish_job(session_job_id, FAILED, error="LLM unavailable", db_path=db_path)
+
+    drop_pdf(inbox, "report.pdf")
+    [job_id] = watcher.scan()
+    assert job_id != session_job_id
+    assert get_job(job_id, db_path)["owner"] == watcher.owner
+
+
+def test_file_whose_job_completed_is_skipped(tmp_path, db_path):
+    watcher, inbox = make_watcher(tmp_path, db_path)
+    path = drop_pdf(inbox, "report.pdf")
+    [job_id] = watcher.scan()
+    claim_next_job("worker", db_path)
+    finish_job(job_id, COMPLETED, result=None, db_path=db_path)
+
+    os.remove(path)
+    drop_pdf(inbox, "copy.pdf")
+    assert watcher.scan() == []
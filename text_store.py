@@ -0,0 +1,108 @@
+"""
+Content-addressed store for extracted document text.
+The agent state only carries a short reference to the text, which is kept on
+disk and read back through memory maps when a node needs it. This keeps the
+state small while it is copied between nodes, checkpointed and queued.
+Texts of a finished run are discarded unless something else, such as the
+embedding index, still needs them (see discard_texts).
+"""
+import hashlib
+import mmap
+import os
+import tempfile
+from typing import Callable, Optional, Set
+
+TEXT_STORE_DIR = os.getenv("CHRONOLOGY_TEXT_STORE_DIR", ".chronology_texts")
+
+
+class TextStore:
+    """Stores document text by SHA-256 reference."""
+
+    __slots__ = ("store_dir",)
+
+    def __init__(self, store_dir: str = None):
+        self.store_dir = store_dir or TEXT_STORE_DIR
+
+    def _path(self, ref: str) -> str:
+        # Two-level fan-out keeps directories small for large batches
+        return os.path.join(self.store_dir, ref[:2], f"{ref}.txt")
+
+    def put(self, text: str) -> str:
+        """Store text and return its reference. Identical texts are stored once."""
+        data = text.encode("utf-8")
+        ref = hashlib.sha256(data).hexdigest()
+        path = self._path(ref)
+
+        if not os.path.exists(path):
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+            # A unique temporary file per call, since threads may store the same text at once
+            temp_fd, temp_path = tempfile.mkstemp(dir=os.path.dirname(path), suffix=".tmp")
+            with os.fdopen(temp_fd, "wb") as text_file:
+                text_file.write(data)
+            os.replace(temp_path, path)
+        return ref
+
+    def get(self, ref: str, limit: int = None) -> str:
+        """Load the text for a reference. Returns an empty string for unknown references.
+
+        With limit, only roughly the first limit bytes are decoded.
+        """
+        if not ref:
+            return ""
+
+        path = self._path(ref)
+        if not os.path.exists(path) or os.path.getsize(path) == 0:
+            return ""
+
+        with open(path, "rb") as text_file:
+            with mmap.mmap(text_file.fileno(), 0, access=mmap.ACCESS_READ) as mapped:
+                if limit is not None:
+                    # A multi-byte character may be cut at the limit
+                    return str(mapped[:limit], "utf-8", errors="ignore")
+                return str(mapped, "utf-8")
+
+    def exists(self, ref: str) -> bool:
+        """Check whether a reference is stored."""
+        return bool(ref) and os.path.exists(self._path(ref))
+
+    def delete(self, ref: str) -> bool:
+        """Delete the text of a reference. Returns whether it was stored."""
+        try:
+            os.unlink(self._path(ref))
+            return True
+        except FileNotFoundError:
+            return False
+
+
+_default_store: Optional[TextStore] = None
+
+
+def get_text_store() -> TextStore:
+    """Get the process-wide text store."""
+    global _default_store
+    if _default_store is None:
+        _default_store = TextStore()
+    return _default_store
+
+
+def load_pdf_content(state, limit: int = None) -> str:
+    """Load the document text referenced by an agent state."""
+    return get_text_store().get(state.get("content_ref", ""), limit)
+
+
+def state_text_refs(state) -> Set[str]:
+    """The text references of an agent state and its sub-documents."""
+    refs = {state["content_ref"]} if state.get("content_ref") else set()
+    for sub_state in state.get("sub_documents") or []:
+        refs |= state_text_refs(sub_state)
+    return refs
+
+
+def discard_texts(state, keep: Callable[[str], bool] = None) -> int:
+    """Delete the texts of a finished run, except references keep(ref) accepts. Returns the texts deleted.
+
+    Identical texts share a reference, so callers must make sure no other run of
+    the same document is in progress (see job_queue.discard_job_texts).
+    """
+    text_store = get_text_store()
+    return sum(text_store.delete(ref) for ref in state_text_refs(state) if not (keep and keep(ref)))
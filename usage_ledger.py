@@ -0,0 +1,268 @@
+"""
+Token and cost accounting for the Chronology Agent workflow.
+Every LLM call is recorded per document, stage and model from the provider's
+usage metadata, or estimated locally when the provider reports none (e.g. some
+Ollama responses). Batches can be given token and cost budgets; when a budget is
+nearly used up the workflow degrades to cheaper modes (no review, template
+formatting) instead of running over it.
+"""
+import math
+import threading
+from typing import Callable, Dict, Iterable, List, NamedTuple, Optional, Tuple
+
+from document_formatter import LEGAL_FORMAT_PROMPT
+from document_models import AgentState
+from document_prompts import ANALYZE_TASK, DOCUMENT_SYSTEM_PROMPT, REVIEW_TASK
+from llm_clients import CHARS_PER_TOKEN, ChatModelProxy, messages_text, estimate_tokens, get_model_name
+from model_router import resolve_llm
+from reflection_agent import MAX_REVIEW_CALLS
+
+# USD per million (input, output) tokens. Local Ollama models cost nothing.
+MODEL_PRICES = {
+    "meta-llama/llama-4-maverick-17b-128e-instruct": (0.20, 0.60),
+    "meta-llama/llama-4-scout-17b-16e-instruct": (0.11, 0.34),
+    "llama-3.3-70b-versatile": (0.59, 0.79),
+    "llama-3.1-70b-versatile": (0.59, 0.79),
+    "llama-3.1-8b-instant": (0.05, 0.08),
+    "mixtral-8x7b-32768": (0.24, 0.24),
+}
+
+# Typical completion length of each stage, used for projections
+EXPECTED_OUTPUT_TOKENS = {
+    "analyzer": 400,
+    "reviewer": 250,
+    "formatter": 150
+}
+
+# Extracted data summary added to the review and formatting prompts
+DATA_SUMMARY_TOKENS = 300
+
+# Fraction of a budget after which review is skipped and formatting uses the template
+BUDGET_DEGRADE_FRACTION = 0.8
+
+
+class BudgetExceededError(Exception):
+    """Raised when a batch budget is used up before a document could be analyzed."""
+
+
+class UsageRecord(NamedTuple):
+    """Token usage of a single LLM call."""
+    document: str
+    stage: str
+    model: str
+    input_tokens: int
+    output_tokens: int
+    cost: float
+    estimated: bool
+
+
+def calculate_cost(model_name: str, input_tokens: int, output_tokens: int) -> float:
+    """Calculate the cost of a call in USD. Unknown and local models cost nothing."""
+    input_price, output_price = MODEL_PRICES.get(model_name, (0.0, 0.0))
+    return (input_tokens * input_price + output_tokens * output_price) / 1_000_000
+
+
+def extract_usage(response) -> Optional[Tuple[int, int]]:
+    """Get (input_tokens, output_tokens) from a chat model response, or None if not reported."""
+    usage_metadata = getattr(response, "usage_metadata", None)
+    if usage_metadata:
+        return usage_metadata.get("input_tokens", 0), usage_metadata.get("output_tokens", 0)
+
+    response_metadata = getattr(response, "response_metadata", None) or {}
+    token_usage = response_metadata.get("token_usage")
+    if token_usage:
+        return token_usage.get("prompt_tokens", 0), token_usage.get("completion_tokens", 0)
+    if "prompt_eval_count" in response_metadata or "eval_count" in response_metadata:
+        # Raw Ollama counters
+        return response_metadata.get("prompt_eval_count", 0), response_metadata.get("eval_count", 0)
+    return None
+
+
+def _summarize_records(records: Iterable[UsageRecord]) -> dict:
+    summary = {"calls": 0, "input_tokens": 0, "output_tokens": 0, "total_tokens": 0, "cost": 0.0}
+    for record in records:
+        summary["calls"] += 1
+        summary["input_tokens"] += record.input_tokens
+        summary["output_tokens"] += record.output_tokens
+        summary["total_tokens"] += record.input_tokens + record.output_tokens
+        summary["cost"] += record.cost
+    return summary
+
+
+class UsageLedger:
+    """Thread-safe record of the LLM calls made for one job.
+
+    on_record is called with the ledger after every recorded call, e.g. to
+    persist the usage while the job is still running. Calls to it are
+    serialized, so each sees at least the records the previous one saw and the
+    last write holds every record.
+    """
+
+    def __init__(self, records: List[dict] = None, on_record: Callable[["UsageLedger"], None] = None):
+        self._records = [UsageRecord(**record) for record in records or []]
+        self._lock = threading.Lock()
+        # Held while persisting, apart from _lock so recording never waits for the database
+        self._write_lock = threading.Lock()
+        self.on_record = on_record
+
+    def record(self, document: str, stage: str, model: str,
+               input_tokens: int, output_tokens: int, estimated: bool = False) -> UsageRecord:
+        """Record one LLM call."""
+        usage_record = UsageRecord(document, stage, model, input_tokens, output_tokens,
+                                   calculate_cost(model, input_tokens, output_tokens), estimated)
+        with self._lock:
+            self._records.append(usage_record)
+        if self.on_record:
+            with self._write_lock:
+                self.on_record(self)
+        return usage_record
+
+    @property
+    def records(self) -> List[UsageRecord]:
+        with self._lock:
+            return list(self._records)
+
+    def totals(self) -> dict:
+        """Total calls, tokens and cost."""
+        return _summarize_records(self.records)
+
+    def summarize(self, field: str) -> Dict[str, dict]:
+        """Aggregate usage by 'document', 'stage' or 'model'."""
+        groups: Dict[str, List[UsageRecord]] = {}
+        for record in self.records:
+            groups.setdefault(getattr(record, field), []).append(record)
+        return {key: _summarize_records(group) for key, group in groups.items()}
+
+    def to_list(self) -> List[dict]:
+        """Records as JSON-serializable dictionaries."""
+        return [record._asdict() for record in self.records]
+
+
+class MeteredLLM(ChatModelProxy):
+    """Chat model proxy that records the usage of invoke, stream and batch calls."""
+
+    def __init__(self, llm, ledger: UsageLedger, document: str, stage: str):
+        super().__init__(llm)
+        self.ledger = ledger
+        self.document = document
+        self.stage = stage
+
+    def _record(self, messages, response_text: str, usage: Optional[Tuple[int, int]]):
+        estimated = usage is None
+        if estimated:
+            usage = estimate_tokens(messages_text(messages)), estimate_tokens(response_text)
+        self.ledger.record(self.document, self.stage, get_model_name(self.llm), usage[0], usage[1], estimated)
+
+    def on_response(self, messages, response):
+        self._record(messages, str(response.content), extract_usage(response))
+
+    def on_stream_end(self, messages, chunks: list):
+        usage = None
+        for chunk_usage in filter(None, map(extract_usage, chunks)):
+            # Providers report usage on the final chunk, so summing is safe
+            usage = (usage[0] + chunk_usage[0], usage[1] + chunk_usage[1]) if usage else chunk_usage
+        self._record(messages, "".join(str(chunk.content) for chunk in chunks), usage)
+
+
+class BatchBudget:
+    """Token and cost limits shared by the jobs of a batch.
+
+    get_spent returns the (tokens, cost) already used by the whole batch. Without
+    it, only the usage recorded in the job's own ledger counts.
+    """
+
+    def __init__(self, max_tokens: int = None, max_cost: float = None,
+                 get_spent: Callable[[], Tuple[int, float]] = None):
+        self.max_tokens = max_tokens or None
+        self.max_cost = max_cost or None
+        self.get_spent = get_spent
+
+    def fraction_used(self, ledger: UsageLedger) -> float:
+        """Largest fraction used of the token and cost budgets."""
+        if self.get_spent:
+            spent_tokens, spent_cost = self.get_spent()
+        else:
+            totals = ledger.totals()
+            spent_tokens, spent_cost = totals["total_tokens"], totals["cost"]
+
+        fractions = [0.0]
+        if self.max_tokens:
+            fractions.append(spent_tokens / self.max_tokens)
+        if self.max_cost:
+            fractions.append(spent_cost / self.max_cost)
+        return max(fractions)
+
+
+class UsageMeter:
+    """Wraps a chat model or ModelRouter so every stage's calls are metered.
+
+    Used in place of the model in run_chronology_workflow. With a budget, review
+    and LLM formatting are skipped once BUDGET_DEGRADE_FRACTION of it is used,
+    which the pipeline sees as a stage without a model, and analysis stops with
+    BudgetExceededError when the budget is used up.
+    """
+
+    def __init__(self, llm, ledger: UsageLedger, budget: BatchBudget = None):
+        self.llm = llm
+        self.ledger = ledger
+        self.budget = budget
+
+    def llm_for(self, stage: str, state: AgentState, pdf_content: str = ""):
+        """Get the metered chat model for a stage, or None when the stage should be skipped."""
+        if self.budget:
+            fraction_used = self.budget.fraction_used(self.ledger)
+            if fraction_used >= 1 and stage in ("analyzer", "reanalyzer"):
+                raise BudgetExceededError(f"Batch budget used up ({fraction_used:.0%})")
+            if fraction_used >= BUDGET_DEGRADE_FRACTION and stage in ("reviewer", "formatter"):
+                print(f"💸 Budget {fraction_used:.0%} used, skipping LLM {stage}")
+                return None
+
+        stage_llm = resolve_llm(self.llm, stage, state, pdf_content)
+        return MeteredLLM(stage_llm, self.ledger, state.get("file_path", ""), stage)
+
+
+def project_document_usage(content_length: int, model_name: str, speculative: bool = False) -> dict:
+    """Project the usage of one document with content_length characters of text.
+
+    'expected' assumes the review passes the first time. 'maximum' assumes every
+    LLM review rejects the data: each rejection adds an analysis, and with
+    speculative formatting each review stage also starts a formatting call,
+    discarded for all but the last.
+    """
+    # Analysis and review share the instructions and document prefix
+    prefix_tokens = estimate_tokens(DOCUMENT_SYSTEM_PROMPT) + math.ceil(content_length / CHARS_PER_TOKEN)
+    analyzer = (prefix_tokens + estimate_tokens(ANALYZE_TASK), EXPECTED_OUTPUT_TOKENS["analyzer"])
+    reviewer = (prefix_tokens + estimate_tokens(REVIEW_TASK) + DATA_SUMMARY_TOKENS,
+                EXPECTED_OUTPUT_TOKENS["reviewer"])
+    formatter = (estimate_tokens(LEGAL_FORMAT_PROMPT) + DATA_SUMMARY_TOKENS, EXPECTED_OUTPUT_TOKENS["formatter"])
+
+    def summarize(calls: List[Tuple[int, int]]) -> dict:
+        input_tokens = sum(call[0] for call in calls)
+        output_tokens = sum(call[1] for call in calls)
+        return {
+            "input_tokens": input_tokens,
+            "output_tokens": output_tokens,
+            "total_tokens": input_tokens + output_tokens,
+            "cost": calculate_cost(model_name, input_tokens, output_tokens)
+        }
+
+    # After MAX_REVIEW_CALLS rejections, the last analysis is accepted without an LLM review
+    analyses = MAX_REVIEW_CALLS + 1
+    formatting_calls = analyses if speculative else 1
+    return {
+        "expected": summarize([analyzer, reviewer, formatter]),
+        "maximum": summarize([analyzer] * analyses + [reviewer] * MAX_REVIEW_CALLS + [formatter] * formatting_calls)
+    }
+
+
+def project_batch_usage(content_lengths: Iterable[int], model_name: str, speculative: bool = False) -> dict:
+    """Project the usage of a batch of documents, as in project_document_usage."""
+    projection = {
+        estimate: {"input_tokens": 0, "output_tokens": 0, "total_tokens": 0, "cost": 0.0}
+        for estimate in ("expected", "maximum")
+    }
+    for content_length in content_lengths:
+        for estimate, usage in project_document_usage(content_length, model_name, speculative).items():
+            for key, value in usage.items():
+                projection[estimate][key] += value
+    return projection
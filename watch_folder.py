@@ -0,0 +1,231 @@
+#!/usr/bin/env python3
+"""
+Watch-folder ingestion for the Chronology Agent workflow.
+Project folders are scanned periodically. New or changed PDFs are fingerprinted
+by SHA-256 and only files whose content was never submitted, or whose job
+failed, are enqueued in the job queue (see job_queue.py), so restarts and
+touched or copied files never reprocess a document. Documents are processed
+by a bounded number of workers.
+
+Run with:
+    python watch_folder.py sample_documents/ /mnt/projects/site-a --workers 2
+"""
+import argparse
+import hashlib
+import mmap
+import os
+import time
+import uuid
+from typing import Iterator, List, Optional
+
+from job_queue import (FAILED, connect, count_active_jobs, enqueue_job, find_job_by_content_hash, get_db_path,
+                       retry_job, start_workers)
+from llm_clients import DEFAULT_GROQ_MODEL, DEFAULT_OLLAMA_MODEL
+
+# Files modified more recently than this are assumed to still be copying
+SETTLE_SECONDS = 5.0
+
+# Queued and running jobs above which new files wait for the next scan
+MAX_PENDING_JOBS = 20
+
+WATCHED_FILES_SCHEMA = """
+CREATE TABLE IF NOT EXISTS watched_files (
+    path TEXT PRIMARY KEY,
+    size INTEGER NOT NULL,
+    mtime_ns INTEGER NOT NULL,
+    content_hash TEXT NOT NULL,
+    job_id TEXT,
+    seen_at REAL NOT NULL
+)
+"""
+
+
+def iter_pdf_files(directory: str, recursive: bool = True) -> Iterator[str]:
+    """Yield the paths of the PDFs in a directory, in sorted order."""
+    for root, dir_names, file_names in os.walk(directory):
+        dir_names[:] = sorted(name for name in dir_names if not name.startswith(".")) if recursive else []
+        for file_name in sorted(file_names):
+            if file_name.lower().endswith(".pdf") and not file_name.startswith("."):
+                yield os.path.join(root, file_name)
+
+
+class FolderWatcher:
+    """Enqueues new PDFs from watched directories, each distinct content once.
+
+    File sizes and modification times are remembered in the job database, so
+    unchanged files are not even rehashed between scans or after a restart.
+    """
+
+    def __init__(self, directories: List[str], llm_provider: str, model_name: str, options: dict = None,
+                 db_path: str = None, recursive: bool = True, settle_seconds: float = SETTLE_SECONDS,
+                 max_pending: int = MAX_PENDING_JOBS):
+        self.directories = [os.path.abspath(directory) for directory in directories]
+        self.llm_provider = llm_provider
+        self.model_name = model_name
+        self.options = options or {}
+        self.db_path = db_path or get_db_path()
+        self.recursive = recursive
+        self.settle_seconds = settle_seconds
+        self.max_pending = max_pending
+        # All scans of this watcher take turns with other users as one owner
+        self.owner = "watch:" + ",".join(self.directories)
+
+        conn = connect(self.db_path)
+        try:
+            conn.execute(WATCHED_FILES_SCHEMA)
+        finally:
+            conn.close()
+
+    def _known_files(self) -> dict:
+        conn = connect(self.db_path)
+        try:
+            return {row["path"]: dict(row) for row in conn.execute("SELECT * FROM watched_files")}
+        finally:
+            conn.close()
+
+    def _remember(self, path: str, stat: os.stat_result, content_hash: str, job_id: Optional[str]):
+        conn = connect(self.db_path)
+        try:
+            conn.execute(
+                "INSERT OR REPLACE INTO watched_files (path, size, mtime_ns, content_hash, job_id, seen_at) "
+                "VALUES (?, ?, ?, ?, ?, ?)",
+                (path, stat.st_size, stat.st_mtime_ns, content_hash, job_id, time.time())
+            )
+        finally:
+            conn.close()
+
+    def _submit(self, path: str, file_name: str, batch_id: str) -> Optional[tuple]:
+        """Hash a PDF and enqueue it unless its content was submitted before and didn't fail.
+
+        A failed job of this watcher is retried; content whose job failed
+        elsewhere, e.g. in a Streamlit session, is enqueued as a new job.
+        Returns (stat, content_hash, job_id), with job_id None for known content,
+        or None if the file vanished or is empty.
+        """
+        try:
+            with open(path, "rb") as pdf_file:
+                stat = os.fstat(pdf_file.fileno())
+                if stat.st_size == 0:
+                    return None
+                with mmap.mmap(pdf_file.fileno(), 0, access=mmap.ACCESS_READ) as mapped:
+                    content_hash = hashlib.sha256(mapped).hexdigest()
+                    existing_job = find_job_by_content_hash(content_hash, self.db_path)
+                    if existing_job is not None and existing_job["status"] == FAILED \
+                            and existing_job["owner"] == self.owner \
+                            and retry_job(existing_job["id"], self.db_path):
+                        # Dropping the file again retries the watcher's failed job from its last checkpoint
+                        print(f"🔁 Retrying failed job {existing_job['id']} for {file_name}")
+                        return stat, content_hash, existing_job["id"]
+                    if existing_job is not None and existing_job["status"] != FAILED:
+                        print(f"⏭️ {file_name} was already submitted as job {existing_job['id']}")
+                        return stat, content_hash, None
+
+                    # The mapped file is written to the job queue without another copy
+                    job_id = enqueue_job(file_name, mapped, self.llm_provider, self.model_name,
+                                         options=self.options, batch_id=batch_id, content_hash=content_hash,
+                                         owner=self.owner, db_path=self.db_path)
+        except FileNotFoundError:
+            return None
+
+        print(f"📥 Enqueued {file_name} as job {job_id}")
+        return stat, content_hash, job_id
+
+    def scan(self) -> List[str]:
+        """Scan the watched directories once and return the IDs of the enqueued jobs."""
+        known_files = self._known_files()
+        pending = count_active_jobs(self.db_path)
+        batch_id = uuid.uuid4().hex
+        job_ids = []
+
+        for directory in self.directories:
+            if not os.path.isdir(directory):
+                print(f"⚠️ Watched directory not found: {directory}")
+                continue
+
+            for path in iter_pdf_files(directory, self.recursive):
+                try:
+                    stat = os.stat(path)
+                except FileNotFoundError:
+                    continue
+
+                known = known_files.get(path)
+                if known and known["size"] == stat.st_size and known["mtime_ns"] == stat.st_mtime_ns:
+                    continue
+                if time.time() - stat.st_mtime < self.settle_seconds:
+                    continue
+                if pending >= self.max_pending:
+                    # Left for a later scan, once the workers catch up
+                    print(f"⏳ {pending} jobs pending, deferring remaining files")
+                    return job_ids
+
+                submitted = self._submit(path, os.path.relpath(path, directory), batch_id)
+                if submitted is None:
+                    continue
+                stat, content_hash, job_id = submitted
+                self._remember(path, stat, content_hash, job_id)
+                if job_id:
+                    job_ids.append(job_id)
+                    pending += 1
+        return job_ids
+
+    def run(self, poll_interval: float = 10.0):
+        """Scan the watched directories every poll_interval seconds until interrupted."""
+        print(f"👀 Watching {', '.join(self.directories)}")
+        while True:
+            job_ids = self.scan()
+            if job_ids:
+                print(f"✅ Enqueued {len(job_ids)} new document(s)")
+            time.sleep(poll_interval)
+
+
+def main():
+    """Watch directories and process new PDFs with background workers."""
+    parser = argparse.ArgumentParser(description="Chronology Agent watch-folder ingestion")
+    parser.add_argument("directories", nargs="+", help="Directories to watch for PDFs")
+    parser.add_argument("--provider", choices=["groq", "ollama"], default=None, help="LLM provider")
+    parser.add_argument("--model", default=None, help="Model name")
+    parser.add_argument("--workers", type=int, default=2,
+                        help="Worker processes to start; 0 to rely on standalone job_queue.py workers")
+    parser.add_argument("--interval", type=float, default=10.0, help="Seconds between scans")
+    parser.add_argument("--max-pending", type=int, default=MAX_PENDING_JOBS,
+                        help="Queued and running jobs above which new files wait")
+    parser.add_argument("--no-recursive", action="store_true", help="Don't watch subdirectories")
+    parser.add_argument("--no-speculative", action="store_true", help="Don't format while the review runs")
+    parser.add_argument("--no-split-documents", action="store_true", help="Don't split bundled PDFs")
+    parser.add_argument("--routing", action="store_true", help="Route stages to a smaller model")
+    parser.add_argument("--related-events", action="store_true",
+                        help="Give the formatter similar indexed documents as context")
+    parser.add_argument("--once", action="store_true", help="Scan once and exit")
+    parser.add_argument("--jobs-dir", default=None, help="Directory holding the job database and uploads")
+    args = parser.parse_args()
+
+    worker_config = {
+        "groq_api_key": os.getenv("GROQ_API_KEY"),
+        "ollama_base_url": os.getenv("OLLAMA_BASE_URL")
+    }
+    llm_provider = args.provider or ("groq" if worker_config["groq_api_key"] else "ollama")
+    model_name = args.model or (DEFAULT_GROQ_MODEL if llm_provider == "groq" else DEFAULT_OLLAMA_MODEL)
+    options = {
+        "speculative": not args.no_speculative,
+        "routing": args.routing,
+        "split_documents": not args.no_split_documents,
+        "related_events": args.related_events
+    }
+    db_path = get_db_path(args.jobs_dir)
+
+    watcher = FolderWatcher(args.directories, llm_provider, model_name, options, db_path,
+                            recursive=not args.no_recursive, max_pending=args.max_pending)
+    if args.once:
+        watcher.scan()
+        return
+
+    if args.workers > 0:
+        start_workers(args.workers, worker_config, db_path)
+    try:
+        watcher.run(args.interval)
+    except KeyboardInterrupt:
+        print("👋 Stopped watching")
+
+
+if __name__ == "__main__":
+    main()